@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import metrics
+import response_cache
+import shipalloc
+from database import SessionLocal
+from models import Alert
+
+# Seconds compiled alert definitions are used before the alert table is read again, even
+# without a version bump (catches rows edited straight in the database)
+ALERT_CATALOG_TTL = float(os.getenv("ALERT_CATALOG_TTL", "60"))
+# Shortest time between reloads forced by an alert name the catalog does not know
+MISS_RELOAD_INTERVAL = 1.0
+
+RELOADS = metrics.registry.counter("alert_catalog_reloads_total", "Times the alert table was read and compiled")
+
+
+def compile_alert(row: Alert) -> shipalloc.AlertType:
+    return shipalloc.AlertType(
+        name=row.name,
+        human_error=row.human_error,
+        attack=row.attack,
+        weather=row.weather,
+        robbery=row.robbery,
+        resource=row.resource,
+        struck=row.struck,
+    )
+
+
+# ------------------ ALERT CATALOG ------------------
+class AlertCatalog:
+    """
+    Every alert definition, compiled once into a shipalloc.AlertType with its
+    weight vector, so allocations no longer read and copy an Alert row each time.
+
+    The catalog reloads when the shared "alerts" cache version moves (see
+    response_cache; POST /cache/invalidate bumps it), after ALERT_CATALOG_TTL
+    seconds, and when asked for a name it does not know (at most once a second),
+    so rows added to the alert table are found without a restart.
+    """
+
+    def __init__(self, ttl: float = ALERT_CATALOG_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._alerts: Dict[str, shipalloc.AlertType] = {}
+        self._version: Optional[int] = None
+        self._loaded = float("-inf")
+
+    def _fresh(self, version: int) -> bool:
+        return version == self._version and time.monotonic() - self._loaded < self.ttl
+
+    def load(self, version: int):
+        with SessionLocal() as db:
+            rows = db.query(Alert).order_by(Alert.id).all()
+            alerts = {}
+            for row in rows:
+                alerts.setdefault(row.name, compile_alert(row))  # The oldest row wins a duplicate name
+        with self._lock:
+            self._alerts = alerts
+            self._version = version
+            self._loaded = time.monotonic()
+        RELOADS.inc()
+
+    def get(self, name: str) -> Optional[shipalloc.AlertType]:
+        """The compiled alert called `name`, or None if the alert table has no such row."""
+        version = response_cache.versions.current(response_cache.ALERTS)
+        if not self._fresh(version):
+            self.load(version)
+        alert = self._alerts.get(name)
+        if alert is None and time.monotonic() - self._loaded >= MISS_RELOAD_INTERVAL:
+            self.load(version)
+            alert = self._alerts.get(name)
+        return alert
+
+    def get_many(self, names: Iterable[str]) -> Dict[str, shipalloc.AlertType]:
+        """The compiled alerts among `names` (unknown names are left out)."""
+        found = {}
+        for name in names:
+            alert = self.get(name)
+            if alert is not None:
+                found[name] = alert
+        return found
+
+    def peek(self, name: str) -> Optional[shipalloc.AlertType]:
+        """get() without touching the database: the alert if the catalog is known to be fresh, else None."""
+        version = response_cache.versions.peek(response_cache.ALERTS)
+        if version is None or not self._fresh(version):
+            return None
+        return self._alerts.get(name)
+
+
+catalog = AlertCatalog()
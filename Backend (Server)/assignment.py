@@ -0,0 +1,83 @@
+from typing import Tuple
+
+import numpy as np
+
+import metrics
+
+
+# ------------------ LINEAR ASSIGNMENT ------------------
+@metrics.timed("assignment")
+def solve_assignment(score: np.ndarray, maximize: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Optimal one-to-one assignment of rows to columns (Hungarian method, shortest
+    augmenting paths with potentials, O(r^2 c) for r <= c).
+
+    Every row of the smaller side is assigned. Returns (rows, cols) index arrays,
+    sorted by row, that maximize (or minimize) the summed score[rows, cols].
+    The inner loop over columns is vectorized, so a few hundred rows against a few
+    thousand columns solve in well under a second.
+    """
+    cost = -np.asarray(score, dtype=np.float64) if maximize else np.asarray(score, dtype=np.float64)
+    if cost.ndim != 2:
+        raise ValueError("score must be a 2-D matrix")
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    if not np.isfinite(cost).all():
+        raise ValueError("score must be finite")
+
+    # 1-based, as in the textbook formulation: column 0 is a virtual source that is never picked
+    cost = np.hstack([np.full((n, 1), np.inf), cost])
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)  # owner[j] = row assigned to column j, 0 = free
+    way = np.zeros(m + 1, dtype=np.int64)
+    min_slack = np.empty(m + 1)
+    visited_mask = np.empty(m + 1)  # 0 for columns not yet on the path, inf once visited
+    slack = np.empty(m + 1)
+
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        min_slack.fill(np.inf)
+        visited_mask.fill(0.0)
+        visited = []
+        while True:
+            visited_mask[j0] = np.inf
+            min_slack[j0] = np.inf
+            visited.append(j0)
+            i0 = owner[j0]
+
+            np.subtract(cost[i0 - 1], v, out=slack)
+            slack -= u[i0]
+            slack += visited_mask
+            np.copyto(way, j0, where=slack < min_slack)
+            np.minimum(min_slack, slack, out=min_slack)
+
+            j1 = int(np.argmin(min_slack))
+            delta = min_slack[j1]
+            path = np.asarray(visited)
+            u[owner[path]] += delta
+            v[path] -= delta
+            min_slack -= delta
+
+            j0 = j1
+            if owner[j0] == 0:
+                break
+
+        # Flip the augmenting path back to the source
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(owner[1:]).astype(np.int64)
+    rows = owner[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows, kind="stable")
+    return rows[order], cols[order]
@@ -0,0 +1 @@
+"""Standalone benchmark scripts. Run from the Backend (Server) directory, e.g. `python -m benchmarks.scoring`."""
@@ -0,0 +1,112 @@
+"""
+Benchmark: GET /allships, N+1 ORM path vs the joined, column-projected path.
+
+Seeds a throwaway SQLite database and reports SQL statements per request
+and p50/p99 latency for both handlers.
+
+Usage:
+    python -m benchmarks.allships [--ships 10000] [--requests 50]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "mcrs_bench_allships.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi import Depends  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from typing import List  # noqa: E402
+
+import main  # noqa: E402
+import schemas  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import Base, Ship, AllShip  # noqa: E402
+
+
+def legacy_get_all_allships(db: Session = Depends(main.get_db)):
+    """The original handler: one Ship query per AllShip row plus per-row model building."""
+    allships = db.query(AllShip).all()
+    result = []
+    for allship in allships:
+        ship = db.query(Ship).filter(Ship.id == allship.type).first()
+        if ship:
+            allship_data = schemas.AllShip.from_orm(allship)
+            result.append(schemas.AllShipWithShipInfo(
+                shipid=allship_data.shipid,
+                name=allship_data.name,
+                type=allship_data.type,
+                longitude=allship_data.longitude,
+                latitude=allship_data.latitude,
+                mission=allship_data.mission,
+                ship_info=schemas.ShipRead.from_orm(ship),
+            ))
+    return result
+
+
+def seed(n_ships: int, n_types: int = 10):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    db = SessionLocal()
+    for i in range(1, n_types + 1):
+        db.add(Ship(id=i, name=f"Type-{i}", speed=rng.uniform(20, 60), rotation_speed=1.0,
+                    humanalert=rng.random(), attack=rng.random(), robery=rng.random(), struck=rng.random(),
+                    resource=rng.random(), ubts=rng.random(), time=rng.random(), climate=rng.random()))
+    db.bulk_save_objects([
+        AllShip(name=f"Ship-{i}", latitude=rng.uniform(1, 23), longitude=rng.uniform(66, 94),
+                mission=rng.random() < 0.1, type=1 + i % n_types)
+        for i in range(n_ships)
+    ])
+    db.commit()
+    db.close()
+
+
+def measure(client: TestClient, path: str, n_requests: int):
+    statements = []
+
+    def count(*_):
+        statements[-1] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    latencies = []
+    try:
+        for _ in range(n_requests):
+            statements.append(0)
+            start = time.perf_counter()
+            response = client.get(path)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return sum(statements) / len(statements), p50, p99, len(response.content)
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    seed(args.ships)
+    main.app.add_api_route("/bench/legacy-allships", legacy_get_all_allships,
+                           response_model=List[schemas.AllShipWithShipInfo])
+    client = TestClient(main.app)
+
+    print(f"{args.ships} ships, {args.requests} requests each")
+    print(f"{'path':<10}  {'queries/req':>11}  {'p50 ms':>8}  {'p99 ms':>8}  {'bytes':>9}")
+    for label, path in (("legacy", "/bench/legacy-allships"), ("joined", "/allships")):
+        queries, p50, p99, size = measure(client, path, args.requests)
+        print(f"{label:<10}  {queries:>11.0f}  {p50 * 1e3:>8.1f}  {p99 * 1e3:>8.1f}  {size:>9}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,139 @@
+"""
+Benchmark: sync handlers vs async handlers (DB_ASYNC=1) at high concurrency.
+
+Seeds a throwaway SQLite database (WAL mode), starts the API under uvicorn once
+per mode and drives it from one asyncio client with many requests in flight:
+a mixed load of /allships, /alert-results, /update-ship-position and /trigger
+calls. Reports requests per second and p50/p99 latency per endpoint.
+
+SQLite allows one writer at a time, so the write endpoints gain little from
+async here; point --database-url at a MySQL stand-in (it must already hold the
+schema and seed data) to measure a real connection pool.
+
+Usage:
+    python -m benchmarks.async_db [--ships 1000] [--requests 1000] [--concurrency 64 128]
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.trigger_load import ALERT_TYPES, DATABASE_URL, HERE, free_port, seed
+
+ENDPOINTS = ("/allships", "/alert-results", "/update-ship-position", "/trigger")
+
+
+def start_server(db_async: bool, database_url: str, pool_size: int):
+    port = free_port()
+    env = dict(
+        os.environ, DATABASE_URL=database_url, DB_ASYNC="1" if db_async else "0",
+        DB_POOL_SIZE=str(pool_size), DB_MAX_OVERFLOW=str(pool_size),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--timeout-keep-alive", "60"],
+        cwd=HERE, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base}/alerts", timeout=1.0)
+            return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not start")
+
+
+def make_requests(n: int, n_ships: int):
+    rng = random.Random(3)
+    requests = []
+    for _ in range(n):
+        path = rng.choices(ENDPOINTS, weights=(1, 2, 5, 2))[0]
+        if path == "/update-ship-position":
+            body = {"ship_id": rng.randint(1, n_ships), "latitude": rng.uniform(1, 23), "longitude": rng.uniform(66, 94)}
+        elif path == "/trigger":
+            body = {"alert_type": rng.choice(ALERT_TYPES), "latitude": rng.uniform(1, 23),
+                    "longitude": rng.uniform(66, 94), "climate_condition": rng.randint(0, 3)}
+        else:
+            body = None
+        requests.append((path, body))
+    return requests
+
+
+async def drive(base: str, requests, concurrency: int):
+    latencies = {path: [] for path in ENDPOINTS}
+    failures = 0
+    queue = iter(requests)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal failures
+        for path, body in queue:
+            start = time.perf_counter()
+            try:
+                if body is None:
+                    r = await client.get(path)
+                else:
+                    r = await client.post(path, json=body)
+            except httpx.TransportError:
+                failures += 1
+                continue
+            latencies[path].append(time.perf_counter() - start)
+            # 404/409 from /trigger once the fleet is used up are fine; anything else is not
+            if r.status_code >= 500:
+                failures += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=120.0, limits=limits) as client:
+        await client.get("/allships/changes", params={"since": 0})  # Warm the fleet cache
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, failures
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1e3 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[64, 128])
+    parser.add_argument("--pool-size", type=int, default=20, help="DB_POOL_SIZE (and DB_MAX_OVERFLOW)")
+    parser.add_argument("--database-url", help="use this database instead of seeding a SQLite file")
+    args = parser.parse_args()
+
+    # Writers queue on SQLite's file lock; wait for it longer than the default 5 s
+    database_url = args.database_url or DATABASE_URL + "?timeout=60"
+    requests = make_requests(args.requests, args.ships)
+    print(f"{args.requests} mixed requests against {args.ships} ships ({database_url.split(':')[0]})")
+    print(f"{'mode':>5}  {'clients':>7}  {'req/s':>7}  {'failed':>6}  "
+          + "  ".join(f"{path + ' p50/p99 ms':>32}" for path in ENDPOINTS))
+    for concurrency in args.concurrency:
+        for db_async in (False, True):
+            if not args.database_url:
+                seed(args.ships)
+            proc, base = start_server(db_async, database_url, args.pool_size)
+            try:
+                elapsed, latencies, failures = asyncio.run(drive(base, requests, concurrency))
+            finally:
+                proc.terminate()
+                proc.wait()
+            cells = "  ".join(
+                f"{f'{percentile(latencies[path], 0.5):.1f}/{percentile(latencies[path], 0.99):.1f}':>32}"
+                for path in ENDPOINTS
+            )
+            print(f"{'async' if db_async else 'sync':>5}  {concurrency:>7}  {len(requests) / elapsed:>7.1f}  "
+                  f"{failures:>6}  {cells}")
+
+
+if __name__ == "__main__":
+    main()
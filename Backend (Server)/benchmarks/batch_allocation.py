@@ -0,0 +1,68 @@
+"""
+Benchmark: batch allocation of many incidents at once.
+
+For each size, builds the ships x incidents score matrix, solves the optimal
+assignment, and compares it with handling the incidents one by one the way
+/trigger does (each takes the best ship still free, in arrival order).
+
+Usage:
+    python -m benchmarks.batch_allocation [--sizes 100x1000 300x3000 500x5000]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import assignment
+import shipalloc
+from benchmarks.scoring import make_ships_data
+
+
+def sequential(scores: np.ndarray) -> float:
+    """Total score of greedy one-at-a-time allocation."""
+    scores = scores.copy()
+    total = 0.0
+    for col in range(scores.shape[1]):
+        row = int(np.argmax(scores[:, col]))
+        if scores[row, col] == -np.inf:
+            break
+        total += scores[row, col]
+        scores[row, :] = -np.inf
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["100x1000", "300x3000", "500x5000"],
+                        help="INCIDENTSxSHIPS")
+    args = parser.parse_args()
+
+    print(f"{'incidents':>9}  {'ships':>6}  {'matrix ms':>10}  {'solve ms':>10}  {'greedy':>9}  {'optimal':>9}")
+    for size in args.sizes:
+        n_incidents, n_ships = (int(x) for x in size.split("x"))
+        rng = random.Random(n_incidents)
+        fleet = shipalloc.FleetArrays.from_ships_data(make_ships_data(n_ships, seed=n_incidents))
+        alerts = [
+            shipalloc.AlertType(f"A{i}", *(rng.random() for _ in range(6))) for i in range(n_incidents)
+        ]
+        lats = [rng.uniform(1.0, 23.5) for _ in range(n_incidents)]
+        lons = [rng.uniform(66.5, 94.5) for _ in range(n_incidents)]
+        climates = [rng.randint(0, 3) for _ in range(n_incidents)]
+
+        start = time.perf_counter()
+        scores = shipalloc.score_matrix(alerts, lats, lons, climates, fleet)
+        t_matrix = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows, cols = assignment.solve_assignment(scores)
+        t_solve = time.perf_counter() - start
+
+        print(
+            f"{n_incidents:>9}  {len(fleet):>6}  {t_matrix * 1e3:>10.1f}  {t_solve * 1e3:>10.1f}  "
+            f"{sequential(scores):>9.2f}  {scores[rows, cols].sum():>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
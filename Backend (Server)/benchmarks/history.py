@@ -0,0 +1,79 @@
+"""
+Benchmark: position history write path and queries.
+
+Fills a throwaway history directory with `--hours` of reports from `--ships`
+ships reporting every `--interval` seconds, then times the in-request cost of
+append(), the background flush, sealing, a one-day track query (sealed
+partitions vs. the open one) and a bounding-box "where was everyone" query.
+
+Usage:
+    python -m benchmarks.history [--ships 5000] [--hours 24] [--interval 30]
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=5000)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between reports of one ship")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="mcrs_history_")
+    store = history.PositionHistory(root=root, retention_days=0, flush_interval=3600, seal_delay=0)
+    rng = np.random.default_rng(0)
+    now = time.time()
+    t_first = now - args.hours * 3600
+    ticks = np.arange(t_first, now, args.interval)
+    ids = np.arange(1, args.ships + 1)
+    lat = rng.uniform(1, 23, args.ships)
+    lon = rng.uniform(66, 94, args.ships)
+
+    try:
+        append_s = flush_s = 0.0
+        for i, t in enumerate(ticks):
+            lat += rng.normal(0, 0.01, args.ships)
+            lon += rng.normal(0, 0.01, args.ships)
+            start = time.perf_counter()
+            store.append(ids, lat, lon, np.full(args.ships, t))
+            append_s += time.perf_counter() - start
+            if i % 20 == 19:
+                start = time.perf_counter()
+                store.flush()  # Seals every partition that has closed
+                flush_s += time.perf_counter() - start
+        start = time.perf_counter()
+        store.flush()
+        flush_s += time.perf_counter() - start
+
+        total = len(ticks) * args.ships
+        print(f"{total} positions ({args.ships} ships x {len(ticks)} reports), "
+              f"{store.partition_seconds // 60}-minute partitions")
+        print(f"append: {append_s / len(ticks) * 1e3:.2f} ms per {args.ships}-ship tick "
+              f"({total / append_s:,.0f} positions/s)")
+        print(f"flush + seal: {total / flush_s:,.0f} positions/s in the background")
+
+        queries = rng.choice(ids, 50)
+        for label, t0 in (("track, last 24 h", now - 86400), ("track, open partition", now - 600)):
+            start = time.perf_counter()
+            points = sum(store.track(int(s), t0, now, 1000)[1] for s in queries)
+            elapsed = (time.perf_counter() - start) / len(queries)
+            print(f"{label}: {elapsed * 1e3:.2f} ms per ship ({points // len(queries)} points)")
+
+        start = time.perf_counter()
+        for _ in range(20):
+            rows, found = store.positions_at(now - 3 * 3600, (5, 70, 15, 85), 600, 2000)
+        elapsed = (time.perf_counter() - start) / 20
+        print(f"positions in box at T: {elapsed * 1e3:.2f} ms ({found} ships, {len(rows['ship_id'])} after thinning)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
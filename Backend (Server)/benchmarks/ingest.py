@@ -0,0 +1,106 @@
+"""
+Benchmark: position ingestion throughput, per-call vs bulk.
+
+Starts the API under uvicorn on a throwaway SQLite database and feeds it
+AIS-style reports: first one /update-ship-position call per report (the old
+path), then /ingest/positions batches as NDJSON and as packed binary records.
+Each batch holds `--reports` reports per ship (more when the fleet is smaller
+than the batch), and coalescing keeps the newest one per ship.
+Reports positions per second received and ships per second written.
+
+Target: at least 50,000 positions/s per API process for batches of 10,000 or
+more, NDJSON or binary (measured on SQLite in WAL mode).
+
+Usage:
+    python -m benchmarks.ingest [--ships 10000] [--batches 1000 10000 50000] [--reports 2]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.async_db import start_server
+from benchmarks.trigger_load import DATABASE_URL, seed
+
+os.environ["DATABASE_URL"] = DATABASE_URL  # Before ingest imports the database module
+import ingest  # noqa: E402
+
+
+def make_batch(n_positions: int, n_ships: int, reports: int, rng: np.random.Generator) -> ingest.PositionBatch:
+    ships = rng.choice(np.arange(1, n_ships + 1), size=min(n_ships, max(1, n_positions // reports)), replace=False)
+    ship_id = np.resize(ships, n_positions)  # Big batches repeat ships more often
+    return ingest.PositionBatch(
+        ship_id=ship_id,
+        lat=rng.uniform(1, 23, len(ship_id)),
+        lon=rng.uniform(66, 94, len(ship_id)),
+        ts=time.time() + np.arange(len(ship_id), dtype=np.float64),
+    )
+
+
+def to_ndjson(batch: ingest.PositionBatch) -> bytes:
+    return "\n".join(
+        json.dumps({"ship_id": s, "latitude": la, "longitude": lo, "ts": t})
+        for s, la, lo, t in zip(batch.ship_id.tolist(), batch.lat.tolist(), batch.lon.tolist(), batch.ts.tolist())
+    ).encode()
+
+
+def to_binary(batch: ingest.PositionBatch) -> bytes:
+    records = np.empty(len(batch), dtype=ingest.RECORD_DTYPE)
+    records["ship_id"], records["lat"], records["lon"], records["ts"] = batch
+    return records.tobytes()
+
+
+def per_call(client: httpx.Client, base: str, n: int, n_ships: int) -> float:
+    rng = random.Random(5)
+    start = time.perf_counter()
+    for _ in range(n):
+        client.post(f"{base}/update-ship-position", json={
+            "ship_id": rng.randint(1, n_ships), "latitude": rng.uniform(1, 23), "longitude": rng.uniform(66, 94),
+        }).raise_for_status()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=10000)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1000, 10000, 50000], help="positions per batch")
+    parser.add_argument("--reports", type=int, default=2, help="reports per ship in a batch")
+    parser.add_argument("--repeat", type=int, default=5, help="batches sent per size and format")
+    parser.add_argument("--calls", type=int, default=200, help="single /update-ship-position calls for the baseline")
+    args = parser.parse_args()
+
+    seed(args.ships)
+    proc, base = start_server(False, DATABASE_URL, 5)
+    rng = np.random.default_rng(11)
+    try:
+        with httpx.Client(timeout=300.0) as client:
+            client.get(f"{base}/allships/changes", params={"since": 0})  # Warm the fleet cache
+            print(f"{args.ships} ships")
+            print(f"{'format':>8}  {'batch':>7}  {'positions/s':>12}  {'ships/s':>10}")
+            print(f"{'per-call':>8}  {1:>7}  {per_call(client, base, args.calls, args.ships):>12.0f}  {'':>10}")
+            for size in args.batches:
+                for fmt, encode, content_type in (
+                    ("ndjson", to_ndjson, "application/x-ndjson"),
+                    ("binary", to_binary, "application/octet-stream"),
+                ):
+                    bodies = [encode(make_batch(size, args.ships, args.reports, rng)) for _ in range(args.repeat)]
+                    received = applied = 0
+                    start = time.perf_counter()
+                    for body in bodies:
+                        r = client.post(f"{base}/ingest/positions", content=body, headers={"content-type": content_type})
+                        r.raise_for_status()
+                        received += r.json()["received"]
+                        applied += r.json()["applied"]
+                    elapsed = time.perf_counter() - start
+                    print(f"{fmt:>8}  {size:>7}  {received / elapsed:>12.0f}  {applied / elapsed:>10.0f}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark: cost of the request instrumentation, and what it shows.
+
+Seeds a throwaway SQLite database and replays the same request mix (ship
+lookups, position updates, /trigger, alert-result pages) against the API,
+alternating METRICS_REQUESTS=0 and 1 for `--rounds` rounds, and reports the
+best throughput and latency of each. The best instrumented run then prints
+the per-route breakdown read back from /metrics: mean latency, SQL
+statements and DB time per request, and time per span.
+
+With --profile, a third server runs with PROFILER=1 and /debug/profile
+samples it under the same load; the busiest functions are printed.
+
+Usage:
+    python -m benchmarks.instrumentation [--ships 2000] [--requests 3000] [--clients 4] [--rounds 3] [--profile]
+"""
+import argparse
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+from benchmarks.async_db import start_server
+from benchmarks.trigger_load import ALERT_TYPES, DATABASE_URL, seed
+
+SERIES = re.compile(r'^(\w+)_(sum|count)\{(.*)\} (\S+)$')
+
+
+def make_requests(n: int, n_ships: int):
+    rng = random.Random(5)
+    requests = []
+    for _ in range(n):
+        kind = rng.choices(("ship", "move", "trigger", "page"), weights=(4, 4, 1, 1))[0]
+        if kind == "ship":
+            requests.append(("GET", f"/allships/{rng.randint(1, n_ships)}", None))
+        elif kind == "move":
+            requests.append(("POST", "/update-ship-position", {
+                "ship_id": rng.randint(1, n_ships), "latitude": rng.uniform(1, 23), "longitude": rng.uniform(66, 94),
+            }))
+        elif kind == "trigger":
+            requests.append(("POST", "/trigger", {
+                "alert_type": rng.choice(ALERT_TYPES), "latitude": rng.uniform(1, 23),
+                "longitude": rng.uniform(66, 94), "climate_condition": rng.randint(0, 1),
+            }))
+        else:
+            requests.append(("GET", "/alert-results/page", None))
+    return requests
+
+
+def replay(base: str, requests, clients: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+    chunks = [requests[i::clients] for i in range(clients)]
+
+    def client_loop(chunk):
+        mine = []
+        with httpx.Client(base_url=base, timeout=60.0) as client:
+            for method, path, body in chunk:
+                start = time.perf_counter()
+                client.request(method, path, json=body)
+                mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(client_loop, chunks))
+    elapsed = time.perf_counter() - start
+    ms = np.asarray(latencies) * 1e3
+    return {"per_second": len(ms) / elapsed, "p50": np.percentile(ms, 50), "p99": np.percentile(ms, 99)}
+
+
+def breakdown(text: str):
+    """(count, sum) per metric and label set, from the Prometheus text."""
+    series = defaultdict(dict)
+    for line in text.splitlines():
+        match = SERIES.match(line)
+        if match:
+            name, part, labels, value = match.groups()
+            series[(name, labels)][part] = float(value)
+    return series
+
+
+def print_breakdown(text: str):
+    series = breakdown(text)
+    print(f"\n{'route':<40}  {'requests':>8}  {'mean ms':>8}  {'queries':>7}  {'db ms':>6}")
+    for (name, labels), values in sorted(series.items()):
+        if name != "http_request_db_queries":
+            continue
+        method, route = re.findall(r'"([^"]*)"', labels)
+        count = values["count"]
+        latency = sum(v["sum"] for (n, l), v in series.items()
+                      if n == "http_request_duration_seconds" and l.startswith(labels))
+        db = series[("http_request_db_seconds", labels)]["sum"]
+        print(f"{method + ' ' + route:<40}  {count:>8.0f}  {latency / count * 1e3:>8.2f}  "
+              f"{values['sum'] / count:>7.1f}  {db / count * 1e3:>6.2f}")
+    print(f"\n{'span':<20}  {'calls':>7}  {'mean ms':>8}")
+    for (name, labels), values in sorted(series.items()):
+        if name == "span_duration_seconds":
+            print(f"{labels.split(chr(34))[1]:<20}  {values['count']:>7.0f}  {values['sum'] / values['count'] * 1e3:>8.2f}")
+
+
+def print_profile(base: str, requests, clients: int):
+    result = {}
+    profiler = threading.Thread(target=lambda: result.update(httpx.get(
+        f"{base}/debug/profile", params={"seconds": 5, "format": "top", "limit": 12}, timeout=60.0
+    ).json()))
+    profiler.start()
+    replay(base, requests, clients)
+    profiler.join()
+    print(f"\nprofile: {result['samples']} samples at {result['interval'] * 1e3:.0f} ms")
+    print(f"{'self':>6}  {'total':>6}  function")
+    for row in result["functions"]:
+        print(f"{row['self']:>6}  {row['total']:>6}  {row['function']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3, help="runs per setting; the best is reported")
+    parser.add_argument("--profile", action="store_true", help="also sample a server with /debug/profile")
+    args = parser.parse_args()
+
+    requests = make_requests(args.requests, args.ships)
+    print(f"{args.requests} requests from {args.clients} clients, {args.ships} ships")
+    print(f"{'instrumentation':>15}  {'req/s':>7}  {'p50 ms':>7}  {'p99 ms':>7}")
+    best = {}
+    for _ in range(args.rounds):
+        for enabled in ("0", "1"):
+            seed(args.ships)
+            os.environ["METRICS_REQUESTS"] = enabled
+            proc, base = start_server(False, DATABASE_URL, args.clients)
+            try:
+                s = replay(base, requests, args.clients)
+                if enabled == "1":
+                    s["metrics"] = httpx.get(f"{base}/metrics").text
+            finally:
+                proc.terminate()
+                proc.wait()
+            if enabled not in best or s["per_second"] > best[enabled]["per_second"]:
+                best[enabled] = s
+    for enabled, s in sorted(best.items()):
+        print(f"{'on' if enabled == '1' else 'off':>15}  {s['per_second']:>7.0f}  {s['p50']:>7.2f}  {s['p99']:>7.2f}")
+    print_breakdown(best["1"]["metrics"])
+
+    if args.profile:
+        seed(args.ships)
+        os.environ["PROFILER"] = "1"
+        proc, base = start_server(False, DATABASE_URL, args.clients)
+        try:
+            print_profile(base, requests, args.clients)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: random location generation, the old per-point loop vs the bulk generator.
+
+The loop picks a random ocean box with random.choice and draws random.uniform
+coordinates inside it, one point at a time, with no land check. The bulk
+generator draws area-weighted candidates in NumPy and rejects the ones the sea
+mask (raster plus exact boundary test) puts inside a restricted zone.
+Reports points per second and the share of points that landed in a zone.
+
+Usage:
+    python -m benchmarks.locations [--counts 10000 100000 1000000 5000000] [--loop-max 1000000]
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from benchmarks.trigger_load import DATABASE_URL
+
+os.environ.setdefault("DATABASE_URL", DATABASE_URL)  # Before anything imports the database module
+import location_generator  # noqa: E402
+import zones  # noqa: E402
+
+
+def legacy_locations(count: int):
+    """The original generator, kept here as the baseline."""
+    points = []
+    for _ in range(count):
+        zone = random.choice(location_generator.OCEAN_ZONES)
+        points.append((
+            round(random.uniform(zone["min_lat"], zone["max_lat"]), location_generator.COORDINATE_PRECISION),
+            round(random.uniform(zone["min_lon"], zone["max_lon"]), location_generator.COORDINATE_PRECISION),
+        ))
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 100000, 1000000, 5000000])
+    parser.add_argument("--loop-max", type=int, default=1000000, help="skip the loop above this count")
+    args = parser.parse_args()
+
+    zone_set = zones.registry.current()
+    start = time.perf_counter()
+    sampler = location_generator.get_sampler()
+    print(f"sea mask: {sampler.mask.rows}x{sampler.mask.cols} cells, built in {(time.perf_counter() - start) * 1e3:.0f} ms; "
+          f"{len(sampler.boxes)} disjoint boxes from {len(location_generator.OCEAN_ZONES)} ocean zones")
+    print(f"{'count':>9}  {'loop pts/s':>11}  {'in zones':>8}  {'bulk pts/s':>11}  {'in zones':>8}")
+    for count in args.counts:
+        loop_rate = loop_bad = ""
+        if count <= args.loop_max:
+            start = time.perf_counter()
+            points = np.asarray(legacy_locations(count))
+            loop_rate = f"{count / (time.perf_counter() - start):,.0f}"
+            loop_bad = f"{zone_set.contains_many(points[:, 0], points[:, 1]).mean():.1%}"
+        start = time.perf_counter()
+        points = location_generator.generate_sea_points(count, seed=count)
+        bulk_rate = count / (time.perf_counter() - start)
+        bulk_bad = zone_set.contains_many(points[:, 0], points[:, 1]).mean()
+        print(f"{count:>9}  {loop_rate:>11}  {loop_bad:>8}  {bulk_rate:>11,.0f}  {bulk_bad:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: full-list reads vs keyset pages and NDJSON exports of /alert-results and /allships.
+
+Seeds a throwaway SQLite database with `--ships` ships and `--results` alert
+results, then starts a fresh API process (RESPONSE_CACHE=0) for each read:
+
+  - the original full list, /alert-results and /allships
+  - the first keyset page and a page deep in the table (reached by walking
+    the cursors), at `--limit` rows per page
+  - a streamed NDJSON export of everything
+
+Reports time, bytes and how far the server's peak resident memory (VmHWM)
+rose above its idle size: the full lists grow with the table, the pages and
+exports should not.
+
+Usage:
+    python -m benchmarks.pagination [--ships 100000] [--results 300000] [--limit 100]
+"""
+import argparse
+import os
+import time
+
+import httpx
+
+from benchmarks.async_db import start_server
+from benchmarks.response_cache import add_results
+from benchmarks.trigger_load import DATABASE_URL, seed
+
+
+def memory_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(read) -> dict:
+    """Run `read(base)` against a fresh server; time, bytes and peak memory above idle."""
+    proc, base = start_server(False, DATABASE_URL, 5)
+    try:
+        idle = memory_kb(proc.pid, "VmRSS")
+        start = time.perf_counter()
+        sent, rows = read(base)
+        elapsed = time.perf_counter() - start
+        return {"ms": elapsed * 1e3, "mb": sent / 2**20, "rows": rows,
+                "peak_mb": (memory_kb(proc.pid, "VmHWM") - idle) / 1024}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def full_list(path: str):
+    def read(base):
+        r = httpx.get(base + path, timeout=600.0)
+        return len(r.content), len(r.json())
+    return read
+
+
+def nth_page(path: str, limit: int, n: int):
+    """Walk the cursors to page n, then time only that page's request."""
+    def read(base):
+        with httpx.Client(base_url=base, timeout=600.0) as client:
+            cursor = None
+            for _ in range(n - 1):
+                cursor = client.get(path, params={"limit": limit, **({"cursor": cursor} if cursor else {})}).json()["next_cursor"]
+            start = time.perf_counter()
+            r = client.get(path, params={"limit": limit, **({"cursor": cursor} if cursor else {})})
+            read.page_ms = (time.perf_counter() - start) * 1e3
+            return len(r.content), len(r.json()["items"])
+    return read
+
+
+def export(path: str):
+    def read(base):
+        sent = rows = 0
+        with httpx.stream("GET", base + path, timeout=600.0) as r:
+            for line in r.iter_lines():
+                sent += len(line) + 1
+                rows += 1
+        return sent, rows
+    return read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=100000)
+    parser.add_argument("--results", type=int, default=300000)
+    parser.add_argument("--limit", type=int, default=100, help="rows per page")
+    parser.add_argument("--deep", type=int, default=200, help="page number for the deep-page read")
+    args = parser.parse_args()
+
+    seed(args.ships)
+    add_results(args.results)
+    os.environ["RESPONSE_CACHE"] = "0"
+    print(f"{args.ships} ships, {args.results} alert results, {args.limit} rows per page")
+    print(f"{'read':<34}  {'rows':>7}  {'ms':>9}  {'MB sent':>8}  {'peak MB':>8}")
+    for name in ("alert-results", "allships"):
+        reads = [
+            (f"/{name} (full list)", full_list(f"/{name}")),
+            (f"/{name}/page first", nth_page(f"/{name}/page", args.limit, 1)),
+            (f"/{name}/page #{args.deep}", nth_page(f"/{name}/page", args.limit, args.deep)),
+            (f"/{name}/export", export(f"/{name}/export")),
+        ]
+        for label, read in reads:
+            s = measure(read)
+            ms = getattr(read, "page_ms", s["ms"])
+            print(f"{label:<34}  {s['rows']:>7}  {ms:>9.1f}  {s['mb']:>8.2f}  {s['peak_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
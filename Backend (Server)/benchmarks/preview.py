@@ -0,0 +1,71 @@
+"""
+Benchmark: top-K ranking for /trigger/preview, and the preview-then-trigger flow with the ranking cache.
+
+For each fleet size, the fleet is scored once and the K best ships are picked
+two ways: a full argsort of the final scores, and shipalloc.rank_order's
+partial selection (argpartition, then a sort of the K survivors). Then an
+operator's preview (K ships) followed by the real trigger (TRIGGER_CLAIM_ATTEMPTS
+ships) is timed without the cache, where both requests score the whole fleet,
+and with it, where the trigger reuses the preview's ranking.
+
+Usage:
+    python -m benchmarks.preview [--sizes 10000 100000 1000000] [--k 5 100] [--repeat 20]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import ranking_cache
+import shipalloc
+from benchmarks.scoring import ALERT, make_ships_data
+
+TARGET = (12.0, 72.0, 1)
+CLAIM_ATTEMPTS = 8
+
+
+def best(fn, repeat: int) -> float:
+    """Fastest of `repeat` runs, in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def preview_then_trigger(fleet, k: int, cache):
+    """The two rankings an operator's preview and the following trigger need."""
+    for limit, exact in ((k, True), (CLAIM_ATTEMPTS, False)):
+        key = cache.key(ALERT, shipalloc.WEIGHTED_SUM, TARGET[0], TARGET[1], TARGET[2], fleet_version=1, zone_version=1) if cache else None
+        if cache is not None and cache.get(key, limit, exact) is not None:
+            continue
+        depth = max(limit, CLAIM_ATTEMPTS)
+        ranked = shipalloc.rank_alert(ALERT, *TARGET, fleet, limit=depth)
+        if cache is not None:
+            cache.put(key, ranked, depth, exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'ships':>8}  {'k':>4}  {'argsort ms':>10}  {'partial ms':>10}  "
+          f"{'preview+trigger ms':>18}  {'with cache ms':>13}")
+    for n in args.sizes:
+        fleet = shipalloc.FleetArrays.from_ships_data(make_ships_data(n))
+        scores = shipalloc.score_fleet(ALERT, *TARGET, fleet)
+        for k in args.k:
+            full = best(lambda: np.argsort(-scores.final_score, kind="stable")[:k], args.repeat)
+            partial = best(lambda: shipalloc.rank_order(scores.final_score, k), args.repeat)
+            assert (np.argsort(-scores.final_score, kind="stable")[:k] == shipalloc.rank_order(scores.final_score, k)).all()
+            uncached = best(lambda: preview_then_trigger(fleet, k, None), args.repeat)
+            cached = best(lambda: preview_then_trigger(fleet, k, ranking_cache.RankingCache()), args.repeat)
+            print(f"{n:>8}  {k:>4}  {full:>10.2f}  {partial:>10.2f}  {uncached:>18.2f}  {cached:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark: frontend polling of /ships, /alerts and /alert-results, with and without the response cache.
+
+Seeds a throwaway SQLite database (with `--results` alert results) and starts
+the API once with RESPONSE_CACHE=0 and once with the cache on. Each time,
+`--clients` threads poll the three endpoints in turn for `--seconds`, first
+with plain GETs and then revalidating with If-None-Match the way a browser
+does. Reports requests per second, p50 / p99 latency and bytes sent.
+
+Then two API processes share the database. A /trigger on one of them is
+timed until the other serves the new alert result, which shows how quickly
+the shared version counter (CACHE_VERSION_TTL) reaches every worker.
+
+Usage:
+    python -m benchmarks.response_cache [--results 2000] [--clients 8] [--seconds 5]
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+from benchmarks.async_db import start_server
+from benchmarks.trigger_load import ALERT_TYPES, DATABASE_URL, seed
+
+PATHS = ("/ships", "/alerts", "/alert-results")
+
+
+def add_results(n: int):
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from models import AlertResult
+
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(insert(AlertResult), [
+            {"alert_type": ALERT_TYPES[i % len(ALERT_TYPES)], "best_ship": f"Ship-{i}", "ship_id": i + 1,
+             "final_score": 0.5, "timestamp": now - timedelta(seconds=i), "status": i % 3 != 0}
+            for i in range(n)
+        ])
+        db.commit()
+
+
+def poll(base: str, clients: int, seconds: float, revalidate: bool) -> dict:
+    latencies, sent = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client_loop(offset: int):
+        etags = {}
+        mine = []
+        with httpx.Client(base_url=base, timeout=30.0) as client:
+            i = offset
+            while time.perf_counter() < deadline:
+                path = PATHS[i % len(PATHS)]
+                i += 1
+                headers = {"If-None-Match": etags[path]} if revalidate and path in etags else {}
+                start = time.perf_counter()
+                r = client.get(path, headers=headers)
+                mine.append(time.perf_counter() - start)
+                if r.status_code == 200:
+                    etags[path] = r.headers.get("etag", "")
+                with lock:
+                    sent[0] += len(r.content)
+        with lock:
+            latencies.extend(mine)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(client_loop, range(clients)))
+    elapsed = time.perf_counter() - start
+    ms = np.asarray(latencies) * 1e3
+    return {"per_second": len(ms) / elapsed, "p50": np.percentile(ms, 50), "p99": np.percentile(ms, 99),
+            "kb_per_request": sent[0] / len(ms) / 1024}
+
+
+def propagation(ttl: float) -> float:
+    """Seconds until a second process serves an alert result created through the first."""
+    os.environ["RESPONSE_CACHE"] = "1"
+    os.environ["CACHE_VERSION_TTL"] = str(ttl)
+    servers = [start_server(False, DATABASE_URL, 5) for _ in range(2)]
+    try:
+        (_, writer), (_, reader) = servers
+        before = len(httpx.get(f"{reader}/alert-results").json())  # Warm the reader's cache
+        httpx.post(f"{writer}/trigger", json={
+            "alert_type": ALERT_TYPES[0], "latitude": 12.0, "longitude": 70.0, "climate_condition": 1,
+        }, timeout=30.0).raise_for_status()
+        start = time.perf_counter()
+        while len(httpx.get(f"{reader}/alert-results").json()) == before:
+            time.sleep(0.01)
+        return time.perf_counter() - start
+    finally:
+        for proc, _ in servers:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=1000)
+    parser.add_argument("--results", type=int, default=2000, help="alert results returned by /alert-results")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0, help="polling time per run")
+    parser.add_argument("--ttl", type=float, default=1.0, help="CACHE_VERSION_TTL for the propagation check")
+    args = parser.parse_args()
+
+    seed(args.ships)
+    add_results(args.results)
+    print(f"{args.clients} clients polling {', '.join(PATHS)} ({args.results} alert results)")
+    print(f"{'cache':>5}  {'requests':>13}  {'req/s':>7}  {'p50 ms':>7}  {'p99 ms':>7}  {'KB/req':>7}")
+    for cache in ("0", "1"):
+        os.environ["RESPONSE_CACHE"] = cache
+        proc, base = start_server(False, DATABASE_URL, args.clients)
+        try:
+            for revalidate in (False, True):
+                s = poll(base, args.clients, args.seconds, revalidate)
+                kind = "If-None-Match" if revalidate else "plain"
+                print(f"{'on' if cache == '1' else 'off':>5}  {kind:>13}  {s['per_second']:>7.0f}  {s['p50']:>7.2f}  "
+                      f"{s['p99']:>7.2f}  {s['kb_per_request']:>7.1f}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"second worker served a new alert result after {propagation(args.ttl):.2f} s "
+          f"(CACHE_VERSION_TTL={args.ttl})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: straight-line vs route-aware allocation.
+
+Scores a random fleet against random incidents three ways:
+  - straight-line haversine ETA only (the old behaviour),
+  - two-stage: haversine pre-filter, then safe-route ETA for the top N (cold and warm cache),
+  - route ETA for every ship, planned directly without the cache (the reference).
+
+Usage:
+    python -m benchmarks.route_eta [--ships 2000] [--alerts 200] [--route-top-k 16]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import location_generator
+import route_planner
+import shipalloc
+import zones
+from benchmarks.scoring import ALERT, make_ships_data
+from route_cache import RouteDistanceCache
+
+
+def reference_distances(zone_set):
+    def distances(fleet, lat, lon):
+        out = []
+        for start in zip(fleet.lat.tolist(), fleet.lon.tolist()):
+            route = route_planner.plan_route(zone_set, start, (lat, lon))
+            out.append(route[1] if route else np.inf)
+        return np.asarray(out)
+    return distances
+
+
+def sea_location(zone_set):
+    """A random location that is not inside any restricted zone."""
+    while True:
+        point = location_generator.generate_indian_ocean_location()
+        if not zone_set.contains(*point):
+            return point
+
+
+def run(fleet, targets, **kwargs):
+    start = time.perf_counter()
+    winners = [shipalloc.process_alert(ALERT, lat, lon, 0.5, fleet, **kwargs).ship_id for lat, lon in targets]
+    return winners, (time.perf_counter() - start) / len(targets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=2000)
+    parser.add_argument("--alerts", type=int, default=200)
+    parser.add_argument("--route-top-k", type=int, default=16)
+    parser.add_argument("--reference-ships", type=int, default=200, help="fleet size for the full-route reference")
+    args = parser.parse_args()
+
+    zone_set = zones.registry.current()
+    random.seed(3)
+    ships = make_ships_data(args.ships)
+    for ship in ships:
+        ship["latitude"], ship["longitude"] = sea_location(zone_set)
+    fleet = shipalloc.FleetArrays.from_ships_data(ships)
+    targets = [sea_location(zone_set) for _ in range(args.alerts)]
+    route_planner.get_planner(zone_set)  # Build the visibility graph outside the timings
+
+    cache = RouteDistanceCache(zone_source=lambda: zone_set)
+    two_stage = {"route_top_k": args.route_top_k, "route_distances": cache.fleet_distances}
+
+    straight, t_straight = run(fleet, targets)
+    cold, t_cold = run(fleet, targets, **two_stage)
+    misses = cache.misses
+    warm, t_warm = run(fleet, targets, **two_stage)
+
+    print(f"{len(fleet)} free ships, {len(targets)} alerts, route re-scoring of the top {args.route_top_k}")
+    print(f"straight-line only : {t_straight * 1e3:8.2f} ms/alert")
+    print(f"two-stage, cold    : {t_cold * 1e3:8.2f} ms/alert  ({misses} planner calls)")
+    print(f"two-stage, warm    : {t_warm * 1e3:8.2f} ms/alert  (hit rate {cache.hits / max(cache.hits + cache.misses, 1):.0%}, "
+          f"{len(cache)} cell pairs cached)")
+    changed = sum(1 for a, b in zip(straight, cold) if a != b)
+    print(f"allocations changed by route ETA: {changed}/{len(targets)}")
+
+    # Against scoring every ship on its exact route, on a smaller fleet
+    small = fleet.take(np.arange(min(args.reference_ships, len(fleet))))
+    reference, t_reference = run(small, targets, route_top_k=len(small), route_distances=reference_distances(zone_set))
+    small_cache = RouteDistanceCache(zone_source=lambda: zone_set)
+    staged, _ = run(small, targets, route_top_k=args.route_top_k, route_distances=small_cache.fleet_distances)
+    agree = sum(1 for a, b in zip(reference, staged) if a == b)
+    print(f"\nreference ({len(small)} ships, full route scoring): {t_reference * 1e3:8.2f} ms/alert")
+    print(f"two-stage picks the reference ship: {agree}/{len(targets)}")
+
+
+if __name__ == "__main__":
+    main()
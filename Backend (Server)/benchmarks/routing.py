@@ -0,0 +1,133 @@
+"""
+Benchmark: restricted-zone route checks.
+
+1. Hourly ray-cast sampling vs the compiled polygon on the configured zones.
+2. Segment checks against synthetic zone sets of growing size, R-tree vs a linear scan.
+3. Visibility-graph planner: build time and per-query cost for the same zone sets.
+4. Route simulation output: structured result vs the full text report (time and JSON size).
+
+Usage:
+    python -m benchmarks.routing [--pairs 500] [--speed 50] [--zone-counts 10 50 100]
+"""
+import argparse
+import json
+import math
+import random
+import time
+
+import distance_calc
+import location_generator
+import route_planner
+import zones
+
+
+def legacy_segment_safe(start, end, polygon, speed_kmh):
+    """The original check: ray-cast every hourly sample along the segment."""
+    lat1, lon1 = start
+    lat2, lon2 = end
+    total_time = distance_calc.estimate_travel_time(distance_calc.haversine(lat1, lon1, lat2, lon2), speed_kmh)
+    for h in range(math.ceil(total_time) + 1):
+        fraction = min(h / total_time if total_time > 0 else 1.0, 1.0)
+        point = (lat1 + fraction * (lat2 - lat1), lon1 + fraction * (lon2 - lon1))
+        if distance_calc.is_inside_polygon(polygon, point):
+            return False
+    return True
+
+
+def synthetic_zone_set(count: int, rng: random.Random) -> zones.ZoneSet:
+    """`count` small square zones scattered over the operating area."""
+    synthetic = []
+    for i in range(count):
+        lat, lon = rng.uniform(0, 24), rng.uniform(60, 100)
+        size = rng.uniform(0.05, 0.4)
+        square = [(lat, lon), (lat + size, lon), (lat + size, lon + size), (lat, lon + size)]
+        synthetic.append(zones.RestrictedZone(f"box-{i}", "exercise", square))
+    return zones.ZoneSet(synthetic)
+
+
+def zone_scaling(pairs, zone_counts):
+    rng = random.Random(5)
+    # Short hops, like consecutive position reports
+    hops = [(a, (a[0] + rng.uniform(-0.5, 0.5), a[1] + rng.uniform(-0.5, 0.5))) for a, _ in pairs]
+    print(f"\n{'zones':>6}  {'linear us':>10}  {'r-tree us':>10}  {'build ms':>10}  {'plan ms':>10}")
+    for count in zone_counts:
+        zone_set = synthetic_zone_set(count, rng)
+        start = time.perf_counter()
+        linear = [any(z.polygon.intersects_segment(a, b) for z in zone_set.zones) for a, b in hops]
+        t_linear = time.perf_counter() - start
+        start = time.perf_counter()
+        indexed = [zone_set.intersects_segment(a, b) for a, b in hops]
+        t_indexed = time.perf_counter() - start
+        assert linear == indexed
+
+        start = time.perf_counter()
+        planner = route_planner.RoutePlanner(zone_set)
+        t_build = time.perf_counter() - start
+        start = time.perf_counter()
+        for a, b in pairs:
+            planner.plan(a, b)
+        t_plan = time.perf_counter() - start
+        print(
+            f"{count:>6}  {t_linear / len(hops) * 1e6:>10.1f}  {t_indexed / len(hops) * 1e6:>10.1f}  "
+            f"{t_build * 1e3:>10.0f}  {t_plan / len(pairs) * 1e3:>10.2f}"
+        )
+
+
+def simulation_output(pairs, speed):
+    simulations = [distance_calc.simulate_route(*a, *b, speed_kmh=speed) for a, b in pairs]
+    print(f"\n{'output':>18}  {'ms/route':>9}  {'bytes/route':>12}")
+    for label, render in (
+        ("summary + result", lambda sim: (sim.summary(), sim.to_dict())),
+        ("with samples", lambda sim: (sim.summary(), sim.to_dict(with_samples=True))),
+        ("full text", lambda sim: (sim.render(), sim.to_dict())),
+    ):
+        start = time.perf_counter()
+        size = 0
+        for sim in simulations:
+            sim.segments = [distance_calc.PathSegment(g.start, g.end, g.zone, speed) for g in sim.segments]  # Drop cached samples
+            size += len(json.dumps(render(sim), ensure_ascii=False).encode())
+        elapsed = time.perf_counter() - start
+        print(f"{label:>18}  {elapsed / len(pairs) * 1e3:>9.3f}  {size // len(pairs):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=500)
+    parser.add_argument("--speed", type=float, default=50.0)
+    parser.add_argument("--zone-counts", type=int, nargs="+", default=[10, 50, 100])
+    args = parser.parse_args()
+
+    random.seed(11)
+    pairs = [
+        (location_generator.generate_indian_ocean_location(), location_generator.generate_indian_ocean_location())
+        for _ in range(args.pairs)
+    ]
+    zone = zones.registry.current().zones[0].polygon
+    polygon = zone.vertices.tolist()
+
+    start = time.perf_counter()
+    legacy = [legacy_segment_safe(a, b, polygon, args.speed) for a, b in pairs]
+    t_legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact = [not zone.intersects_segment(a, b) for a, b in pairs]
+    t_exact = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for a, b in pairs:
+        distance_calc.simulate_movement_with_restrictions(*a, *b, speed_kmh=args.speed)
+    t_full = time.perf_counter() - start
+
+    missed = sum(1 for old, new in zip(legacy, exact) if old and not new)
+    print(f"{args.pairs} segments at {args.speed:g} km/h")
+    print(f"hourly sampling : {t_legacy / args.pairs * 1e6:9.1f} us/segment")
+    print(f"exact segment   : {t_exact / args.pairs * 1e6:9.1f} us/segment  ({t_legacy / t_exact:.1f}x)")
+    print(f"full simulation : {t_full / args.pairs * 1e3:9.2f} ms/route")
+    print(f"crossings missed by sampling: {missed}")
+
+    zone_scaling(pairs, args.zone_counts)
+    simulation_output(pairs, args.speed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: per-ship Python scoring loop vs the vectorized shipalloc engine.
+
+Usage:
+    python -m benchmarks.scoring [--sizes 1000 10000 100000] [--repeat 5]
+"""
+import argparse
+import random
+import time
+from typing import List
+
+import shipalloc
+
+
+ALERT = shipalloc.AlertType(
+    name="Benchmark", human_error=0.6, attack=0.8, weather=0.4, robbery=0.5, resource=0.3, struck=0.7
+)
+
+
+def make_ships_data(n: int, seed: int = 42) -> List[dict]:
+    rng = random.Random(seed)
+    ships = []
+    for i in range(n):
+        ships.append({
+            "shipid": i + 1,
+            "name": f"Ship-{i + 1}",
+            "latitude": rng.uniform(1.0, 23.5),
+            "longitude": rng.uniform(66.5, 94.5),
+            "mission": rng.random() < 0.1,
+            "ship_info": {
+                "name": f"Type-{i % 7}",
+                "speed": rng.uniform(20.0, 60.0),
+                "humanalert": rng.random(),
+                "attack": rng.random(),
+                "robery": rng.random(),
+                "struck": rng.random(),
+                "resource": rng.random(),
+                "climate": rng.random(),
+            },
+        })
+    return ships
+
+
+def legacy_process_alert(alert, target_lat, target_lon, climate_choice, ships_data):
+    """The original per-ship loop, kept here as the baseline."""
+    results = []
+    for s in (shipalloc.ShipData(d) for d in ships_data):
+        if s.mission:
+            continue
+        dist = shipalloc.calculate_distance(s.lat, s.lon, target_lat, target_lon)
+        time_hours = dist / max(s.speed, 1.0)
+        alert_score = (
+            alert.human_error * s.humanalert +
+            alert.attack * s.attack +
+            alert.weather * s.climate +
+            alert.robbery * s.robery +
+            alert.resource * s.resource +
+            alert.struck * s.struck
+        ) / 5.0
+        results.append([s.id, time_hours, alert_score, climate_choice * s.climate, 0.0])
+    if not results:
+        return None
+    max_time = max(r[1] for r in results)
+    min_time = min(r[1] for r in results)
+    time_range = max(max_time - min_time, 1e-6)
+    for r in results:
+        T = (max_time - r[1]) / time_range
+        r[4] = r[2] * 0.4 + T * 0.3 + r[3] * 0.3
+    return max(results, key=lambda r: r[4])
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    target = (12.5, 80.5, 2)
+    print(f"{'ships':>8}  {'legacy ms':>10}  {'dicts ms':>10}  {'arrays ms':>10}  {'speedup':>8}  same best")
+    for n in args.sizes:
+        ships_data = make_ships_data(n)
+        fleet = shipalloc.FleetArrays.from_ships_data(ships_data)
+
+        legacy = legacy_process_alert(ALERT, *target, ships_data)
+        best = shipalloc.process_alert(ALERT, *target, ships_data)
+        same = legacy is not None and best is not None and legacy[0] == best.ship_id
+
+        t_legacy = best_of(lambda: legacy_process_alert(ALERT, *target, ships_data), args.repeat)
+        t_dicts = best_of(lambda: shipalloc.process_alert(ALERT, *target, ships_data), args.repeat)
+        t_arrays = best_of(lambda: shipalloc.process_alert(ALERT, *target, fleet), args.repeat)
+        print(
+            f"{n:>8}  {t_legacy * 1e3:>10.2f}  {t_dicts * 1e3:>10.2f}  {t_arrays * 1e3:>10.2f}  "
+            f"{t_legacy / t_arrays:>7.1f}x  {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
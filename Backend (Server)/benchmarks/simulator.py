@@ -0,0 +1,88 @@
+"""
+Benchmark: dead-reckoning fleet simulator at fleet scale.
+
+Seeds a throwaway SQLite database with `--ships` ships (about 70% of them start
+outside the restricted zones), sends every ship at sea on a voyage to a random nearby point, then
+runs `--ticks` one-second ticks, flushing every `--flush-every` ticks the way
+the background loop does at 1 Hz with SIM_FLUSH_INTERVAL=10. Reports voyage
+planning time, the cost of a tick and of a flush (DB write, fleet cache,
+history, events), and the tick rate one core sustains with flushes included.
+
+Target: 100,000 ships at 1 Hz on one core.
+
+Usage:
+    python -m benchmarks.simulator [--ships 140000] [--ticks 300] [--flush-every 10]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.trigger_load import DATABASE_URL, seed
+
+HISTORY_DIR = tempfile.mkdtemp(prefix="mcrs_sim_history_")
+os.environ["DATABASE_URL"] = DATABASE_URL  # Before the simulator imports the database module
+os.environ["HISTORY_DIR"] = HISTORY_DIR
+import fleet_cache  # noqa: E402
+import history  # noqa: E402
+import simulator  # noqa: E402
+import zones  # noqa: E402
+from database import SessionLocal  # noqa: E402
+from models import AllShip  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=140000)
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--flush-every", type=int, default=10, help="ticks between flushes")
+    parser.add_argument("--spread", type=float, default=3.0, help="max degrees between a ship and its destination")
+    args = parser.parse_args()
+
+    seed(args.ships)
+    try:
+        with SessionLocal() as db:
+            fleet_cache.fleet.load(db)
+            ids = np.fromiter(db.execute(select(AllShip.shipid)).scalars(), dtype=np.int64)
+        _, lat, lon = fleet_cache.fleet.positions(ids)
+        rng = np.random.default_rng(3)
+        goal_lat = lat + rng.uniform(-args.spread, args.spread, len(ids))
+        goal_lon = lon + rng.uniform(-args.spread, args.spread, len(ids))
+
+        engine = simulator.FleetSimulator(tick_seconds=1.0)
+        start = time.perf_counter()
+        started, rejected = simulator.start_voyages(engine, zones.registry.current(), ids, goal_lat, goal_lon)
+        plan_s = time.perf_counter() - start
+        detours = sum(len(v["route"]) > 2 for v in started)
+        print(f"{len(started)} voyages planned in {plan_s:.2f} s ({detours} around zones, {len(rejected)} rejected)")
+
+        tick_s = flush_s = 0.0
+        flushes = 0
+        for i in range(1, args.ticks + 1):
+            t0 = time.perf_counter()
+            engine.tick()
+            tick_s += time.perf_counter() - t0
+            if i % args.flush_every == 0:
+                t0 = time.perf_counter()
+                engine.flush()
+                flush_s += time.perf_counter() - t0
+                flushes += 1
+
+        per_tick = tick_s / args.ticks
+        per_flush = flush_s / max(flushes, 1)
+        per_second = per_tick + per_flush / args.flush_every  # One core's cost of one simulated second at 1 Hz
+        print(f"tick: {per_tick * 1e3:.2f} ms for {len(started)} ships")
+        print(f"flush: {per_flush * 1e3:.0f} ms per {args.flush_every} ticks ({engine.flushed // max(flushes, 1)} ships)")
+        print(f"busy {per_second * 100:.1f}% of one core at 1 Hz; sustains {1 / per_second:.0f} ticks/s")
+        print(f"{engine.arrivals} arrivals after {args.ticks} s simulated")
+    finally:
+        history.store.close()
+        shutil.rmtree(HISTORY_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
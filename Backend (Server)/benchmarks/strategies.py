@@ -0,0 +1,80 @@
+"""
+Benchmark: scoring strategies, and alert lookup per allocation.
+
+For each fleet size the fleet is ranked with every strategy in
+shipalloc.STRATEGIES, with and without TRIGGER_TOP_K-style pruning
+(time_decayed is never pruned). Then the alert lookup that used to precede
+every /trigger (query the Alert row, copy it into a shipalloc.AlertType) is
+timed against alert_catalog.catalog.get(), which serves the compiled alert
+from memory.
+
+Usage:
+    python -m benchmarks.strategies [--sizes 10000 100000 1000000] [--top-k 64] [--lookups 2000] [--repeat 10]
+"""
+import argparse
+import time
+
+import shipalloc
+from benchmarks.scoring import ALERT, make_ships_data
+from benchmarks.trigger_load import ALERT_TYPES, seed
+
+TARGET = (12.0, 72.0, 1)
+
+
+def best(fn, repeat: int) -> float:
+    """Fastest of `repeat` runs, in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def lookups(n: int):
+    """Per-lookup time of the old Alert query plus copy, and of the catalog, in microseconds."""
+    seed(10)  # Points DATABASE_URL at the throwaway database before anything imports `database`
+    import alert_catalog
+    from database import SessionLocal
+    from models import Alert
+
+    names = [ALERT_TYPES[i % len(ALERT_TYPES)] for i in range(n)]
+    start = time.perf_counter()
+    for name in names:
+        with SessionLocal() as db:
+            alert_catalog.compile_alert(db.query(Alert).filter(Alert.name == name).first())
+    queried = (time.perf_counter() - start) / n * 1e6
+    alert_catalog.catalog.get(names[0])  # Load once, as the first request after start-up would
+    start = time.perf_counter()
+    for name in names:
+        alert_catalog.catalog.get(name)
+    cached = (time.perf_counter() - start) / n * 1e6
+    return queried, cached, alert_catalog.RELOADS.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--top-k", type=int, default=64)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'ships':>8}  {'strategy':<18}  {'full ms':>8}  {'top_k ms':>8}  {'best ship':>9}")
+    for n in args.sizes:
+        fleet = shipalloc.FleetArrays.from_ships_data(make_ships_data(n))
+        for strategy in shipalloc.STRATEGIES.values():
+            full = best(lambda: shipalloc.rank_alert(ALERT, *TARGET, fleet, limit=8, strategy=strategy), args.repeat)
+            pruned = best(lambda: shipalloc.rank_alert(
+                ALERT, *TARGET, fleet, limit=8, top_k=args.top_k, strategy=strategy
+            ), args.repeat)
+            top = shipalloc.rank_alert(ALERT, *TARGET, fleet, limit=1, strategy=strategy)[0]
+            print(f"{n:>8}  {strategy.name:<18}  {full:>8.2f}  {pruned:>8.2f}  {top.ship_id:>9}")
+
+    queried, cached, loads = lookups(args.lookups)
+    print(f"\nalert lookup per allocation: query + copy {queried:.1f} us, catalog {cached:.2f} us "
+          f"({loads} catalog loads for {args.lookups} lookups)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Load test: concurrent /trigger calls during a surge of nearby incidents.
+
+Starts the API under uvicorn on a throwaway SQLite database, fires alerts from
+parallel clients and counts allocations per second, 409 conflicts, client-side
+retries and double-bookings. Runs once with TRIGGER_CLAIM_ATTEMPTS=1 (the old
+behaviour: a lost claim returns 409 and the client has to send the alert again)
+and once with the optimistic claim walking down the ranking.
+
+Usage:
+    python -m benchmarks.trigger_load [--ships 2000] [--alerts 400] [--clients 32] [--attempts 1 8]
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "mcrs_bench_trigger.db")
+DATABASE_URL = f"sqlite:///{DB_PATH}"
+ALERT_TYPES = ("Piracy", "Fire", "Collision")
+
+
+def seed(n_ships: int, n_types: int = 8):
+    os.environ["DATABASE_URL"] = DATABASE_URL
+    from database import SessionLocal, engine
+    from models import Alert, AllShip, Base, Ship
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        # Without WAL every SQLite commit waits on an fsync and that alone caps the test
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    rng = random.Random(7)
+    db = SessionLocal()
+    for i in range(1, n_types + 1):
+        db.add(Ship(id=i, name=f"Type-{i}", speed=rng.uniform(20, 60), rotation_speed=1.0,
+                    humanalert=rng.random(), attack=rng.random(), robery=rng.random(), struck=rng.random(),
+                    resource=rng.random(), ubts=rng.random(), time=rng.random(), climate=rng.random()))
+    for name in ALERT_TYPES:
+        db.add(Alert(name=name, human_error=rng.random(), attack=rng.random(), weather=rng.random(),
+                     robbery=rng.random(), struck=rng.random(), resource=rng.random()))
+    db.bulk_save_objects([
+        AllShip(name=f"Ship-{i}", latitude=rng.uniform(1, 23), longitude=rng.uniform(66, 94),
+                mission=False, type=1 + i % n_types)
+        for i in range(n_ships)
+    ])
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def double_bookings() -> int:
+    from database import SessionLocal
+    from models import AlertResult
+    from sqlalchemy import func
+
+    db = SessionLocal()
+    try:
+        return db.query(AlertResult.ship_id).group_by(AlertResult.ship_id).having(func.count() > 1).count()
+    finally:
+        db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(attempts: int):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=DATABASE_URL, TRIGGER_CLAIM_ATTEMPTS=str(attempts))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base}/alerts", timeout=1.0)
+            return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not start")
+
+
+def run(attempts: int, args) -> dict:
+    seed(args.ships)
+    proc, base = start_server(attempts)
+    rng = random.Random(1)
+    # A surge: every incident within a degree of the same spot
+    alerts = [
+        {"alert_type": rng.choice(ALERT_TYPES), "latitude": 12 + rng.uniform(-1, 1),
+         "longitude": 80 + rng.uniform(-1, 1), "climate_condition": rng.randint(0, 3)}
+        for _ in range(args.alerts)
+    ]
+    stats = {"allocated": 0, "conflicts_409": 0, "client_retries": 0, "errors": 0}
+
+    def fire(client: httpx.Client, alert: dict):
+        for attempt in range(args.client_retries + 1):
+            r = client.post(f"{base}/trigger", json=alert)
+            if r.status_code == 200:
+                return "allocated", attempt
+            if r.status_code != 409:
+                return "errors", attempt
+            stats["conflicts_409"] += 1
+        return "errors", args.client_retries
+
+    try:
+        with httpx.Client(timeout=60.0, limits=httpx.Limits(max_connections=args.clients)) as client:
+            client.get(f"{base}/allships/changes", params={"since": 0})  # Warm the fleet cache
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.clients) as pool:
+                for outcome, retries in pool.map(lambda a: fire(client, a), alerts):
+                    stats[outcome] += 1
+                    stats["client_retries"] += retries
+            elapsed = time.perf_counter() - start
+            server_metrics = {
+                line.split()[0]: int(float(line.split()[1]))
+                for line in client.get(f"{base}/metrics").text.splitlines()
+                if line and not line.startswith("#")
+            }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    stats["per_second"] = stats["allocated"] / elapsed
+    stats["double_bookings"] = double_bookings()
+    stats["server_conflicts"] = server_metrics.get("trigger_claim_conflicts_total", 0)
+    stats["server_retried"] = server_metrics.get("trigger_claims_retried_total", 0)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=2000)
+    parser.add_argument("--alerts", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--client-retries", type=int, default=10, help="resends after a 409")
+    parser.add_argument("--attempts", type=int, nargs="+", default=[1, 8], help="TRIGGER_CLAIM_ATTEMPTS values")
+    args = parser.parse_args()
+
+    print(f"{args.alerts} alerts from {args.clients} clients against {args.ships} ships")
+    print(f"{'attempts':>8}  {'alloc/s':>8}  {'allocated':>9}  {'409s':>6}  {'resends':>7}  "
+          f"{'lost claims':>11}  {'retried':>7}  {'errors':>6}  {'double':>6}")
+    for attempts in args.attempts:
+        s = run(attempts, args)
+        print(f"{attempts:>8}  {s['per_second']:>8.1f}  {s['allocated']:>9}  {s['conflicts_409']:>6}  "
+              f"{s['client_retries']:>7}  {s['server_conflicts']:>11}  {s['server_retried']:>7}  "
+              f"{s['errors']:>6}  {s['double_bookings']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+What-if replay: Monte Carlo allocation runs over synthetic fleets.
+
+For every fleet size and trial, generates a fleet (ship types, capabilities,
+positions inside location_generator.OCEAN_ZONES, a share already on a mission)
+and an incident stream (uniform over the ocean zones, or a surge around a few
+hotspots), then replays the stream:
+
+  engine  in-process through shipalloc.rank_alert / process_alert. Incidents
+          arrive `--concurrency` at a time and are ranked against the same
+          snapshot of free ships, then claimed in order down their rankings
+          the way /trigger does, so conflicts show up without a server.
+  api     through POST /trigger on uvicorn with a throwaway SQLite database,
+          from `--concurrency` client threads (409s are resent).
+
+Reports allocation latency percentiles, throughput, average response ETA
+(straight-line distance / ship speed) and the conflict rate (claims lost to
+a concurrent allocation / claims attempted). Trials of the engine mode run
+in `--workers` processes; keep that at or below the core count, or latency
+includes waiting for a CPU. API trials share one database and run one at a time.
+
+Usage:
+    python -m benchmarks.whatif [--mode engine api] [--sizes 1000 10000 100000] [--incidents 500]
+                                [--trials 3] [--concurrency 16] [--pattern uniform|surge]
+                                [--workers 4] [--json results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.trigger_load import DATABASE_URL, double_bookings
+
+os.environ.setdefault("DATABASE_URL", DATABASE_URL)  # Before anything imports the database module
+import location_generator  # noqa: E402
+import shipalloc  # noqa: E402
+
+N_TYPES = 8
+ALERT_TYPES = ("Piracy", "Fire", "Collision", "Storm", "Medical")
+CLAIM_ATTEMPTS = 8  # Same default as TRIGGER_CLAIM_ATTEMPTS
+
+
+# ------------------ SCENARIOS ------------------
+def ocean_points(rng: np.random.Generator, n: int):
+    """Sea points from location_generator: area-weighted over OCEAN_ZONES, restricted zones masked out."""
+    points = location_generator.generate_sea_points(n, rng)
+    return points[:, 0], points[:, 1]
+
+
+def make_scenario(n_ships: int, n_incidents: int, seed: int, pattern: str, busy: float) -> dict:
+    rng = np.random.default_rng(seed)
+    lat, lon = ocean_points(rng, n_ships)
+    if pattern == "surge":
+        hot_lat, hot_lon = ocean_points(rng, 3)
+        hotspot = rng.integers(3, size=n_incidents)
+        inc_lat = hot_lat[hotspot] + rng.uniform(-1, 1, n_incidents)
+        inc_lon = hot_lon[hotspot] + rng.uniform(-1, 1, n_incidents)
+    else:
+        inc_lat, inc_lon = ocean_points(rng, n_incidents)
+    return {
+        "type_speed": rng.uniform(20, 60, N_TYPES),
+        "type_capabilities": rng.random((N_TYPES, len(shipalloc.CAPABILITY_FIELDS))),
+        "alert_weights": rng.random((len(ALERT_TYPES), 6)),
+        "ship_type": rng.integers(N_TYPES, size=n_ships),
+        "lat": lat,
+        "lon": lon,
+        "mission": rng.random(n_ships) < busy,
+        "incident_alert": rng.integers(len(ALERT_TYPES), size=n_incidents),
+        "incident_lat": inc_lat,
+        "incident_lon": inc_lon,
+        "incident_climate": rng.integers(0, 4, size=n_incidents),
+    }
+
+
+def alert_types(scenario: dict) -> List[shipalloc.AlertType]:
+    return [
+        shipalloc.AlertType(name, human_error=w[0], attack=w[1], weather=w[2], robbery=w[3], struck=w[4], resource=w[5])
+        for name, w in zip(ALERT_TYPES, scenario["alert_weights"].tolist())
+    ]
+
+
+def summarize(latencies: List[float], elapsed: float, etas: List[float], allocated: int, unallocated: int,
+              claims: int, lost: int) -> dict:
+    ms = np.asarray(latencies) * 1e3
+    return {
+        "allocated": allocated,
+        "unallocated": unallocated,
+        "latency_ms": {
+            name: float(np.percentile(ms, q)) if len(ms) else None
+            for name, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+        },
+        "throughput_per_s": allocated / elapsed if elapsed else 0.0,
+        "avg_eta_hours": float(np.mean(etas)) if etas else None,
+        "conflict_rate": lost / claims if claims else 0.0,
+        "latencies": latencies,
+        "etas": etas,
+        "elapsed_s": elapsed,
+        "claims": claims,
+        "lost_claims": lost,
+    }
+
+
+# ------------------ ENGINE REPLAY ------------------
+def replay_engine(n_ships: int, args, seed: int) -> dict:
+    scenario = make_scenario(n_ships, args.incidents, seed, args.pattern, args.busy)
+    rows = scenario["ship_type"]
+    fleet = shipalloc.FleetArrays(
+        ids=np.arange(1, n_ships + 1),
+        names=[f"Ship-{i}" for i in range(1, n_ships + 1)],
+        type_names=[f"Type-{t}" for t in rows.tolist()],
+        lat=scenario["lat"],
+        lon=scenario["lon"],
+        speed=scenario["type_speed"][rows],
+        capabilities=scenario["type_capabilities"][rows],
+        type_speed=scenario["type_speed"],
+        type_capabilities=scenario["type_capabilities"],
+    )
+    alerts = alert_types(scenario)
+    free = ~scenario["mission"]
+    latencies, etas = [], []
+    allocated = unallocated = claims = lost = 0
+
+    started = time.perf_counter()
+    for first in range(0, args.incidents, args.concurrency):
+        round_free = free.copy()  # Every request in the round reads the fleet before anyone claims
+        for i in range(first, min(first + args.concurrency, args.incidents)):
+            t0 = time.perf_counter()
+            available = fleet.take(np.flatnonzero(round_free))
+            if args.concurrency == 1:
+                best = shipalloc.process_alert(
+                    alerts[scenario["incident_alert"][i]], scenario["incident_lat"][i], scenario["incident_lon"][i],
+                    int(scenario["incident_climate"][i]), available,
+                )
+                ranked = [best] if best is not None else []
+            else:
+                ranked = shipalloc.rank_alert(
+                    alerts[scenario["incident_alert"][i]], scenario["incident_lat"][i], scenario["incident_lon"][i],
+                    int(scenario["incident_climate"][i]), available, limit=CLAIM_ATTEMPTS,
+                )
+            winner = None
+            for candidate in ranked:
+                claims += 1
+                if free[candidate.ship_id - 1]:
+                    free[candidate.ship_id - 1] = False
+                    winner = candidate
+                    break
+                lost += 1
+            latencies.append(time.perf_counter() - t0)
+            if winner is None:
+                unallocated += 1
+            else:
+                allocated += 1
+                etas.append(winner.time)
+    return summarize(latencies, time.perf_counter() - started, etas, allocated, unallocated, claims, lost)
+
+
+# ------------------ API REPLAY ------------------
+def seed_database(scenario: dict) -> Dict[int, int]:
+    """Write the scenario's fleet into the throwaway database; returns shipid -> ship index."""
+    from sqlalchemy import insert, select
+
+    from database import SessionLocal, engine
+    from models import Alert, AllShip, Base, Ship
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    caps = scenario["type_capabilities"].tolist()
+    with SessionLocal() as db:
+        for t, (speed, c) in enumerate(zip(scenario["type_speed"].tolist(), caps), start=1):
+            # Ship columns follow CAPABILITY_FIELDS: humanalert, attack, climate, robery, resource, struck
+            db.add(Ship(id=t, name=f"Type-{t - 1}", speed=speed, rotation_speed=1.0, humanalert=c[0], attack=c[1],
+                        climate=c[2], robery=c[3], resource=c[4], struck=c[5], ubts=0.0, time=0.0))
+        for a in alert_types(scenario):
+            db.add(Alert(name=a.name, human_error=a.human_error, attack=a.attack, weather=a.weather,
+                         robbery=a.robbery, struck=a.struck, resource=a.resource))
+        db.execute(insert(AllShip), [
+            {"name": f"Ship-{i + 1}", "latitude": la, "longitude": lo, "mission": m, "type": t + 1}
+            for i, (la, lo, m, t) in enumerate(zip(
+                scenario["lat"].tolist(), scenario["lon"].tolist(),
+                scenario["mission"].tolist(), scenario["ship_type"].tolist(),
+            ))
+        ])
+        db.commit()
+        names = db.execute(select(AllShip.shipid, AllShip.name)).all()
+    engine.dispose()
+    return {shipid: int(name.split("-")[1]) - 1 for shipid, name in names}
+
+
+def replay_api(n_ships: int, args, seed: int) -> dict:
+    import httpx
+
+    from benchmarks.async_db import start_server
+
+    scenario = make_scenario(n_ships, args.incidents, seed, args.pattern, args.busy)
+    index = seed_database(scenario)
+    speed = scenario["type_speed"][scenario["ship_type"]]
+    requests = [
+        {"alert_type": ALERT_TYPES[a], "latitude": la, "longitude": lo, "climate_condition": c}
+        for a, la, lo, c in zip(scenario["incident_alert"].tolist(), scenario["incident_lat"].tolist(),
+                                scenario["incident_lon"].tolist(), scenario["incident_climate"].tolist())
+    ]
+    proc, base = start_server(False, DATABASE_URL, args.concurrency)
+    latencies, etas = [], []
+    outcome = {"allocated": 0, "unallocated": 0, "resent": 0}
+    lock = threading.Lock()
+
+    def fire(client: "httpx.Client", body: dict):
+        t0 = time.perf_counter()
+        for _ in range(args.client_retries + 1):
+            r = client.post(f"{base}/trigger", json=body)
+            if r.status_code != 409:
+                break
+            with lock:
+                outcome["resent"] += 1
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            if r.status_code != 200:
+                outcome["unallocated"] += 1
+                return
+            outcome["allocated"] += 1
+            i = index[r.json()["ship_id"]]
+            km = shipalloc.calculate_distance(scenario["lat"][i], scenario["lon"][i], body["latitude"], body["longitude"])
+            etas.append(km / max(speed[i], 1.0))
+
+    try:
+        with httpx.Client(timeout=120.0, limits=httpx.Limits(max_connections=args.concurrency)) as client:
+            client.get(f"{base}/allships/changes", params={"since": 0})  # Warm the fleet cache
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                list(pool.map(lambda body: fire(client, body), requests))
+            elapsed = time.perf_counter() - started
+            server_metrics = {
+                line.split()[0]: int(float(line.split()[1]))
+                for line in client.get(f"{base}/metrics").text.splitlines()
+                if line and not line.startswith("#")
+            }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    lost = server_metrics.get("trigger_claim_conflicts_total", 0)
+    result = summarize(latencies, elapsed, etas, outcome["allocated"], outcome["unallocated"],
+                       outcome["allocated"] + lost, lost)
+    result["resent_409"] = outcome["resent"]
+    result["double_bookings"] = double_bookings()
+    return result
+
+
+# ------------------ DRIVER ------------------
+REPLAYS = {"engine": replay_engine, "api": replay_api}
+
+
+def run_trial(job) -> dict:
+    mode, n_ships, trial, args = job
+    return {"mode": mode, "ships": n_ships, "trial": trial, **REPLAYS[mode](n_ships, args, args.seed + trial)}
+
+
+def combine(trials: List[dict]) -> dict:
+    """One row per (mode, fleet size): latencies pooled over trials, rates over all incidents."""
+    latencies = [x for t in trials for x in t["latencies"]]
+    etas = [x for t in trials for x in t["etas"]]
+    row = summarize(
+        latencies, sum(t["elapsed_s"] for t in trials), etas,
+        sum(t["allocated"] for t in trials), sum(t["unallocated"] for t in trials),
+        sum(t["claims"] for t in trials), sum(t["lost_claims"] for t in trials),
+    )
+    for key in ("latencies", "etas", "elapsed_s", "claims"):
+        del row[key]
+    row = {"mode": trials[0]["mode"], "ships": trials[0]["ships"], "trials": len(trials), **row}
+    row["throughput_per_s"] = float(np.mean([t["throughput_per_s"] for t in trials]))
+    for key in ("resent_409", "double_bookings"):
+        if key in trials[0]:
+            row[key] = sum(t[key] for t in trials)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", nargs="+", choices=sorted(REPLAYS), default=["engine"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="fleet sizes")
+    parser.add_argument("--incidents", type=int, default=500, help="incidents per trial")
+    parser.add_argument("--trials", type=int, default=3, help="Monte Carlo trials per fleet size")
+    parser.add_argument("--concurrency", type=int, default=16, help="allocations in flight at once")
+    parser.add_argument("--pattern", choices=("uniform", "surge"), default="uniform")
+    parser.add_argument("--busy", type=float, default=0.1, help="share of the fleet already on a mission")
+    parser.add_argument("--client-retries", type=int, default=10, help="api mode: resends after a 409")
+    parser.add_argument("--workers", type=int, default=1, help="processes running engine trials in parallel")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write machine-readable results here ('-' for stdout)")
+    args = parser.parse_args()
+
+    rows = []
+    for mode in args.mode:
+        jobs = [(mode, n, trial, args) for n in args.sizes for trial in range(args.trials)]
+        if mode == "engine" and args.workers > 1:
+            with ProcessPoolExecutor(args.workers) as pool:
+                trials = list(pool.map(run_trial, jobs))
+        else:
+            trials = [run_trial(job) for job in jobs]
+        for n in args.sizes:
+            rows.append(combine([t for t in trials if t["ships"] == n]))
+
+    if args.json != "-":
+        print(f"{args.incidents} {args.pattern} incidents x {args.trials} trials, concurrency {args.concurrency}")
+        print(f"{'mode':>6}  {'ships':>7}  {'p50 ms':>7}  {'p90 ms':>7}  {'p99 ms':>7}  {'alloc/s':>8}  "
+              f"{'ETA h':>6}  {'conflicts':>9}  {'unalloc':>7}")
+        for r in rows:
+            lat = r["latency_ms"]
+            print(f"{r['mode']:>6}  {r['ships']:>7}  {lat['p50']:>7.2f}  {lat['p90']:>7.2f}  {lat['p99']:>7.2f}  "
+                  f"{r['throughput_per_s']:>8.1f}  {r['avg_eta_hours']:>6.2f}  {r['conflict_rate']:>9.1%}  "
+                  f"{r['unallocated']:>7}")
+    if args.json:
+        report = {
+            "config": {k: v for k, v in vars(args).items() if k != "json"},
+            "environment": {"python": sys.version.split()[0], "numpy": np.__version__, "platform": platform.platform()},
+            "results": rows,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark: /allships and /trigger throughput from 1 to N worker processes.
+
+Seeds a throwaway SQLite database (WAL mode) and, for each worker count, runs
+the API under `uvicorn --workers N` with WEB_CONCURRENCY=N, which turns on
+fleet sync between the workers and splits DB_MAX_CONNECTIONS among them. Client
+processes then drive one endpoint at a time for --seconds. Reported per
+endpoint: requests per second, p50/p99 latency, the speedup over one worker,
+and for /trigger the 409s returned and the ships double-booked across workers
+(there should be none).
+
+Scaling needs cores: with fewer cores than workers plus client processes, the
+extra workers only share the same CPUs and the speedup flattens. The core count
+is printed first. SQLite also admits one writer at a time, so /trigger claims
+serialize on the database file; a server database scales them further.
+
+Usage:
+    python -m benchmarks.workers [--workers 1 2 4] [--ships 5000] [--seconds 5] [--client-procs 4] [--threads 8]
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+from benchmarks.trigger_load import ALERT_TYPES, DATABASE_URL, HERE, double_bookings, free_port, seed
+
+ENDPOINTS = ("/allships", "/trigger")
+
+
+def start_workers(workers: int, max_connections: int):
+    port = free_port()
+    env = dict(
+        os.environ, DATABASE_URL=DATABASE_URL, WEB_CONCURRENCY=str(workers),
+        DB_MAX_CONNECTIONS=str(max_connections), SIM_AUTOSTART="0",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning", "--timeout-keep-alive", "60"],
+        cwd=HERE, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(f"{base}/alerts", timeout=1.0)
+            # Workers accept connections only once warmed up; give the slower ones a moment
+            time.sleep(0.5 * workers)
+            return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not start")
+
+
+def client_process(base: str, path: str, seconds: float, threads: int, seed_value: int):
+    """Send requests from `threads` threads until the time is up; (latencies, status counts)."""
+    deadline = time.perf_counter() + seconds
+
+    def loop(n: int):
+        rng = random.Random(seed_value * 1000 + n)
+        latencies, statuses = [], Counter()
+        with httpx.Client(base_url=base, timeout=60.0) as client:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                if path == "/trigger":
+                    r = client.post(path, json={
+                        "alert_type": rng.choice(ALERT_TYPES), "latitude": rng.uniform(1, 23),
+                        "longitude": rng.uniform(66, 94), "climate_condition": rng.randint(0, 3),
+                    })
+                else:
+                    r = client.get(path)
+                latencies.append(time.perf_counter() - start)
+                statuses[r.status_code] += 1
+        return latencies, statuses
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(loop, range(threads)))
+    return [x for lat, _ in results for x in lat], sum((s for _, s in results), Counter())
+
+
+def drive(base: str, path: str, args) -> dict:
+    with ProcessPoolExecutor(args.client_procs) as pool:
+        futures = [
+            pool.submit(client_process, base, path, args.seconds, args.threads, i) for i in range(args.client_procs)
+        ]
+        results = [f.result() for f in futures]
+    ms = np.asarray([x for lat, _ in results for x in lat]) * 1e3
+    statuses = sum((s for _, s in results), Counter())
+    return {
+        "per_second": statuses[200] / args.seconds,
+        "p50": float(np.percentile(ms, 50)),
+        "p99": float(np.percentile(ms, 99)),
+        "conflicts": statuses[409],
+        "errors": sum(count for status, count in statuses.items() if status not in (200, 409)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--ships", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=5.0, help="load duration per endpoint")
+    parser.add_argument("--client-procs", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="client threads per client process")
+    parser.add_argument("--max-connections", type=int, default=64, help="DB_MAX_CONNECTIONS for the deployment")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores; {args.client_procs} client processes x {args.threads} threads, "
+          f"{args.seconds:g} s per endpoint, {args.ships} ships")
+    print(f"{'endpoint':<10}  {'workers':>7}  {'req/s':>7}  {'speedup':>7}  {'p50 ms':>7}  {'p99 ms':>7}  "
+          f"{'409s':>5}  {'errors':>6}  {'double':>6}")
+    single = {}
+    for workers in args.workers:
+        seed(args.ships)
+        proc, base = start_workers(workers, args.max_connections)
+        try:
+            for path in ENDPOINTS:
+                s = drive(base, path, args)
+                single.setdefault(path, s["per_second"])
+                double = double_bookings() if path == "/trigger" else 0
+                print(f"{path:<10}  {workers:>7}  {s['per_second']:>7.0f}  {s['per_second'] / single[path]:>6.2f}x  "
+                      f"{s['p50']:>7.2f}  {s['p99']:>7.2f}  {s['conflicts']:>5}  {s['errors']:>6}  {double:>6}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
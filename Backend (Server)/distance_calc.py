@@ -1,5 +1,12 @@
 import math
 
+import numpy as np
+
+from geometry import CompiledPolygon
+import metrics
+import route_planner
+import zones
+
 # -------------------------------
 # Geometry + Utility Functions
 # -------------------------------
@@ -55,128 +62,199 @@ def is_inside_polygon(polygon, point):
 # Path Simulation
 # -------------------------------
 
+class PathSegment:
+    """
+    One straight leg of a voyage. Distance, duration and safety are computed up
+    front; the hourly positions along the leg are only sampled when asked for.
+    """
+
+    def __init__(self, start, end, zone, speed_kmh):
+        self.start = tuple(start)
+        self.end = tuple(end)
+        self.zone = zone
+        self.speed_kmh = speed_kmh
+        self.distance_km = haversine(start[0], start[1], end[0], end[1])
+        self.hours = estimate_travel_time(self.distance_km, speed_kmh)
+        # Exact segment test: also catches crossings shorter than one hour of travel
+        self.safe = not zone.intersects_segment(self.start, self.end)
+        self._samples = None
+
+    def samples(self):
+        """Hourly positions along the leg: (hours, lats, lons, inside-a-zone flags), checked in one vectorized pass."""
+        if self._samples is None:
+            (lat1, lon1), (lat2, lon2) = self.start, self.end
+            total_time = self.hours
+            hours = np.arange(math.ceil(total_time) + 1)
+            fractions = np.minimum(hours / total_time, 1.0) if total_time > 0 else np.ones(len(hours))
+            lats = lat1 + fractions * (lat2 - lat1)
+            lons = lon1 + fractions * (lon2 - lon1)
+            self._samples = (hours, lats, lons, self.zone.contains_many(lats, lons))
+        return self._samples
+
+    def to_dict(self, with_samples: bool = False) -> dict:
+        result = {
+            "start": list(self.start),
+            "end": list(self.end),
+            "distance_km": self.distance_km,
+            "hours": self.hours,
+            "safe": self.safe,
+        }
+        if with_samples:
+            hours, lats, lons, inside = self.samples()
+            result["samples"] = [
+                {"hour": h, "latitude": lat, "longitude": lon, "inside": flag}
+                for h, lat, lon, flag in zip(hours.tolist(), lats.tolist(), lons.tolist(), inside.tolist())
+            ]
+        return result
+
+    def render(self, label="Route") -> str:
+        lines = []
+        lines.append(f"\n=== {label} ===")
+        lines.append(f"Total Distance: {self.distance_km:.2f} km | Estimated Time: {self.hours:.2f} hours")
+        lines.append("Time(h)   Latitude     Longitude     Status")
+        lines.append("---------------------------------------------------")
+
+        hours, lats, lons, inside_flags = self.samples()
+        for h, lat, lon, inside in zip(hours.tolist(), lats.tolist(), lons.tolist(), inside_flags.tolist()):
+            status = "❌ Inside restricted zone" if inside else "✅ Outside"
+            lines.append(f"{h:<8}  {lat:.4f}      {lon:.4f}      {status}")
+
+        if self.safe:
+            lines.append("✅ Path stayed outside the restricted area!")
+        else:
+            lines.append("❌ Path entered restricted region!")
+        return "\n".join(lines)
+
+
 def simulate_path(start, end, polygon, speed_kmh, label="Route"):
     """Simulate movement and check polygon intersection."""
-    lat1, lon1 = start
-    lat2, lon2 = end
-
-    distance = haversine(lat1, lon1, lat2, lon2)
-    total_time = estimate_travel_time(distance, speed_kmh)
-    positions = []
-
-    # Generate intermediate hourly positions
-    for h in range(math.ceil(total_time) + 1):
-        fraction = h / total_time if total_time > 0 else 1.0
-        fraction = min(fraction, 1.0)
-        curr_lat = lat1 + fraction * (lat2 - lat1)
-        curr_lon = lon1 + fraction * (lon2 - lon1)
-        inside = is_inside_polygon(polygon, (curr_lat, curr_lon))
-        positions.append((h, curr_lat, curr_lon, inside))
-
-    # Format output message
-    lines = []
-    lines.append(f"\n=== {label} ===")
-    lines.append(f"Total Distance: {distance:.2f} km | Estimated Time: {total_time:.2f} hours")
-    lines.append("Time(h)   Latitude     Longitude     Status")
-    lines.append("---------------------------------------------------")
-
-    path_inside = False
-    for h, lat, lon, inside in positions:
-        status = "❌ Inside restricted zone" if inside else "✅ Outside"
-        lines.append(f"{h:<8}  {lat:.4f}      {lon:.4f}      {status}")
-        if inside:
-            path_inside = True
-
-    if path_inside:
-        lines.append("❌ Path entered restricted region!")
-    else:
-        lines.append("✅ Path stayed outside the restricted area!")
-
-    return "\n".join(lines), not path_inside, distance
+    # A CompiledPolygon or a whole zones.ZoneSet; plain vertex lists are compiled on the fly
+    zone = polygon if hasattr(polygon, "intersects_segment") else CompiledPolygon(polygon)
+    segment = PathSegment(start, end, zone, speed_kmh)
+    return segment.render(label), segment.safe, segment.distance_km
 
 
 # -------------------------------
-# Simulation Wrapper (Main API)
+# Route Simulation (Main API)
 # -------------------------------
 
-def simulate_movement_with_restrictions(lat1, lon1, lat2, lon2, speed_kmh):
+# RouteSimulation.status values
+ROUTE_OK = "ok"
+ROUTE_ENDPOINT_RESTRICTED = "endpoint_restricted"
+ROUTE_NOT_FOUND = "no_route"
+
+
+class RouteSimulation:
     """
-    Simulate movement between two points at given speed.
-    Includes restricted zone check and alternate routes.
-    Returns formatted output as string.
+    Outcome of moving a ship from start to end: whether it can be done safely,
+    the chosen route (straight or a detour around the zones) as segments, and
+    where the straight track would first enter a restricted zone. Text is only
+    rendered on request.
     """
 
-    polygon = [
-        (23.694119633535138, 68.14149973127236),
-        (20.541614160757753, 70.96869016501113),
-        (20.526351042243512, 72.4975608124518),
-        (17.22712347466089, 72.77693993220252),
-        (7.856392117236889, 77.3557810311827),
-        (9.128111199112015, 78.97345643559729),
-        (8.831075485492525, 79.61637871171075),
-        (5.962310128504571, 79.90673070737493),
-        (6.22008914021468, 81.93919467702402),
-        (7.486424219383046, 81.99104324767832),
-        (10.894681116586904, 79.94820956389837),
-        (15.508653879971105, 80.84765671454751),
-        (19.4308684460504, 85.68628593633235),
-        (21.200457540153735, 88.8313949304925),
-        (21.63084181829822, 89.11274398394436),
-    ]
-
-    safe1 = (7.680220332790962, 77.52410752640004)
-    safe2 = (4.666352644711645, 82.6181597042664)
-
-    output_lines = []
-    inside1 = is_inside_polygon(polygon, (lat1, lon1))
-    inside2 = is_inside_polygon(polygon, (lat2, lon2))
-
-    if inside1 or inside2:
-        return "❌ One or both points are inside the restricted zone. Simulation aborted."
-
-    output_lines.append("✅ Both points are outside restricted zone.\n")
+    def __init__(self, start, end, speed_kmh, status, direct_distance_km, first_crossing=None,
+                 route=None, distance_km=None, segments=None):
+        self.start = tuple(start)
+        self.end = tuple(end)
+        self.speed_kmh = speed_kmh
+        self.status = status
+        self.direct_distance_km = direct_distance_km
+        self.first_crossing = first_crossing  # (fraction along the straight track, point, zone) or None
+        self.route = route or []
+        self.distance_km = distance_km
+        self.segments = segments or []
+
+    @property
+    def safe(self) -> bool:
+        return self.status == ROUTE_OK
+
+    @property
+    def direct_clear(self) -> bool:
+        return self.first_crossing is None
+
+    def summary(self) -> str:
+        if self.status == ROUTE_ENDPOINT_RESTRICTED:
+            return "❌ One or both points are inside the restricted zone. Simulation aborted."
+        if self.status == ROUTE_NOT_FOUND:
+            return "❌ No safe route around the restricted zones."
+        if len(self.route) == 2:
+            return f"✅ Direct route is clear ({self.distance_km:.2f} km)"
+        return f"✅ Safe route found: detour with {len(self.route) - 1} segments, {self.distance_km:.2f} km"
+
+    def to_dict(self, with_samples: bool = False) -> dict:
+        crossing = None
+        if self.first_crossing is not None:
+            fraction, point, zone = self.first_crossing
+            crossing = {
+                "latitude": point[0],
+                "longitude": point[1],
+                "distance_km": fraction * self.direct_distance_km,
+                "zone": zone.name,
+            }
+        return {
+            "status": self.status,
+            "safe": self.safe,
+            "direct_clear": self.direct_clear,
+            "direct_distance_km": self.direct_distance_km,
+            "distance_km": self.distance_km,
+            "route": [list(point) for point in self.route],
+            "segments": [segment.to_dict(with_samples) for segment in self.segments],
+            "first_crossing": crossing,
+        }
+
+    def render(self) -> str:
+        """The full text report, hourly table included."""
+        if self.status == ROUTE_ENDPOINT_RESTRICTED:
+            return self.summary()
+
+        output_lines = ["✅ Both points are outside restricted zone.\n", "==== ROUTE PLANNING ===="]
+        if self.status == ROUTE_NOT_FOUND:
+            output_lines.append(self.summary())
+            output_lines.append("\nSimulation complete.")
+            return "\n".join(output_lines)
+
+        if len(self.route) == 2:
+            output_lines.append("\n🚗 Direct route is clear")
+        else:
+            output_lines.append(f"\n🚗 Detour around restricted zones with {len(self.route) - 1} segments")
+
+        for j, segment in enumerate(self.segments):
+            output_lines.append(segment.render(f"Segment {j+1} of {len(self.segments)}"))
+
+        output_lines.append(f"\nRoute total distance: {self.distance_km:.2f} km")
+        output_lines.append("✅ Safe route found!")
+        output_lines.append("\nSimulation complete.")
+        return "\n".join(output_lines)
+
+
+@metrics.timed("route_simulation")
+def simulate_route(lat1, lon1, lat2, lon2, speed_kmh, zone_set=None) -> RouteSimulation:
+    """
+    Simulate movement between two points at given speed.
+    Includes restricted zone check; blocked routes are re-planned around the zones.
+    """
+    zone_set = zones.registry.current() if zone_set is None else zone_set
     source = (lat1, lon1)
     dest = (lat2, lon2)
+    direct = haversine(lat1, lon1, lat2, lon2)
+    crossing = zone_set.first_crossing(source, dest)
 
-    output_lines.append("==== ROUTE CHECK SEQUENCE ====")
-    if lon1 < lon2:
-        routes = [
-            [source, dest],
-            [source, safe1, dest],
-            [source, safe1, safe2, dest],
-        ]
-    else:
-        routes = [
-            [source, dest],
-            [source, safe2, dest],
-            [source, safe2, safe1, dest],
-        ]
-
-    safe_found = False
-    for i, route in enumerate(routes, 1):
-        if safe_found:
-            output_lines.append("✅ Previous route was safe — skipping remaining routes.")
-            break
-
-        output_lines.append(f"\n🚗 Checking Route {i} with {len(route) - 1} segments")
-        all_safe = True
-        total_dist = 0
-
-        for j in range(len(route) - 1):
-            result_text, safe, dist = simulate_path(
-                route[j], route[j + 1], polygon, speed_kmh, f"Segment {j+1} of Route {i}"
-            )
-            output_lines.append(result_text)
-            total_dist += dist
-            if not safe:
-                all_safe = False
-
-        output_lines.append(f"\nRoute {i} total distance: {total_dist:.2f} km")
-        if all_safe:
-            output_lines.append("✅ Safe route found!")
-            safe_found = True
-        else:
-            output_lines.append("❌ Crosses restricted zone.")
+    if zone_set.contains(lat1, lon1) or zone_set.contains(lat2, lon2):
+        return RouteSimulation(source, dest, speed_kmh, ROUTE_ENDPOINT_RESTRICTED, direct, crossing)
+
+    planned = route_planner.plan_route(zone_set, source, dest)
+    if planned is None:
+        return RouteSimulation(source, dest, speed_kmh, ROUTE_NOT_FOUND, direct, crossing)
 
-    output_lines.append("\nSimulation complete.")
-    return "\n".join(output_lines)
+    route, total_dist = planned
+    segments = [PathSegment(route[j], route[j + 1], zone_set, speed_kmh) for j in range(len(route) - 1)]
+    return RouteSimulation(source, dest, speed_kmh, ROUTE_OK, direct, crossing, route, total_dist, segments)
+
+
+def simulate_movement_with_restrictions(lat1, lon1, lat2, lon2, speed_kmh):
+    """
+    Simulate movement between two points at given speed.
+    Includes restricted zone check; blocked routes are re-planned around the zones.
+    Returns formatted output as string.
+    """
+    return simulate_route(lat1, lon1, lat2, lon2, speed_kmh).render()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+
+# Per-client buffer size and maximum number of concurrent subscribers
+CLIENT_QUEUE_SIZE = int(os.getenv("EVENTS_CLIENT_QUEUE", "256"))
+MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_CLIENTS", "100"))
+
+Event = Tuple[str, dict]
+
+
+# ------------------ SUBSCRIBER ------------------
+class Subscriber:
+    """
+    One connected client's outbox.
+
+    Position updates are coalesced per ship (only the latest one is kept), other
+    events go to a bounded queue. When either buffer overflows, the oldest entries
+    are dropped and the client is sent a single "resync" event telling it to
+    catch up through /allships/changes, so a slow client never blocks publishers.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int = CLIENT_QUEUE_SIZE):
+        self._loop = loop
+        self._max_queue = max_queue
+        self._lock = threading.Lock()
+        self._positions: "OrderedDict[int, dict]" = OrderedDict()
+        self._events: deque = deque()
+        self._needs_resync = False
+        self._signaled = False
+        self._wakeup = asyncio.Event()
+        self.dropped = 0
+
+    def offer(self, kind: str, data: dict, key: Optional[int] = None):
+        """Queue an event; safe to call from any thread and never blocks on the client."""
+        with self._lock:
+            if key is not None:
+                self._positions[key] = data
+                if len(self._positions) > self._max_queue:
+                    self._positions.popitem(last=False)
+                    self._overflow()
+            else:
+                self._events.append((kind, data))
+                if len(self._events) > self._max_queue:
+                    self._events.popleft()
+                    self._overflow()
+
+            if self._signaled:
+                return
+            self._signaled = True
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass  # Event loop already closed; the subscriber is going away
+
+    def _overflow(self):
+        self.dropped += 1
+        self._needs_resync = True
+
+    def _drain(self) -> List[Event]:
+        with self._lock:
+            batch: List[Event] = []
+            if self._needs_resync:
+                batch.append(("resync", {"dropped": self.dropped}))
+                self._needs_resync = False
+            batch.extend(self._events)
+            batch.extend(("ship_position", data) for data in self._positions.values())
+            self._events.clear()
+            self._positions.clear()
+            self._signaled = False
+            self._wakeup.clear()
+            return batch
+
+    async def next_batch(self, timeout: float) -> List[Event]:
+        """Wait up to `timeout` seconds for events and return everything queued."""
+        batch = self._drain()
+        if batch:
+            return batch
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self._drain()
+
+
+# ------------------ BROKER ------------------
+class EventBroker:
+    """Fans out fleet events from the request handlers to every subscribed client."""
+
+    def __init__(self, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> Optional[Subscriber]:
+        """Register a client, or return None if the broker is full."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(loop)
+            self._subscribers.append(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, kind: str, data: dict, key: Optional[int] = None):
+        """Send an event to every client. Events with a key (a ship id) are coalesced per key."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(kind, data, key)
+
+    def publish_position(self, shipid: int, latitude: float, longitude: float, version: int):
+        self.publish(
+            "ship_position",
+            {"shipid": shipid, "latitude": latitude, "longitude": longitude, "version": version},
+            key=shipid,
+        )
+
+
+def format_sse(kind: str, data: dict) -> str:
+    return f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+
+broker = EventBroker()
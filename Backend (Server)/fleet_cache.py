@@ -0,0 +1,478 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import Ship, AllShip
+import shipalloc
+from spatial_index import ShipGridIndex
+
+
+# ------------------ FLEET CACHE ------------------
+class FleetCache:
+    """
+    Process-local mirror of the ship type rows and the AllShip fleet.
+
+    Ship types are loaded once (and reloaded when an unknown type shows up).
+    AllShip positions and mission flags are held in slot-indexed NumPy columns
+    and kept in sync by the write endpoints, so /trigger can build its
+    FleetArrays without querying the database. Every mutation bumps `version`;
+    the snapshot of free ships is rebuilt only when the version has moved.
+
+    The database stays authoritative: allocation still claims the winner with
+    a conditional UPDATE and repairs the cached entry if the claim fails.
+
+    Free ships are also kept in a ShipGridIndex, updated on every move and
+    mission flip, so nearest-candidate lookups never scan the whole fleet.
+
+    The version doubles as a change feed: each ship remembers the version of
+    its last change and deletions leave a tombstone, so changes_since() only
+    walks what moved after a client's version.
+
+    Every worker process has its own cache. Changes made through the public
+    mutations are flagged for fleet_sync to announce to the other workers,
+    and sync() applies what they wrote. Versions therefore only mean something
+    to the process that issued them: each cache counts from a random epoch
+    (epoch * 2**32), so a version from another worker, or from before a
+    restart, falls outside this cache's range and changes_since() answers it
+    with a reset instead of silently skipping what it never saw.
+    """
+
+    # Tombstones kept for changes_since(); older deletions force clients to resync
+    MAX_TOMBSTONES = 10000
+    # Epochs are drawn from 1..2**EPOCH_BITS; versions stay below 2**53, exact in JSON clients
+    EPOCH_BITS = 20
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.epoch = secrets.randbelow(2 ** self.EPOCH_BITS) + 1
+        self.version = self.epoch << 32
+        self._types_stale = True
+        self._unpublished = False  # Changed by this process since take_unpublished()
+        self._removed = False  # Deleted a ship since take_removed()
+        self._read_at: Optional[float] = None  # Wall-clock start of the last full or incremental row read
+
+        # Ship type rows, indexed by "type row" (not by Ship.id)
+        self._type_index: Dict[int, int] = {}
+        self._type_names = np.empty(0, dtype=object)
+        self._type_speed = np.empty(0, dtype=np.float64)
+        self._type_caps = np.empty((0, len(shipalloc.CAPABILITY_FIELDS)), dtype=np.float64)
+
+        # AllShip columns, indexed by slot
+        self._slots: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+        self._size = 0
+        self._allocate(capacity)
+        self.index = ShipGridIndex()
+
+        self._snapshot: Optional[shipalloc.FleetArrays] = None
+        self._snapshot_version = -1
+
+        # Change feed: shipid -> version of last change / deletion, oldest first
+        self._changed: "OrderedDict[int, int]" = OrderedDict()
+        self._deleted: "OrderedDict[int, int]" = OrderedDict()
+        self._floor = self.version  # oldest version changes_since() can answer from
+
+    def _allocate(self, capacity: int):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.names = np.empty(capacity, dtype=object)
+        self.lat = np.zeros(capacity, dtype=np.float64)
+        self.lon = np.zeros(capacity, dtype=np.float64)
+        self.mission = np.zeros(capacity, dtype=bool)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.type_id = np.zeros(capacity, dtype=np.int64)
+        self.type_row = np.full(capacity, -1, dtype=np.int64)
+
+    def _grow(self):
+        old = (self.ids, self.names, self.lat, self.lon, self.mission, self.alive, self.type_id, self.type_row)
+        self._allocate(max(2 * len(self.ids), 1024))
+        new = (self.ids, self.names, self.lat, self.lon, self.mission, self.alive, self.type_id, self.type_row)
+        for src, dst in zip(old, new):
+            dst[:len(src)] = src
+
+    def _bump(self):
+        self.version += 1
+
+    def _touch(self, shipid: int):
+        self._changed[shipid] = self.version
+        self._changed.move_to_end(shipid)
+        self._deleted.pop(shipid, None)
+
+    # ---------- loading ----------
+    def _load_types(self, db: Session):
+        rows = db.query(
+            Ship.id, Ship.name, Ship.speed,
+            Ship.humanalert, Ship.attack, Ship.climate, Ship.robery, Ship.resource, Ship.struck,
+        ).all()
+        self._type_index = {row[0]: i for i, row in enumerate(rows)}
+        self._type_names = np.asarray([row[1] for row in rows], dtype=object)
+        self._type_speed = np.asarray([row[2] or 0.0 for row in rows], dtype=np.float64)
+        self._type_caps = np.asarray(
+            [[v or 0.0 for v in row[3:]] for row in rows], dtype=np.float64
+        ).reshape(len(rows), len(shipalloc.CAPABILITY_FIELDS))
+
+        # Re-resolve every cached ship against the new type rows
+        unresolved = set(np.flatnonzero(self.type_row[:self._size] < 0).tolist())
+        resolved = []
+        for slot in np.flatnonzero(self.alive[:self._size]):
+            self.type_row[slot] = self._type_index.get(int(self.type_id[slot]), -1)
+            if slot in unresolved and self.type_row[slot] >= 0:
+                resolved.append(int(self.ids[slot]))
+        self._types_stale = False
+        return resolved
+
+    def load(self, db: Session):
+        """(Re)load ship types and the whole fleet from the database."""
+        with self._lock:
+            self._read_at = time.time()
+            rows = db.query(
+                AllShip.shipid, AllShip.name, AllShip.latitude, AllShip.longitude, AllShip.mission, AllShip.type
+            ).all()
+            self._slots.clear()
+            self._free_slots.clear()
+            self._size = 0
+            self._allocate(max(1024, 2 * len(rows)))
+            self.index.clear()
+            for shipid, name, lat, lon, mission, type_id in rows:
+                self._set(shipid, name, lat, lon, mission, type_id)
+            self._load_types(db)
+            self.loaded = True
+            self._bump()
+            self._changed.clear()
+            self._deleted.clear()
+            self._floor = self.version
+
+    def ensure_loaded(self, db: Session):
+        with self._lock:
+            if not self.loaded:
+                self.load(db)
+            elif self._types_stale:
+                resolved = self._load_types(db)
+                self._bump()
+                # Ships whose type just became known appear in the change feed now
+                for shipid in resolved:
+                    self._touch(shipid)
+
+    def mark_types_stale(self):
+        """Reload the ship type rows on the next ensure_loaded(), e.g. after they were edited in the database."""
+        with self._lock:
+            self._types_stale = True
+
+    def needs_db(self) -> bool:
+        """Whether the next ensure_loaded() has to query the database."""
+        return not self.loaded or self._types_stale
+
+    def invalidate(self):
+        """Drop everything; the next ensure_loaded() reloads from the database."""
+        with self._lock:
+            self.loaded = False
+            self._snapshot = None
+            self._bump()
+
+    # ---------- mutations ----------
+    def _set(self, shipid, name, lat, lon, mission, type_id):
+        slot = self._slots.get(shipid)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                if self._size == len(self.ids):
+                    self._grow()
+                slot = self._size
+                self._size += 1
+            self._slots[shipid] = slot
+
+        self.ids[slot] = shipid
+        self.names[slot] = name
+        self.lat[slot] = lat or 0.0
+        self.lon[slot] = lon or 0.0
+        self.mission[slot] = bool(mission)
+        self.alive[slot] = True
+        self.type_id[slot] = type_id if type_id is not None else -1
+        type_row = self._type_index.get(type_id, -1)
+        self.type_row[slot] = type_row
+        if type_row < 0 and type_id is not None and self.loaded:
+            self._types_stale = True
+        self._index_slot(slot)
+
+    def _index_slot(self, slot: int):
+        shipid = int(self.ids[slot])
+        if self.alive[slot] and not self.mission[slot]:
+            self.index.upsert(shipid, float(self.lat[slot]), float(self.lon[slot]))
+        else:
+            self.index.remove(shipid)
+
+    def apply_ship(self, allship: AllShip):
+        """Insert or refresh one ship from a committed AllShip row."""
+        with self._lock:
+            self._bump()
+            self._unpublished = True
+            if self.loaded:
+                self._set(
+                    allship.shipid, allship.name, allship.latitude, allship.longitude, allship.mission, allship.type
+                )
+                self._touch(allship.shipid)
+
+    def set_mission(self, shipid: int, mission: bool):
+        with self._lock:
+            self._bump()
+            self._unpublished = True
+            slot = self._slots.get(shipid)
+            if slot is not None:
+                self.mission[slot] = bool(mission)
+                self._index_slot(slot)
+                self._touch(shipid)
+
+    def move_ships(self, shipids: np.ndarray, lats: np.ndarray, lons: np.ndarray):
+        """Apply a batch of committed position updates under a single version bump."""
+        with self._lock:
+            self._bump()
+            self._unpublished = True
+            if not self.loaded:
+                return
+            for shipid, lat, lon in zip(shipids.tolist(), lats.tolist(), lons.tolist()):
+                slot = self._slots.get(shipid)
+                if slot is None:
+                    continue
+                self.lat[slot] = lat
+                self.lon[slot] = lon
+                self._index_slot(slot)
+                self._touch(shipid)
+
+    def remove_ship(self, shipid: int):
+        with self._lock:
+            self._bump()
+            self._unpublished = True
+            self._removed = True
+            self._drop(shipid)
+
+    def _drop(self, shipid: int):
+        slot = self._slots.pop(shipid, None)
+        if slot is not None:
+            self.alive[slot] = False
+            self.names[slot] = None
+            self._free_slots.append(slot)
+            self._changed.pop(shipid, None)
+            self._deleted[shipid] = self.version
+            if len(self._deleted) > self.MAX_TOMBSTONES:
+                _, oldest = self._deleted.popitem(last=False)
+                self._floor = max(self._floor, oldest)
+        self.index.remove(shipid)
+
+    # ---------- other workers ----------
+    def take_unpublished(self) -> bool:
+        """Whether this process changed the fleet since the last call."""
+        with self._lock:
+            unpublished, self._unpublished = self._unpublished, False
+            return unpublished
+
+    def take_removed(self) -> bool:
+        """Whether this process deleted a ship since the last call (other workers need a full sync() to see it)."""
+        with self._lock:
+            removed, self._removed = self._removed, False
+            return removed
+
+    def _settled(self, shipid: int, since: int) -> bool:
+        """Not changed or deleted here after version `since`; a row read since then may predate our commit."""
+        return max(self._changed.get(shipid, 0), self._deleted.get(shipid, 0)) <= since
+
+    def sync(
+        self, db: Session, pinned: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+        full: bool = False, overlap: float = 5.0,
+    ) -> np.ndarray:
+        """
+        Apply ship rows written by other processes and return the ids of the ships
+        that changed. Only ships whose row differs from the cache are updated, so
+        the change feed stays incremental. Ships this process changed after the
+        read started keep their cached state, which is the newer one; `pinned`
+        masks further ships to leave alone (e.g. those the simulator is sailing).
+
+        Normally only rows whose updated_at is at most `overlap` seconds older than
+        the previous read are fetched. The overlap covers writes committed after
+        they were stamped and clock differences between workers; rows read twice
+        simply match the cache. Deleted rows leave nothing to fetch, so `full`
+        reads the whole table and also drops ships whose row is gone.
+        """
+        with self._lock:
+            if not self.loaded:
+                self.load(db)
+                return np.empty(0, dtype=np.int64)
+            start = self.version
+            since = None if full or self._read_at is None else self._read_at - overlap
+        read_at = time.time()
+        query = db.query(
+            AllShip.shipid, AllShip.name, AllShip.latitude, AllShip.longitude, AllShip.mission, AllShip.type
+        )
+        if since is not None:
+            query = query.filter(AllShip.updated_at >= since)
+        rows = query.all()
+        n = len(rows)
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=n)
+        names = np.empty(n, dtype=object)
+        names[:] = [row[1] for row in rows]
+        lat = np.fromiter((row[2] or 0.0 for row in rows), dtype=np.float64, count=n)
+        lon = np.fromiter((row[3] or 0.0 for row in rows), dtype=np.float64, count=n)
+        mission = np.fromiter((bool(row[4]) for row in rows), dtype=bool, count=n)
+        type_id = np.fromiter((-1 if row[5] is None else row[5] for row in rows), dtype=np.int64, count=n)
+
+        with self._lock:
+            if not self.loaded:
+                return np.empty(0, dtype=np.int64)
+            self._read_at = max(self._read_at or read_at, read_at)
+            slots = np.fromiter((self._slots.get(shipid, -1) for shipid in ids.tolist()), dtype=np.int64, count=n)
+            cached = slots >= 0
+            differs = ~cached
+            at = slots[cached]
+            differs[cached] = (
+                (self.names[at] != names[cached]) | (self.lat[at] != lat[cached]) | (self.lon[at] != lon[cached])
+                | (self.mission[at] != mission[cached]) | (self.type_id[at] != type_id[cached])
+            )
+            rows_changed = np.flatnonzero(differs)
+            gone = np.fromiter(set(self._slots) - set(ids.tolist()) if since is None else (), dtype=np.int64)
+            if pinned is not None:
+                rows_changed = rows_changed[~pinned(ids[rows_changed])]
+                gone = gone[~pinned(gone)]
+            rows_changed = [i for i in rows_changed.tolist() if self._settled(int(ids[i]), start)]
+            gone = [shipid for shipid in gone.tolist() if self._settled(shipid, start)]
+            if not rows_changed and not gone:
+                return np.empty(0, dtype=np.int64)
+
+            self._bump()
+            for i in rows_changed:
+                shipid = int(ids[i])
+                self._set(shipid, names[i], lat[i], lon[i], mission[i], None if type_id[i] < 0 else int(type_id[i]))
+                self._touch(shipid)
+            for shipid in gone:
+                self._drop(shipid)
+            return np.asarray([int(ids[i]) for i in rows_changed] + gone, dtype=np.int64)
+
+    # ---------- reads ----------
+    def is_free(self, shipid: int) -> bool:
+        """Whether the cache still sees this ship as available (no DB access)."""
+        with self._lock:
+            slot = self._slots.get(shipid)
+            return slot is not None and not self.mission[slot]
+
+    def positions(self, shipids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Which of these ships are cached, and their cached lat / lon (NaN where unknown)."""
+        with self._lock:
+            slots = np.fromiter((self._slots.get(s, -1) for s in shipids.tolist()), dtype=np.int64, count=len(shipids))
+            known = slots >= 0
+            lat = np.full(len(slots), np.nan)
+            lon = np.full(len(slots), np.nan)
+            lat[known] = self.lat[slots[known]]
+            lon[known] = self.lon[slots[known]]
+            return known, lat, lon
+
+    def speeds(self, shipids: np.ndarray) -> np.ndarray:
+        """Type speed (km/h) of each ship; NaN where the ship or its type is unknown."""
+        with self._lock:
+            slots = np.fromiter((self._slots.get(s, -1) for s in shipids.tolist()), dtype=np.int64, count=len(shipids))
+            speed = np.full(len(slots), np.nan)
+            known = slots >= 0
+            rows = self.type_row[slots[known]]
+            speed[np.flatnonzero(known)[rows >= 0]] = self._type_speed[rows[rows >= 0]]
+            return speed
+
+    def available_fleet(self, db: Session) -> shipalloc.FleetArrays:
+        """FleetArrays of every ship that is not on a mission and has a known type."""
+        with self._lock:
+            self.ensure_loaded(db)
+            return self.free_fleet()
+
+    def free_fleet(self) -> shipalloc.FleetArrays:
+        """Like available_fleet(), from whatever is cached right now (no database access)."""
+        with self._lock:
+            if self._snapshot is not None and self._snapshot_version == self.version:
+                return self._snapshot
+
+            n = self._size
+            idx = np.flatnonzero(self.alive[:n] & ~self.mission[:n] & (self.type_row[:n] >= 0))
+            rows = self.type_row[idx]
+            self._snapshot = shipalloc.FleetArrays(
+                ids=self.ids[idx],
+                names=self.names[idx],
+                type_names=self._type_names[rows],
+                lat=self.lat[idx],
+                lon=self.lon[idx],
+                speed=self._type_speed[rows],
+                capabilities=self._type_caps[rows],
+                type_speed=self._type_speed,
+                type_capabilities=self._type_caps,
+            )
+            self._snapshot_version = self.version
+            return self._snapshot
+
+    def _ship_state(self, slot: int) -> dict:
+        return {
+            "shipid": int(self.ids[slot]),
+            "name": self.names[slot],
+            "type": int(self.type_id[slot]),
+            "longitude": float(self.lon[slot]),
+            "latitude": float(self.lat[slot]),
+            "mission": bool(self.mission[slot]),
+        }
+
+    def changes_since(self, db: Session, since: int) -> dict:
+        """
+        Ships changed (or added) and deleted after version `since`, plus the current version.
+        When `since` is older than the retained history, or not from this cache at all
+        (another worker's or a previous process's epoch), the whole fleet is returned
+        with reset=True and the client should replace its state.
+        Ships without a known type are left out, as in /allships.
+        """
+        with self._lock:
+            self.ensure_loaded(db)
+            if since < self._floor or since > self.version:
+                slots = np.flatnonzero(self.alive[:self._size] & (self.type_row[:self._size] >= 0))
+                return {
+                    "version": self.version,
+                    "reset": True,
+                    "changed": [self._ship_state(slot) for slot in slots],
+                    "deleted": [],
+                }
+
+            changed = []
+            for shipid, version in reversed(self._changed.items()):
+                if version <= since:
+                    break
+                slot = self._slots[shipid]
+                if self.type_row[slot] >= 0:
+                    changed.append(self._ship_state(slot))
+            deleted = []
+            for shipid, version in reversed(self._deleted.items()):
+                if version <= since:
+                    break
+                deleted.append(shipid)
+            return {"version": self.version, "reset": False, "changed": changed, "deleted": deleted}
+
+    def nearest_fleet(self, lat: float, lon: float, k: int) -> Tuple[shipalloc.FleetArrays, float, float]:
+        """
+        The k free ships nearest to (lat, lon) as FleetArrays, the distance of the k-th,
+        and a bound on the farthest free ship. Matches shipalloc.NearestFn; call
+        available_fleet() first so the cache is loaded.
+        """
+        with self._lock:
+            hits = self.index.nearest(lat, lon, k)
+            slots = np.asarray([self._slots[shipid] for shipid, _ in hits], dtype=np.int64)
+            slots = slots[self.type_row[slots] >= 0]
+            rows = self.type_row[slots]
+            candidates = shipalloc.FleetArrays(
+                ids=self.ids[slots],
+                names=self.names[slots],
+                type_names=self._type_names[rows],
+                lat=self.lat[slots],
+                lon=self.lon[slots],
+                speed=self._type_speed[rows],
+                capabilities=self._type_caps[rows],
+            )
+            kth_distance = hits[-1][1] if hits else 0.0
+            return candidates, kth_distance, self.index.farthest_bound(lat, lon)
+
+
+fleet = FleetCache()
@@ -0,0 +1,147 @@
+import os
+import threading
+from typing import Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import database
+import events
+import fleet_cache
+import metrics
+import response_cache
+import simulator
+from database import SessionLocal
+
+# Keep the fleet caches of several worker processes in step (default: on when WEB_CONCURRENCY > 1)
+FLEET_SYNC = os.getenv("FLEET_SYNC", "1" if database.WEB_CONCURRENCY > 1 else "0").lower() in ("1", "true", "yes")
+# Seconds between announcing this worker's fleet changes and looking for other workers'
+FLEET_SYNC_INTERVAL = float(os.getenv("FLEET_SYNC_INTERVAL", "0.5"))
+# Seconds re-read before the previous round's read, for writes committed late or stamped by a skewed clock
+FLEET_SYNC_OVERLAP = float(os.getenv("FLEET_SYNC_OVERLAP", "5.0"))
+
+PUBLISHED = metrics.registry.counter("fleet_sync_published_total", "Fleet change announcements made by this worker")
+RUNS = metrics.registry.counter("fleet_sync_runs_total", "Fleet reads after another worker announced changes")
+FULL_RUNS = metrics.registry.counter("fleet_sync_full_runs_total", "Fleet reads of the whole ship table (after deletions)")
+SHIPS = metrics.registry.counter("fleet_sync_ships_total", "Ships updated from changes made by other workers")
+FAILURES = metrics.registry.counter("fleet_sync_failures_total", "Fleet sync rounds that hit a database error")
+
+
+# ------------------ FLEET SYNC ------------------
+class FleetSync:
+    """
+    Cache coherency between worker processes, over the shared "fleet" counter in
+    the cache_versions table (see response_cache.VersionBoard).
+
+    Each round, a worker that changed its fleet cache bumps the counter once,
+    however many changes it made, and a worker that sees the counter moved by
+    someone else reads the ship rows written since its last read and applies
+    the ones that differ (FleetCache.sync). A claim or move therefore reaches
+    every worker within about two intervals. Deletions cannot be found that
+    way; they also bump the "fleet_rows" counter, and a worker that sees it
+    move reads the whole table once. Ships this worker's simulator is sailing are left
+    alone; their positions come from the voyage. Remote moves are passed on to
+    this worker's /events clients.
+
+    Ship type rows are reloaded when the "ships" counter moves.
+    """
+
+    def __init__(self, fleet: fleet_cache.FleetCache, versions: response_cache.VersionBoard,
+                 interval: float = FLEET_SYNC_INTERVAL, overlap: float = FLEET_SYNC_OVERLAP):
+        self.fleet = fleet
+        self.versions = versions
+        self.interval = interval
+        self.overlap = overlap
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._seen: Optional[int] = None
+        self._types_seen: Optional[int] = None
+        self._rows_seen: Optional[int] = None
+
+    def mark_seen(self):
+        """Take the current counters as already applied; call before loading the fleet."""
+        with self._lock:
+            self._seen = self.versions.refresh(response_cache.FLEET)
+            self._types_seen = self.versions.refresh(response_cache.SHIP_TYPES)
+            self._rows_seen = self.versions.refresh(response_cache.FLEET_ROWS)
+
+    def step(self):
+        """One round: announce our changes, then apply other workers'."""
+        with self._lock:
+            if self.fleet.take_removed():
+                self.versions.bump(response_cache.FLEET_ROWS)
+                rows_version = self.versions.refresh(response_cache.FLEET_ROWS)
+                if self._rows_seen is not None and rows_version == self._rows_seen + 1:
+                    self._rows_seen = rows_version  # Our own deletions are already applied
+            else:
+                rows_version = self.versions.refresh(response_cache.FLEET_ROWS)
+            full = rows_version != self._rows_seen
+
+            if self.fleet.take_unpublished():
+                self.versions.bump(response_cache.FLEET)
+                PUBLISHED.inc()
+                version = self.versions.refresh(response_cache.FLEET)
+                if self._seen is not None and version == self._seen + 1:
+                    self._seen = version  # Only our own bump since the last round
+            else:
+                version = self.versions.refresh(response_cache.FLEET)
+
+            types_version = self.versions.refresh(response_cache.SHIP_TYPES)
+            if types_version != self._types_seen:
+                self.fleet.mark_types_stale()
+                self._types_seen = types_version
+
+            if version == self._seen and not full:
+                return
+            with SessionLocal() as db:
+                self.fleet.ensure_loaded(db)
+                changed = self.fleet.sync(
+                    db, pinned=lambda shipids: simulator.engine.positions(shipids)[0], full=full, overlap=self.overlap
+                )
+            self._seen = version
+            self._rows_seen = rows_version
+        RUNS.inc()
+        if full:
+            FULL_RUNS.inc()
+        SHIPS.inc(len(changed))
+        if len(changed):
+            known, lats, lons = self.fleet.positions(changed)
+            version = self.fleet.version
+            for shipid, lat, lon in zip(changed[known].tolist(), lats[known].tolist(), lons[known].tolist()):
+                events.broker.publish_position(shipid, lat, lon, version)
+
+    # ---------- background loop ----------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fleet-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the loop and announce what is left, so other workers do not miss our last changes."""
+        thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self._thread = None
+            if self.fleet.take_removed():
+                self.versions.bump(response_cache.FLEET_ROWS)
+            if self.fleet.take_unpublished():
+                self.versions.bump(response_cache.FLEET)
+                PUBLISHED.inc()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except SQLAlchemyError:
+                # The database is unreachable; try again next round
+                FAILURES.inc()
+
+
+sync = FleetSync(fleet_cache.fleet, response_cache.versions)
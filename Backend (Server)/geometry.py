@@ -0,0 +1,153 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+Point = Tuple[float, float]
+
+# Points per chunk in contains_many(); keeps the points x edges matrix small
+_CHUNK = 4096
+
+
+def _cross(ax, ay, bx, by, cx, cy) -> float:
+    """Cross product (b - a) x (c - a): > 0 left turn, < 0 right turn, 0 collinear."""
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+def _between(ax, ay, bx, by, cx, cy) -> bool:
+    """For collinear a, b, c: is c within the bounding box of segment a-b?"""
+    return min(ax, bx) <= cx <= max(ax, bx) and min(ay, by) <= cy <= max(ay, by)
+
+
+def segments_cross(px, py, qx, qy, x1, y1, x2, y2) -> np.ndarray:
+    """
+    Vectorized form of the segment test in CompiledPolygon.intersects_segment():
+    does segment p -> q cross or touch edge (x1, y1) -> (x2, y2)? Arguments broadcast.
+    """
+    o1 = np.sign(_cross(px, py, qx, qy, x1, y1))
+    o2 = np.sign(_cross(px, py, qx, qy, x2, y2))
+    o3 = np.sign(_cross(x1, y1, x2, y2, px, py))
+    o4 = np.sign(_cross(x1, y1, x2, y2, qx, qy))
+
+    def between(ax, ay, bx, by, cx, cy):
+        return (np.minimum(ax, bx) <= cx) & (cx <= np.maximum(ax, bx)) & (np.minimum(ay, by) <= cy) & (cy <= np.maximum(ay, by))
+
+    return (
+        ((o1 * o2 < 0) & (o3 * o4 < 0))
+        | ((o1 == 0) & between(px, py, qx, qy, x1, y1))
+        | ((o2 == 0) & between(px, py, qx, qy, x2, y2))
+        | ((o3 == 0) & between(x1, y1, x2, y2, px, py))
+        | ((o4 == 0) & between(x1, y1, x2, y2, qx, qy))
+    )
+
+
+def segment_hit_fractions(px, py, qx, qy, x1, y1, x2, y2) -> np.ndarray:
+    """
+    How far along p -> q (0 at p, 1 at q) the segment meets each edge (x1, y1) -> (x2, y2);
+    inf where it does not. Edges parallel to the segment count as not met.
+    """
+    dx, dy = qx - px, qy - py
+    ex, ey = x2 - x1, y2 - y1
+    ax, ay = x1 - px, y1 - py
+    denom = dx * ey - dy * ex
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (ax * ey - ay * ex) / denom
+        u = (ax * dy - ay * dx) / denom
+    return np.where((denom != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1), t, np.inf)
+
+
+# ------------------ COMPILED POLYGON ------------------
+class CompiledPolygon:
+    """
+    A polygon prepared once for repeated spatial tests.
+
+    Vertices are (lat, lon) pairs, treated as planar coordinates exactly like
+    distance_calc.is_inside_polygon(). The bounding box and edge arrays are
+    built up front, so every query starts with a cheap bbox reject; batches
+    of points are then tested against all edges in one vectorized pass.
+    """
+
+    def __init__(self, vertices: Sequence[Point]):
+        if len(vertices) < 3:
+            raise ValueError("A polygon needs at least three vertices")
+        v = np.asarray(vertices, dtype=np.float64)
+        self.vertices = v
+        self.x1, self.y1 = v[:, 0], v[:, 1]
+        self.x2, self.y2 = np.roll(v[:, 0], -1), np.roll(v[:, 1], -1)
+        self.min_x, self.min_y = v.min(axis=0).tolist()
+        self.max_x, self.max_y = v.max(axis=0).tolist()
+
+        # Edges that are not horizontal, with the slope term used by the ray cast
+        dy = self.y2 - self.y1
+        self._dx_over_dy = np.divide(self.x2 - self.x1, dy, out=np.zeros_like(dy), where=dy != 0)
+
+        # Plain tuples for single-point / single-segment queries, where NumPy call
+        # overhead would dominate on polygons with tens of edges
+        self._edges = list(zip(self.x1.tolist(), self.y1.tolist(), self.x2.tolist(), self.y2.tolist(),
+                               self._dx_over_dy.tolist()))
+
+    @property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        return self.min_x, self.min_y, self.max_x, self.max_y
+
+    def _in_bbox(self, x: float, y: float) -> bool:
+        return self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y
+
+    def contains(self, lat: float, lon: float) -> bool:
+        """Ray-cast test for one point."""
+        if not self._in_bbox(lat, lon):
+            return False
+        inside = False
+        for x1, y1, _, y2, slope in self._edges:
+            if (y1 > lon) != (y2 > lon) and lat < slope * (lon - y1) + x1:
+                inside = not inside
+        return inside
+
+    def contains_many(self, lats, lons) -> np.ndarray:
+        """Ray-cast test for many points at once; returns a boolean array."""
+        x = np.asarray(lats, dtype=np.float64).ravel()
+        y = np.asarray(lons, dtype=np.float64).ravel()
+        inside = np.zeros(x.shape, dtype=bool)
+
+        candidates = np.flatnonzero(
+            (x >= self.min_x) & (x <= self.max_x) & (y >= self.min_y) & (y <= self.max_y)
+        )
+        for start in range(0, len(candidates), _CHUNK):
+            idx = candidates[start:start + _CHUNK]
+            px, py = x[idx, None], y[idx, None]
+            crosses = ((self.y1 > py) != (self.y2 > py)) & (px < self._dx_over_dy * (py - self.y1) + self.x1)
+            inside[idx] = (np.count_nonzero(crosses, axis=1) & 1).astype(bool)
+        return inside
+
+    def segment_bbox_overlaps(self, start: Point, end: Point) -> bool:
+        return not (
+            max(start[0], end[0]) < self.min_x or min(start[0], end[0]) > self.max_x
+            or max(start[1], end[1]) < self.min_y or min(start[1], end[1]) > self.max_y
+        )
+
+    def intersects_segment(self, start: Point, end: Point) -> bool:
+        """
+        Exact test: does the straight segment start -> end touch or enter the polygon?
+        Unlike sampling points along the way, this cannot miss a short crossing.
+        """
+        if not self.segment_bbox_overlaps(start, end):
+            return False
+        if self.contains(*start) or self.contains(*end):
+            return True
+
+        px, py = start
+        qx, qy = end
+        for x1, y1, x2, y2, _ in self._edges:
+            o1 = _cross(px, py, qx, qy, x1, y1)
+            o2 = _cross(px, py, qx, qy, x2, y2)
+            o3 = _cross(x1, y1, x2, y2, px, py)
+            o4 = _cross(x1, y1, x2, y2, qx, qy)
+            if ((o1 > 0 > o2) or (o1 < 0 < o2)) and ((o3 > 0 > o4) or (o3 < 0 < o4)):
+                return True
+            if (
+                (o1 == 0 and _between(px, py, qx, qy, x1, y1))
+                or (o2 == 0 and _between(px, py, qx, qy, x2, y2))
+                or (o3 == 0 and _between(x1, y1, x2, y2, px, py))
+                or (o4 == 0 and _between(x1, y1, x2, y2, qx, qy))
+            ):
+                return True
+        return False
@@ -0,0 +1,400 @@
+import math
+import os
+import secrets
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; there only one process may use a HISTORY_DIR
+    fcntl = None
+
+# Where position history lives, how much time one partition covers, and how long it is kept (0 = forever)
+HISTORY_DIR = os.getenv("HISTORY_DIR", "position_history")
+HISTORY_PARTITION_SECONDS = int(os.getenv("HISTORY_PARTITION_SECONDS", "3600"))
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+# Buffered positions are written out every interval, or sooner once this many are waiting
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0"))
+HISTORY_BUFFER_MAX = int(os.getenv("HISTORY_BUFFER_MAX", "200000"))
+# A partition is sorted and indexed once it has been closed this long (late reports still land in it)
+HISTORY_SEAL_DELAY = float(os.getenv("HISTORY_SEAL_DELAY", "120"))
+
+# One file per column; lat / lon as float32 are good to about a metre
+COLUMNS = (("ship_id", np.int32), ("ts", np.float64), ("lat", np.float32), ("lon", np.float32))
+
+Columns = Dict[str, np.ndarray]
+Box = Tuple[float, float, float, float]
+
+
+def _empty() -> Columns:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+
+
+def _concat(parts: List[Columns]) -> Columns:
+    if not parts:
+        return _empty()
+    return {name: np.concatenate([p[name] for p in parts]).astype(dtype, copy=False) for name, dtype in COLUMNS}
+
+
+def _take(cols: Columns, idx) -> Columns:
+    return {name: cols[name][idx] for name, _ in COLUMNS}
+
+
+@contextmanager
+def _shared_dir(root: str, exclusive: bool):
+    """
+    Inter-process lock on a history directory (flock on its .lock file): worker
+    processes append and query under the shared lock, and the one sealing or
+    expiring partitions holds it exclusively.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(root, exist_ok=True)
+    fd = os.open(os.path.join(root, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)  # Releases the lock
+
+
+# ------------------ CHUNKS ------------------
+class Chunk:
+    """
+    One column set on disk. An "append" chunk is unsorted and only ever appended
+    to; a "sorted" chunk is ordered by (ship_id, ts) and carries a CSR index
+    (distinct ship ids plus their start offsets) so a ship's rows are one slice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sorted = os.path.exists(os.path.join(path, "ships.bin"))
+
+    def _column(self, name: str, dtype) -> np.ndarray:
+        path = os.path.join(self.path, f"{name}.bin")
+        # Another process may be creating the chunk; a column it has not written yet is empty
+        size = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+        if not size:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(size,))
+
+    def open(self) -> Columns:
+        """Memory-map the columns; the maps stay valid even if the files are later replaced."""
+        cols = {name: self._column(name, dtype) for name, dtype in COLUMNS}
+        n = min(len(c) for c in cols.values())  # A crash mid-flush can leave one column longer
+        cols = {name: c[:n] for name, c in cols.items()}
+        if self.sorted:
+            cols["_ships"] = self._column("ships", np.int32)
+            cols["_offsets"] = self._column("offsets", np.int64)
+        return cols
+
+    @staticmethod
+    def append(path: str, cols: Columns):
+        os.makedirs(path, exist_ok=True)
+        for name, dtype in COLUMNS:
+            with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                f.write(np.ascontiguousarray(cols[name], dtype=dtype).tobytes())
+
+    @staticmethod
+    def write_sorted(path: str, cols: Columns):
+        order = np.lexsort((cols["ts"], cols["ship_id"]))
+        cols = _take(cols, order)
+        Chunk.append(path, cols)
+        ships, offsets = np.unique(cols["ship_id"], return_index=True)
+        with open(os.path.join(path, "ships.bin"), "wb") as f:
+            f.write(ships.astype(np.int32).tobytes())
+        with open(os.path.join(path, "offsets.bin"), "wb") as f:
+            f.write(np.append(offsets, len(order)).astype(np.int64).tobytes())
+
+
+def _ship_rows(cols: Columns, shipid: int) -> Columns:
+    if "_ships" in cols:
+        i = int(np.searchsorted(cols["_ships"], shipid))
+        if i == len(cols["_ships"]) or cols["_ships"][i] != shipid:
+            return _empty()
+        sl = slice(int(cols["_offsets"][i]), int(cols["_offsets"][i + 1]))
+        return {name: np.asarray(cols[name][sl]) for name, _ in COLUMNS}
+    return _take(cols, np.flatnonzero(cols["ship_id"] == shipid))
+
+
+def _in_window(cols: Columns, t0: float, t1: float) -> Columns:
+    ts = np.asarray(cols["ts"])
+    return _take(cols, np.flatnonzero((ts >= t0) & (ts <= t1)))
+
+
+def coordinates(cols: Columns) -> Tuple[List[float], List[float]]:
+    """Latitudes and longitudes as plain floats, rounded to the stored (float32) precision."""
+    return (
+        cols["lat"].astype(np.float64).round(5).tolist(),
+        cols["lon"].astype(np.float64).round(5).tolist(),
+    )
+
+
+# ------------------ DOWNSAMPLING ------------------
+def downsample_track(ts: np.ndarray, count: int) -> np.ndarray:
+    """Indexes of at most `count` points spread evenly over the time span, keeping both ends."""
+    n = len(ts)
+    if count <= 0 or n <= count:
+        return np.arange(n)
+    if count == 1:
+        return np.array([n - 1])
+    # Last point of each of `count - 1` equal time buckets, plus the first point
+    edges = np.linspace(ts[0], ts[-1], count)
+    idx = np.searchsorted(ts, edges[1:], side="right") - 1
+    return np.unique(np.concatenate(([0], idx, [n - 1])))
+
+
+def thin_to_grid(lat: np.ndarray, lon: np.ndarray, box: Box, count: int) -> np.ndarray:
+    """Indexes keeping at most one point per cell of a grid of about `count` cells over the box."""
+    if count <= 0 or len(lat) <= count:
+        return np.arange(len(lat))
+    side = max(1, int(math.sqrt(count)))
+    min_lat, min_lon, max_lat, max_lon = box
+    row = np.clip(((lat - min_lat) / max(max_lat - min_lat, 1e-9) * side).astype(np.int64), 0, side - 1)
+    col = np.clip(((lon - min_lon) / max(max_lon - min_lon, 1e-9) * side).astype(np.int64), 0, side - 1)
+    _, first = np.unique(row * side + col, return_index=True)
+    return np.sort(first)
+
+
+# ------------------ STORE ------------------
+class PositionHistory:
+    """
+    Append-only position history, partitioned by time into columnar files.
+
+    append() only queues the positions in memory; a background thread writes
+    them out every flush interval, appending each position to the partition of
+    its report time. Partitions that have been closed for a while are rewritten
+    sorted by (ship_id, ts) with a per-ship index, so a ship's track is a binary
+    search plus one contiguous read per partition. Queries also see positions
+    that are still buffered.
+
+    Several worker processes can share one directory: each appends to its own
+    chunk in a partition, and _shared_dir() keeps sealing and expiry (done by
+    whichever process gets there first) from racing the others' appends and
+    reads.
+    """
+
+    def __init__(
+        self,
+        root: str = HISTORY_DIR,
+        partition_seconds: int = HISTORY_PARTITION_SECONDS,
+        retention_days: float = HISTORY_RETENTION_DAYS,
+        flush_interval: float = HISTORY_FLUSH_INTERVAL,
+        buffer_max: int = HISTORY_BUFFER_MAX,
+        seal_delay: float = HISTORY_SEAL_DELAY,
+    ):
+        self.root = root
+        self.partition_seconds = partition_seconds
+        self.retention = retention_days * 86400.0
+        self.flush_interval = flush_interval
+        self.buffer_max = buffer_max
+        self.seal_delay = seal_delay
+        self._buffer_lock = threading.Lock()
+        self._buffer: List[Columns] = []
+        self._buffered = 0
+        self._files_lock = threading.RLock()  # Held while chunks are written, replaced or opened
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._append_name: Optional[str] = None
+        self._append_pid: Optional[int] = None
+        self.flushed = 0
+
+    # ---------- write path ----------
+    def append(self, shipids, lats, lons, ts=None):
+        """Queue positions (ts in Unix seconds; missing or NaN means now). Never touches the disk."""
+        shipids = np.asarray(shipids, dtype=np.int32).ravel()
+        if not len(shipids):
+            return
+        now = time.time()
+        if ts is None:
+            ts = np.full(len(shipids), now)
+        ts = np.asarray(ts, dtype=np.float64).ravel()
+        ts = np.where(np.isfinite(ts), ts, now)
+        cols = {
+            "ship_id": shipids,
+            "ts": ts,
+            "lat": np.asarray(lats, dtype=np.float32).ravel(),
+            "lon": np.asarray(lons, dtype=np.float32).ravel(),
+        }
+        with self._buffer_lock:
+            self._buffer.append(cols)
+            self._buffered += len(shipids)
+            full = self._buffered >= self.buffer_max
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._buffer_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="position-history", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError:
+                pass  # Unwritten positions were queued again; retry on the next round
+
+    def _drain(self) -> Columns:
+        with self._buffer_lock:
+            parts, self._buffer, self._buffered = self._buffer, [], 0
+        return _concat(parts)
+
+    def _partition_dir(self, start: int) -> str:
+        return os.path.join(self.root, str(start))
+
+    def _append_chunk(self) -> str:
+        """This process's append chunk name; new per process, so a crashed writer's torn chunk is never extended."""
+        if self._append_pid != os.getpid():
+            self._append_name = f"append-{os.getpid()}-{secrets.token_hex(4)}"
+            self._append_pid = os.getpid()
+        return self._append_name
+
+    @staticmethod
+    def _chunk_names(path: str) -> List[str]:
+        """The sorted chunk (if any) and every process's append chunk of a partition."""
+        if not os.path.isdir(path):
+            return []
+        names = sorted(name for name in os.listdir(path) if name.startswith("append"))
+        return (["sorted"] if os.path.isdir(os.path.join(path, "sorted")) else []) + names
+
+    def flush(self):
+        """Write buffered positions to their partitions, then seal and expire old partitions."""
+        with self._files_lock:
+            # Drained under the files lock so a query never misses positions in flight
+            cols = self._drain()
+            if len(cols["ship_id"]):
+                part = (cols["ts"] // self.partition_seconds).astype(np.int64) * self.partition_seconds
+                starts = np.unique(part).tolist()
+                with _shared_dir(self.root, exclusive=False):
+                    for i, start in enumerate(starts):
+                        try:
+                            Chunk.append(
+                                os.path.join(self._partition_dir(start), self._append_chunk()), _take(cols, part == start)
+                            )
+                        except OSError:
+                            with self._buffer_lock:
+                                self._buffer.insert(0, _take(cols, np.isin(part, starts[i:])))
+                                self._buffered += int(np.isin(part, starts[i:]).sum())
+                            raise
+                        self.flushed += int((part == start).sum())
+            self._maintain(time.time())
+
+    def _partitions(self) -> List[int]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(int(name) for name in os.listdir(self.root) if name.isdigit())
+
+    def _due(self, now: float) -> List[Tuple[int, bool]]:
+        """(partition, expire) for every partition to expire (True) or seal (False)."""
+        due = []
+        for start in self._partitions():
+            end = start + self.partition_seconds
+            if self.retention and end < now - self.retention:
+                due.append((start, True))
+            elif end < now - self.seal_delay and any(
+                name.startswith("append") for name in self._chunk_names(self._partition_dir(start))
+            ):
+                due.append((start, False))
+        return due
+
+    def _maintain(self, now: float):
+        # Checked without the inter-process lock first, so idle rounds never block other workers
+        if not self._due(now):
+            return
+        with _shared_dir(self.root, exclusive=True):
+            for start, expire in self._due(now):  # Another worker may have done it meanwhile
+                path = self._partition_dir(start)
+                if expire:
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    self._seal(path)
+
+    def _seal(self, path: str):
+        """Merge the partition's append chunks into its sorted chunk."""
+        names = self._chunk_names(path)
+        cols = _concat([
+            {name: np.asarray(c[name]) for name, _ in COLUMNS}
+            for c in (Chunk(os.path.join(path, chunk)).open() for chunk in names)
+        ])
+        tmp = os.path.join(path, "sorted.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        Chunk.write_sorted(tmp, cols)
+        old = os.path.join(path, "sorted.old")
+        if os.path.isdir(os.path.join(path, "sorted")):
+            os.replace(os.path.join(path, "sorted"), old)
+        os.replace(tmp, os.path.join(path, "sorted"))
+        shutil.rmtree(old, ignore_errors=True)
+        for name in names:
+            if name.startswith("append"):
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    def close(self):
+        """Stop the background thread and write out whatever is buffered."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    # ---------- read path ----------
+    def _open_window(self, t0: float, t1: float) -> List[Columns]:
+        """Column maps of every chunk whose partition overlaps [t0, t1], plus the unflushed buffer."""
+        first = math.floor(t0 / self.partition_seconds) * self.partition_seconds
+        with self._files_lock:
+            opened = []
+            with _shared_dir(self.root, exclusive=False):
+                for start in self._partitions():
+                    if start < first or start > t1:
+                        continue
+                    path = self._partition_dir(start)
+                    opened.extend(Chunk(os.path.join(path, name)).open() for name in self._chunk_names(path))
+            with self._buffer_lock:
+                opened.extend(dict(part) for part in self._buffer)
+        return opened
+
+    def track(self, shipid: int, t0: float, t1: float, max_points: int = 0) -> Tuple[Columns, int]:
+        """A ship's positions in [t0, t1] by time, downsampled to max_points (0 = all), and the full count."""
+        rows = _concat([_in_window(_ship_rows(cols, shipid), t0, t1) for cols in self._open_window(t0, t1)])
+        order = np.argsort(rows["ts"], kind="stable")
+        rows = _take(rows, order)
+        total = len(order)
+        return _take(rows, downsample_track(rows["ts"], max_points)), total
+
+    def positions_at(self, t: float, box: Box, lookback: float, max_points: int = 0) -> Tuple[Columns, int]:
+        """
+        Each ship's last position at or before t (looking back at most `lookback`
+        seconds) that lies inside box, thinned to about max_points for map rendering.
+        """
+        rows = _concat([_in_window(cols, t - lookback, t) for cols in self._open_window(t - lookback, t)])
+        # Latest report per ship
+        order = np.lexsort((rows["ts"], rows["ship_id"]))
+        ids = rows["ship_id"][order]
+        last = np.ones(len(ids), dtype=bool)
+        last[:-1] = ids[1:] != ids[:-1]
+        rows = _take(rows, order[last])
+
+        min_lat, min_lon, max_lat, max_lon = box
+        inside = (
+            (rows["lat"] >= min_lat) & (rows["lat"] <= max_lat) & (rows["lon"] >= min_lon) & (rows["lon"] <= max_lon)
+        )
+        rows = _take(rows, np.flatnonzero(inside))
+        total = len(rows["ship_id"])
+        return _take(rows, thin_to_grid(rows["lat"], rows["lon"], box, max_points)), total
+
+
+store = PositionHistory()
@@ -0,0 +1,229 @@
+import json
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, or_, select
+from sqlalchemy.orm import Session
+
+from models import AllShip
+from zones import ZoneSet
+
+# Binary batch record: little-endian int32 ship id, then float64 latitude, longitude
+# and report time (Unix seconds), 28 bytes per position with no header
+RECORD_DTYPE = np.dtype([("ship_id", "<i4"), ("lat", "<f8"), ("lon", "<f8"), ("ts", "<f8")])
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+BINARY_TYPES = ("application/octet-stream",)
+
+
+class IngestError(ValueError):
+    """A batch that cannot be parsed at all (as opposed to individual bad positions)."""
+
+
+class UnsupportedFormat(IngestError):
+    pass
+
+
+class PositionBatch(NamedTuple):
+    ship_id: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    ts: np.ndarray  # NaN where the report had no time
+
+    def __len__(self) -> int:
+        return len(self.ship_id)
+
+    def take(self, idx) -> "PositionBatch":
+        return PositionBatch(self.ship_id[idx], self.lat[idx], self.lon[idx], self.ts[idx])
+
+
+# ------------------ PARSING ------------------
+def parse_ndjson(body: bytes) -> PositionBatch:
+    """One JSON object per line: {"ship_id", "latitude", "longitude", "ts"?}; blank lines are skipped."""
+    ship_ids, lats, lons, tss = [], [], [], []
+    for lineno, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            ship_ids.append(int(record["ship_id"]))
+            lats.append(float(record["latitude"]))
+            lons.append(float(record["longitude"]))
+            ts = record.get("ts")
+            tss.append(float("nan") if ts is None else float(ts))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise IngestError(f"Line {lineno}: {e!r}")
+    return PositionBatch(
+        np.asarray(ship_ids, dtype=np.int64),
+        np.asarray(lats, dtype=np.float64),
+        np.asarray(lons, dtype=np.float64),
+        np.asarray(tss, dtype=np.float64),
+    )
+
+
+def parse_binary(body: bytes) -> PositionBatch:
+    if len(body) % RECORD_DTYPE.itemsize:
+        raise IngestError(f"Binary batch length must be a multiple of {RECORD_DTYPE.itemsize} bytes")
+    records = np.frombuffer(body, dtype=RECORD_DTYPE)
+    return PositionBatch(
+        records["ship_id"].astype(np.int64),
+        records["lat"].astype(np.float64),
+        records["lon"].astype(np.float64),
+        records["ts"].astype(np.float64),
+    )
+
+
+def parse_batch(body: bytes, content_type: str) -> PositionBatch:
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in BINARY_TYPES:
+        return parse_binary(body)
+    if media_type in NDJSON_TYPES:
+        return parse_ndjson(body)
+    raise UnsupportedFormat(f"Unsupported content type '{media_type}'")
+
+
+# ------------------ COALESCING & CHECKS ------------------
+def valid_positions(batch: PositionBatch) -> np.ndarray:
+    """Mask of positions with finite, in-range coordinates."""
+    with np.errstate(invalid="ignore"):
+        return (
+            np.isfinite(batch.lat) & np.isfinite(batch.lon)
+            & (np.abs(batch.lat) <= 90.0) & (np.abs(batch.lon) <= 180.0)
+        )
+
+
+def latest_per_ship(batch: PositionBatch) -> PositionBatch:
+    """
+    Keep one position per ship: the one with the newest ts. Reports without a ts
+    count as older than any timed one; among equals the later line wins.
+    """
+    if not len(batch):
+        return batch
+    ts = np.where(np.isnan(batch.ts), -np.inf, batch.ts)
+    order = np.lexsort((np.arange(len(batch)), ts, batch.ship_id))
+    ids = batch.ship_id[order]
+    last = np.ones(len(ids), dtype=bool)
+    last[:-1] = ids[1:] != ids[:-1]
+    return batch.take(order[last])
+
+
+def restriction_flags(zone_set: ZoneSet, old_lat, old_lon, lat, lon):
+    """
+    For each move: whether the new position is inside a restricted zone, and
+    whether the straight track from the old position crosses into one.
+    """
+    inside = zone_set.contains_many(lat, lon)
+    crossed = np.zeros(len(inside), dtype=bool)
+    # segments_blocked needs both ends outside every zone
+    check = np.flatnonzero(~inside & ~zone_set.contains_many(old_lat, old_lon))
+    if len(check):
+        crossed[check] = zone_set.segments_blocked(
+            np.column_stack((old_lat[check], old_lon[check])),
+            np.column_stack((lat[check], lon[check])),
+        )
+    return inside, crossed
+
+
+# ------------------ WRITING ------------------
+_ships = AllShip.__table__
+# A report only replaces a position that came from an older one, so a late or
+# replayed batch cannot move a ship back
+POSITION_UPDATE = (
+    _ships.update()
+    .where(_ships.c.shipid == bindparam("b_shipid"))
+    .where(or_(_ships.c.position_ts.is_(None), _ships.c.position_ts < bindparam("b_ts")))
+    .values(latitude=bindparam("b_lat"), longitude=bindparam("b_lon"), position_ts=bindparam("b_ts"))
+)
+# Dead-reckoned positions are not reports: they leave position_ts alone and yield
+# to any report received since the voyage started, on whichever worker
+SIMULATED_UPDATE = (
+    _ships.update()
+    .where(_ships.c.shipid == bindparam("b_shipid"))
+    .where(or_(_ships.c.position_ts.is_(None), _ships.c.position_ts < bindparam("b_since")))
+    .values(latitude=bindparam("b_lat"), longitude=bindparam("b_lon"))
+)
+# Ids per IN list when reading stored report times (below SQLite's old 999 variable limit)
+STORED_TS_CHUNK = 900
+
+
+def stamp_untimed(ts: np.ndarray, now: float) -> np.ndarray:
+    """Report times with the missing ones taken as `now`, the time they were received."""
+    return np.where(np.isnan(ts), now, ts)
+
+
+def _reported(db: Session, shipids: np.ndarray) -> dict:
+    """shipid -> (position_ts, latitude, longitude) for the ships that have ever been reported."""
+    ids = shipids.tolist()
+    found = {}
+    for start in range(0, len(ids), STORED_TS_CHUNK):
+        for shipid, ts, lat, lon in db.execute(
+            select(_ships.c.shipid, _ships.c.position_ts, _ships.c.latitude, _ships.c.longitude).where(
+                _ships.c.shipid.in_(ids[start:start + STORED_TS_CHUNK]),
+                _ships.c.position_ts.is_not(None),
+            )
+        ):
+            found[shipid] = (ts, lat, lon)
+    return found
+
+
+def fresh_positions(db: Session, shipids: np.ndarray, ts: np.ndarray) -> np.ndarray:
+    """Mask of reports newer than the one each ship's stored position came from."""
+    found = _reported(db, shipids)
+    stored = np.fromiter(
+        (found[shipid][0] if shipid in found else -np.inf for shipid in shipids.tolist()),
+        dtype=np.float64, count=len(shipids),
+    )
+    return ts > stored
+
+
+def applied_positions(db: Session, shipids: np.ndarray, lats: np.ndarray, lons: np.ndarray, ts: np.ndarray) -> np.ndarray:
+    """
+    Mask of the written reports the rows still hold: same report time and coordinates.
+    Read after commit, it drops reports that a newer one written concurrently has beaten.
+    """
+    found = _reported(db, shipids)
+    return np.fromiter(
+        (found.get(shipid) == (t, lat, lon)
+         for shipid, lat, lon, t in zip(shipids.tolist(), lats.tolist(), lons.tolist(), ts.tolist())),
+        dtype=bool, count=len(shipids),
+    )
+
+
+def reported_since(db: Session, shipids: np.ndarray, since: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Which ships have a report at or after `since` (per ship), and the reported lat / lon (NaN elsewhere)."""
+    found = _reported(db, shipids)
+    reported = np.zeros(len(shipids), dtype=bool)
+    lat = np.full(len(shipids), np.nan)
+    lon = np.full(len(shipids), np.nan)
+    for i, (shipid, t) in enumerate(zip(shipids.tolist(), since.tolist())):
+        row = found.get(shipid)
+        if row is not None and row[0] >= t:
+            reported[i] = True
+            lat[i], lon[i] = row[1], row[2]
+    return reported, lat, lon
+
+
+def write_positions(db: Session, shipids: np.ndarray, lats: np.ndarray, lons: np.ndarray, ts: np.ndarray):
+    """
+    One executemany UPDATE for the whole batch; the caller commits. Rows whose
+    stored position came from a report at or after `ts` are left as they are.
+    """
+    if not len(shipids):
+        return
+    db.execute(POSITION_UPDATE, [
+        {"b_shipid": shipid, "b_lat": lat, "b_lon": lon, "b_ts": t}
+        for shipid, lat, lon, t in zip(shipids.tolist(), lats.tolist(), lons.tolist(), ts.tolist())
+    ])
+
+
+def write_simulated(db: Session, shipids: np.ndarray, lats: np.ndarray, lons: np.ndarray, since: np.ndarray):
+    """
+    Write dead-reckoned positions in one executemany UPDATE, skipping ships reported
+    at or after `since` (their voyage start); the caller commits.
+    """
+    if not len(shipids):
+        return
+    db.execute(SIMULATED_UPDATE, [
+        {"b_shipid": shipid, "b_lat": lat, "b_lon": lon, "b_since": t}
+        for shipid, lat, lon, t in zip(shipids.tolist(), lats.tolist(), lons.tolist(), since.tolist())
+    ])
@@ -0,0 +1,182 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter as Tally
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import metrics
+
+# Record per-route latency, query counts and DB time for every request
+METRICS_REQUESTS = os.getenv("METRICS_REQUESTS", "1").lower() in ("1", "true", "yes")
+# Add a Server-Timing header (db, spans, total) that browser dev tools show per request
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1").lower() in ("1", "true", "yes")
+# Allow /debug/profile to sample thread stacks (off by default; profiling slows the process down)
+PROFILER = os.getenv("PROFILER", "0").lower() in ("1", "true", "yes")
+# Longest /debug/profile run, in seconds
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+REQUEST_SECONDS = metrics.registry.histogram(
+    "http_request_duration_seconds", "Request latency until the last body byte, per route",
+    labelnames=("method", "route", "status"),
+)
+REQUEST_QUERIES = metrics.registry.histogram(
+    "http_request_db_queries", "SQL statements issued per request", buckets=metrics.QUERY_COUNT_BUCKETS,
+    labelnames=("method", "route"),
+)
+REQUEST_DB_SECONDS = metrics.registry.histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request", labelnames=("method", "route"),
+)
+QUERY_SECONDS = metrics.registry.histogram(
+    "db_query_duration_seconds", "Duration of every SQL statement, in requests or not",
+)
+
+
+# ------------------ SQL HOOKS ------------------
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._instrumentation_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def end_query(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_instrumentation_start", None)
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    QUERY_SECONDS.observe(seconds)
+    # Async engines run these hooks in a greenlet that carries the request's context
+    timing = metrics.current_request.get()
+    if timing is not None:
+        timing.queries += 1
+        timing.db_seconds += seconds
+
+
+# ------------------ REQUEST MIDDLEWARE ------------------
+def route_label(scope) -> str:
+    """The route template (e.g. /allships/{allship_id}), so labels stay few; unmatched paths share one."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def server_timing(timing: metrics.RequestTiming, total: float) -> bytes:
+    parts = [f'db;dur={timing.db_seconds * 1e3:.2f};desc="{timing.queries} queries"']
+    parts.extend(f"{name};dur={seconds * 1e3:.2f}" for name, seconds in timing.spans.items())
+    parts.append(f"total;dur={total * 1e3:.2f}")
+    return ", ".join(parts).encode()
+
+
+class RequestMetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware, so streaming responses pass
+    through untouched). Each HTTP request gets a RequestTiming in
+    metrics.current_request, which the SQL hooks and spans add to; latency is
+    measured until the last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_REQUESTS:
+            await self.app(scope, receive, send)
+            return
+
+        timing = metrics.RequestTiming()
+        token = metrics.current_request.set(timing)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if SERVER_TIMING:
+                    # Time so far: everything but sending the body
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(timing, time.perf_counter() - start)))
+                    headers.append((b"timing-allow-origin", b"*"))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            metrics.current_request.reset(token)
+            route = route_label(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route, str(status[0]))
+            REQUEST_QUERIES.observe(timing.queries, scope["method"], route)
+            REQUEST_DB_SECONDS.observe(timing.db_seconds, scope["method"], route)
+
+
+# ------------------ SAMPLING PROFILER ------------------
+# Innermost frames that mean a thread is parked, not working
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every other thread at a fixed interval with
+    sys._current_frames(). Nothing is hooked into the code being profiled, so
+    the cost is only the sampling thread's own work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float, include_idle: bool = False) -> Optional[Tuple[Tally, int]]:
+        """Stack counts (root first, ';'-joined) and samples taken; None if a profile is already running."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            me = threading.get_ident()
+            stacks: Tally = Tally()
+            taken = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    if not include_idle and frame.f_code.co_filename.endswith(IDLE_FILES):
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(frame_label(frame))
+                        frame = frame.f_back
+                    stacks[";".join(reversed(labels))] += 1
+                taken += 1
+                time.sleep(interval)
+            return stacks, taken
+        finally:
+            self._lock.release()
+
+
+def collapsed(stacks: Tally) -> str:
+    """Brendan Gregg's collapsed-stack format, for flamegraph.pl or speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_frames(stacks: Tally, limit: int) -> List[Dict]:
+    """Functions by samples spent in them (self) and under them (total)."""
+    own: Tally = Tally()
+    total: Tally = Tally()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [
+        {"function": frame, "self": own[frame], "total": count}
+        for frame, count in sorted(total.items(), key=lambda item: (-own[item[0]], -item[1]))[:limit]
+    ]
+
+
+profiler = SamplingProfiler()
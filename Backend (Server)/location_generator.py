@@ -1,9 +1,23 @@
-import random
-from typing import Tuple, List, TypedDict, Dict
+import os
+import threading
+from typing import Iterator, Optional, Tuple, List, TypedDict, Dict, Union
+
+import numpy as np
+
+import zones
 
 # Define coordinate precision
 COORDINATE_PRECISION = 6
 
+# Cell size (degrees) of the precomputed sea mask; cells on a zone boundary fall back to the exact polygon test
+LOCATION_MASK_RESOLUTION = float(os.getenv("LOCATION_MASK_RESOLUTION", "0.05"))
+# Largest array generate_sea_points() assembles at a time, which bounds the generator's working memory
+LOCATION_CHUNK = int(os.getenv("LOCATION_CHUNK", "1000000"))
+# Most candidates drawn per vectorized round; part of what a seed reproduces, so keep it fixed
+LOCATION_ROUND = 1 << 18
+
+Seed = Union[None, int, np.random.Generator]
+
 class OceanZone(TypedDict):
     """Definition of an ocean zone's coordinate boundaries"""
     min_lat: float
@@ -29,10 +43,186 @@ OCEAN_ZONES: List[OceanZone] = [
     {"min_lat": 1.0, "max_lat": 7.0, "min_lon": 75.0, "max_lon": 90.0,},
 ]
 
+# ------------------ SAMPLING AREA ------------------
+def disjoint_boxes(boxes: List[OceanZone]) -> np.ndarray:
+    """
+    Split the union of possibly overlapping boxes into disjoint ones, as an (m, 4)
+    array of (min_lat, max_lat, min_lon, max_lon), so overlaps are not sampled twice.
+    """
+    b = np.array([(z["min_lat"], z["max_lat"], z["min_lon"], z["max_lon"]) for z in boxes], dtype=np.float64)
+    lat_edges = np.unique(b[:, :2])
+    lon_edges = np.unique(b[:, 2:])
+    lat0, lon0 = np.meshgrid(lat_edges[:-1], lon_edges[:-1], indexing="ij")
+    lat1, lon1 = np.meshgrid(lat_edges[1:], lon_edges[1:], indexing="ij")
+    cells = np.stack([lat0.ravel(), lat1.ravel(), lon0.ravel(), lon1.ravel()], axis=1)
+    mid_lat = (cells[:, 0] + cells[:, 1]) / 2
+    mid_lon = (cells[:, 2] + cells[:, 3]) / 2
+    covered = (
+        (mid_lat[:, None] > b[:, 0]) & (mid_lat[:, None] < b[:, 1])
+        & (mid_lon[:, None] > b[:, 2]) & (mid_lon[:, None] < b[:, 3])
+    ).any(axis=1)
+    return cells[covered]
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    """Relative areas on the sphere: (sin(max_lat) - sin(min_lat)) * longitude span."""
+    return (np.sin(np.radians(boxes[:, 1])) - np.sin(np.radians(boxes[:, 0]))) * np.radians(boxes[:, 3] - boxes[:, 2])
+
+
+# ------------------ SEA MASK ------------------
+class SeaMask:
+    """
+    Raster of the restricted zones over the sampling area.
+
+    Each cell is sea, restricted, or boundary. A cell is boundary when a zone edge
+    passes through it or next to it; only points in boundary cells get the exact
+    point-in-polygon test, so masking a batch costs one table lookup per point.
+    """
+
+    SEA, RESTRICTED, BOUNDARY = 0, 1, 2
+
+    def __init__(self, zone_set: zones.ZoneSet, bounds: Tuple[float, float, float, float], resolution: float):
+        self.zone_set = zone_set
+        self.min_lat, self.max_lat, self.min_lon, self.max_lon = bounds
+        self.resolution = resolution
+        self.rows = max(1, int(np.ceil((self.max_lat - self.min_lat) / resolution)))
+        self.cols = max(1, int(np.ceil((self.max_lon - self.min_lon) / resolution)))
+
+        # Classify every cell by its centre ...
+        lat = self.min_lat + (np.arange(self.rows) + 0.5) * resolution
+        lon = self.min_lon + (np.arange(self.cols) + 0.5) * resolution
+        grid_lat, grid_lon = np.meshgrid(lat, lon, indexing="ij")
+        inside = zone_set.contains_many(grid_lat.ravel(), grid_lon.ravel()).reshape(self.rows, self.cols)
+        self.cells = np.where(inside, self.RESTRICTED, self.SEA).astype(np.uint8)
+
+        # ... then mark every cell a zone edge touches, plus its neighbours, for the exact test
+        if len(zone_set):
+            x1, y1, x2, y2 = zone_set.edges
+            steps = np.maximum(1, np.ceil(np.hypot(x2 - x1, y2 - y1) / (resolution / 2)).astype(np.int64))
+            edge = np.repeat(np.arange(len(x1)), steps + 1)
+            t = np.arange(len(edge)) - np.repeat(np.cumsum(steps + 1) - (steps + 1), steps + 1)
+            t = t / steps[edge]
+            r, c = self._cell(x1[edge] + t * (x2 - x1)[edge], y1[edge] + t * (y2 - y1)[edge])
+            touched = np.zeros((self.rows + 2, self.cols + 2), dtype=bool)
+            ok = (r >= -1) & (r <= self.rows) & (c >= -1) & (c <= self.cols)
+            touched[r[ok] + 1, c[ok] + 1] = True
+            near = np.zeros_like(touched)
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    near |= np.roll(np.roll(touched, dr, axis=0), dc, axis=1)
+            self.cells[near[1:-1, 1:-1]] = self.BOUNDARY
+
+    def _cell(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        r = np.floor((lat - self.min_lat) / self.resolution).astype(np.int64)
+        c = np.floor((lon - self.min_lon) / self.resolution).astype(np.int64)
+        return r, c
+
+    def restricted(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """True where a point lies inside a restricted zone (points outside the raster get the exact test)."""
+        r, c = self._cell(lat, lon)
+        in_grid = (r >= 0) & (r < self.rows) & (c >= 0) & (c < self.cols)
+        code = np.full(len(lat), self.BOUNDARY, dtype=np.uint8)
+        code[in_grid] = self.cells[r[in_grid], c[in_grid]]
+        result = code == self.RESTRICTED
+        exact = np.flatnonzero(code == self.BOUNDARY)
+        if len(exact):
+            result[exact] = self.zone_set.contains_many(lat[exact], lon[exact])
+        return result
+
+
+class SeaSampler:
+    """Area-weighted sampler over the disjoint ocean boxes, minus the restricted zones."""
+
+    def __init__(self, zone_set: zones.ZoneSet, boxes: List[OceanZone], resolution: float = LOCATION_MASK_RESOLUTION):
+        if not boxes:
+            raise ValueError("No ocean zones defined")
+        self.zone_set = zone_set
+        self.boxes = disjoint_boxes(boxes)
+        areas = box_areas(self.boxes)
+        self.weights = areas / areas.sum()
+        bounds = (self.boxes[:, 0].min(), self.boxes[:, 1].max(), self.boxes[:, 2].min(), self.boxes[:, 3].max())
+        self.mask = SeaMask(zone_set, bounds, resolution)
+
+    def draw(self, rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """n candidate points, uniform by area over the boxes (sea and land alike)."""
+        b = self.boxes[rng.choice(len(self.boxes), size=n, p=self.weights)]
+        lo, hi = np.sin(np.radians(b[:, 0])), np.sin(np.radians(b[:, 1]))
+        lat = np.degrees(np.arcsin(rng.uniform(lo, hi)))
+        lon = rng.uniform(b[:, 2], b[:, 3])
+        return lat, lon
+
+    def rounds(self, rng: np.random.Generator) -> Iterator[np.ndarray]:
+        """
+        Endless (k, 2) arrays of accepted sea points. Rounds of candidates start small and
+        double up to LOCATION_ROUND, so small requests stay cheap and large ones vectorize.
+        """
+        size = 1024
+        while True:
+            lat, lon = self.draw(rng, size)
+            keep = ~self.mask.restricted(lat, lon)
+            yield np.stack([lat[keep], lon[keep]], axis=1)
+            size = min(size * 2, LOCATION_ROUND)
+
+    def chunks(self, count: int, seed: Seed = None, chunk: int = LOCATION_CHUNK) -> Iterator[np.ndarray]:
+        """
+        Yield (k, 2) arrays of (lat, lon) sea points, count in total, at most chunk per array.
+        Candidates are drawn in rounds of a fixed size sequence, so a seed gives the same sequence whatever count and chunk are.
+        """
+        remaining = count
+        pending: List[np.ndarray] = []
+        held = 0
+        for points in self.rounds(np.random.default_rng(seed)):
+            if remaining <= 0:
+                break
+            points = points[:remaining]
+            pending.append(points)
+            held += len(points)
+            remaining -= len(points)
+            while held >= chunk or (remaining <= 0 and held):
+                merged = np.concatenate(pending)
+                yield merged[:chunk]
+                pending = [merged[chunk:]]
+                held = len(pending[0])
+
+
+_sampler: Optional[SeaSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> SeaSampler:
+    """The sampler for the current zone set, rebuilt only when the zones are reloaded."""
+    global _sampler
+    zone_set = zones.registry.current()
+    sampler = _sampler
+    if sampler is not None and sampler.zone_set is zone_set:
+        return sampler
+    with _sampler_lock:
+        if _sampler is None or _sampler.zone_set is not zone_set:
+            _sampler = SeaSampler(zone_set, OCEAN_ZONES)
+        return _sampler
+
+
+def generate_sea_points(count: int, seed: Seed = None) -> np.ndarray:
+    """
+    Draw random sea coordinates within the Indian maritime zones in bulk.
+
+    Args:
+        count (int): Number of points. Must not be negative.
+        seed: Integer seed (same seed, same points) or a NumPy Generator to continue.
+
+    Returns:
+        np.ndarray: A (count, 2) array of (latitude, longitude)
+    """
+    if count < 0:
+        raise ValueError("Count must not be negative")
+    parts = list(get_sampler().chunks(count, seed))
+    return np.concatenate(parts) if parts else np.empty((0, 2))
+
+
 def generate_indian_ocean_location() -> Tuple[float, float]:
     """
     Generate random coordinates within Indian maritime zones (Arabian Sea, Bay of Bengal, etc.),
-    avoiding land areas of mainland India.
+    avoiding land and restricted zones.
     
     Returns:
         Tuple[float, float]: A tuple containing (latitude, longitude)
@@ -40,17 +230,7 @@ def generate_indian_ocean_location() -> Tuple[float, float]:
     Raises:
         ValueError: If no valid ocean zones are available
     """
-    if not OCEAN_ZONES:
-        raise ValueError("No ocean zones defined")
-    
-    # Choose a random ocean zone
-    zone = random.choice(OCEAN_ZONES)
-    
-    # Generate coordinates within that ocean zone
-    latitude = round(random.uniform(zone["min_lat"], zone["max_lat"]), COORDINATE_PRECISION)
-    longitude = round(random.uniform(zone["min_lon"], zone["max_lon"]), COORDINATE_PRECISION)
-    
-    return latitude, longitude
+    return generate_indian_ocean_locations(1)[0]
 
 def generate_indian_ocean_locations(count: int) -> List[Tuple[float, float]]:
     """
@@ -70,7 +250,8 @@ def generate_indian_ocean_locations(count: int) -> List[Tuple[float, float]]:
     if count < 1:
         raise ValueError("Count must be a positive integer")
     
-    return [generate_indian_ocean_location() for _ in range(count)]
+    points = np.round(generate_sea_points(count), COORDINATE_PRECISION)
+    return [tuple(p) for p in points.tolist()]
 
 if __name__ == "__main__":
     try:
@@ -1,19 +1,105 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+import os
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import database
 from database import SessionLocal, engine
 from models import Base, Ship, AllShip, Alert, AlertResult
 import schemas
 import location_generator
 import shipalloc
 import distance_calc
-from datetime import datetime
-from sqlalchemy import and_
+import fleet_cache
+import events
+import zones
+import route_cache
+import assignment
+import metrics
+import instrumentation
+import ingest
+import history
+import simulator
+import response_cache
+import ranking_cache
+import alert_catalog
+import fleet_sync
+import pagination
+import migrations
+import asyncio
+import threading
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+
+def create_schema(attempts: int = 3):
+    """
+    Create tables that don't exist and bring those made by older versions up to date.
+    Workers started together race on the same CREATE statements; a loser tries again.
+    """
+    for attempt in range(attempts):
+        try:
+            Base.metadata.create_all(bind=engine)
+            migrations.upgrade(engine)
+            return
+        except SQLAlchemyError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.5 * (attempt + 1))
+
+
+create_schema()
+
+# Every worker reloads restricted zones when one of them does
+zones.registry.share(response_cache.versions, response_cache.ZONES)
+
+# Score only the K nearest free ships per /trigger (0 = always score the whole fleet)
+TRIGGER_TOP_K = int(os.getenv("TRIGGER_TOP_K", "0"))
+# Rescore the N best straight-line candidates on safe-route ETA (0 = straight-line only)
+ROUTE_TOP_K = int(os.getenv("ROUTE_TOP_K", "0"))
+# Most incidents accepted by one /trigger/batch call
+TRIGGER_BATCH_MAX = int(os.getenv("TRIGGER_BATCH_MAX", "1000"))
+# Ranked candidates /trigger tries to claim, best first, before giving up with 409;
+# also the rounds /trigger/batch re-solves incidents whose ships were taken
+TRIGGER_CLAIM_ATTEMPTS = int(os.getenv("TRIGGER_CLAIM_ATTEMPTS", "8"))
+# Scoring strategy for allocations that do not name one (see shipalloc.STRATEGIES)
+SCORING_STRATEGY = shipalloc.STRATEGIES[os.getenv("SCORING_STRATEGY", "weighted_sum")]
+# Ranked ships /trigger/preview returns by default, and the most it returns
+TRIGGER_PREVIEW_K = int(os.getenv("TRIGGER_PREVIEW_K", "5"))
+TRIGGER_PREVIEW_MAX = int(os.getenv("TRIGGER_PREVIEW_MAX", "100"))
+# Load the fleet, alert, zone and version caches at startup, before the worker takes requests
+WARMUP = os.getenv("WARMUP", "1").lower() in ("1", "true", "yes")
+# Most positions accepted by one /ingest/positions batch
+INGEST_BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "200000"))
+# Largest /generate-locations response (bigger counts are clamped) and /generate-locations/stream request
+LOCATION_BATCH_MAX = int(os.getenv("LOCATION_BATCH_MAX", "10000"))
+LOCATION_STREAM_MAX = int(os.getenv("LOCATION_STREAM_MAX", "10000000"))
+# Points generated and sent per chunk of /generate-locations/stream
+LOCATION_STREAM_CHUNK = int(os.getenv("LOCATION_STREAM_CHUNK", "100000"))
+
+CLAIMS = metrics.registry.counter("trigger_claims_total", "Ships allocated by /trigger and /trigger/batch")
+CLAIM_CONFLICTS = metrics.registry.counter(
+    "trigger_claim_conflicts_total", "Claims lost because another request allocated the ship first"
+)
+CLAIMS_RETRIED = metrics.registry.counter(
+    "trigger_claims_retried_total", "/trigger allocations that succeeded on a lower-ranked ship after a conflict"
+)
+CLAIMS_EXHAUSTED = metrics.registry.counter(
+    "trigger_claims_exhausted_total", "/trigger calls that lost every ranked candidate and returned 409"
+)
+POSITIONS_RECEIVED = metrics.registry.counter(
+    "ingest_positions_received_total", "Positions received by /ingest/positions"
+)
+POSITIONS_APPLIED = metrics.registry.counter(
+    "ingest_positions_applied_total", "Ship positions written by /ingest/positions after coalescing"
+)
+# Held while an ingest checks what it wrote and moves the fleet cache, so that of two
+# concurrent batches the one holding the newer report is the last to touch the cache
+INGEST_APPLY_LOCK = threading.Lock()
 
 app = FastAPI(title="Ships API")
 
@@ -24,6 +110,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so latency covers the whole stack; route labels come from the matched route
+app.add_middleware(instrumentation.RequestMetricsMiddleware)
 
 def get_db():
     db = SessionLocal()
@@ -33,9 +121,38 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+
+def when(enabled: bool, decorator):
+    """Apply a route decorator only when enabled, so sync and async twins can share a path."""
+    return decorator if enabled else (lambda endpoint: endpoint)
+
+
+async def ensure_fleet():
+    """ensure_loaded() for async handlers; a cold or stale cache is loaded on a worker thread."""
+    if fleet_cache.fleet.needs_db():
+        def load():
+            with SessionLocal() as db:
+                fleet_cache.fleet.ensure_loaded(db)
+        await asyncio.to_thread(load)
+
+
+def cached_get(request: Request, name: str, cache_control: str, build):
+    """Serve a read-mostly GET from the response cache, building the body on a miss."""
+    key = (request.url.path, request.url.query, response_cache.versions.current(name))
+    entry = response_cache.cache.get(key) or response_cache.cache.put(key, build())
+    return response_cache.respond(request, entry, cache_control)
+
+
 @app.get("/ships", response_model=List[schemas.ShipRead])
-def get_all_ships(db: Session = Depends(get_db)):
-    return db.query(Ship).all()
+def get_all_ships(request: Request, db: Session = Depends(get_db)):
+    return cached_get(
+        request, response_cache.SHIP_TYPES, response_cache.STATIC_CACHE_CONTROL,
+        lambda: [schemas.ShipRead.model_validate(ship) for ship in db.query(Ship).all()],
+    )
 
 
 @app.get("/ships/{ship_id}", response_model=schemas.ShipRead)
@@ -46,48 +163,109 @@ def get_ship_by_id(ship_id: int, db: Session = Depends(get_db)):
     return ship
 
 
-@app.get("/allships", response_model=List[schemas.AllShipWithShipInfo])
-def get_all_allships(db: Session = Depends(get_db)):
-    allships = db.query(AllShip).all()
-    result = []
+# Columns needed to render AllShipWithShipInfo, fetched in one JOIN
+ALLSHIP_COLUMNS = (AllShip.shipid, AllShip.name, AllShip.type, AllShip.longitude, AllShip.latitude, AllShip.mission)
+SHIP_INFO_COLUMNS = (
+    Ship.id, Ship.name, Ship.speed, Ship.rotation_speed, Ship.humanalert, Ship.attack,
+    Ship.robery, Ship.struck, Ship.resource, Ship.ubts, Ship.time, Ship.climate,
+)
+SHIP_INFO_FIELDS = (
+    "id", "name", "speed", "rotation_speed", "humanalert", "attack",
+    "robery", "struck", "resource", "ubts", "time", "climate",
+)
 
-    for allship in allships:
-        ship = db.query(Ship).filter(Ship.id == allship.type).first()
-        if ship:
-            allship_data = schemas.AllShip.from_orm(allship)
-            allship_with_info = schemas.AllShipWithShipInfo(
-                shipid=allship_data.shipid,
-                name=allship_data.name,
-                type=allship_data.type,
-                longitude=allship_data.longitude,
-                latitude=allship_data.latitude,
-                mission=allship_data.mission,
-                ship_info=schemas.ShipRead.from_orm(ship),
-            )
-            result.append(allship_with_info)
+
+def allships_with_info_query(db: Session):
+    """AllShip rows joined to their ship type; ships without a type row are left out."""
+    return db.query(*ALLSHIP_COLUMNS, *SHIP_INFO_COLUMNS).join(Ship, Ship.id == AllShip.type)
+
+
+def allships_with_info_select(mission: Optional[bool] = None, type: Optional[int] = None):
+    """The same join as a select(), narrowed by the /allships/page and /allships/export filters."""
+    statement = select(*ALLSHIP_COLUMNS, *SHIP_INFO_COLUMNS).join(Ship, Ship.id == AllShip.type)
+    if mission is not None:
+        statement = statement.where(AllShip.mission == mission)
+    if type is not None:
+        statement = statement.where(AllShip.type == type)
+    return statement
+
+
+def allship_rows_to_dicts(rows) -> List[dict]:
+    """Serialize joined rows straight to AllShipWithShipInfo-shaped dicts (one ship_info dict per type)."""
+    ship_infos = {}
+    result = []
+    for shipid, name, type_, longitude, latitude, mission, *info in rows:
+        ship_info = ship_infos.get(type_)
+        if ship_info is None:
+            ship_info = ship_infos[type_] = dict(zip(SHIP_INFO_FIELDS, info))
+        result.append({
+            "shipid": shipid,
+            "name": name,
+            "type": type_,
+            "longitude": longitude,
+            "latitude": latitude,
+            "mission": bool(mission),
+            "ship_info": ship_info,
+        })
     return result
 
 
+@when(not database.DB_ASYNC, app.get("/allships", response_model=List[schemas.AllShipWithShipInfo]))
+def get_all_allships(db: Session = Depends(get_db)):
+    # Returned as a ready-made JSONResponse so large fleets skip per-row model validation
+    return JSONResponse(content=allship_rows_to_dicts(allships_with_info_query(db).all()))
+
+
+@when(database.DB_ASYNC, app.get("/allships", response_model=List[schemas.AllShipWithShipInfo]))
+async def get_all_allships_async(db=Depends(get_async_db)):
+    rows = await db.execute(allships_with_info_select())
+    return JSONResponse(content=allship_rows_to_dicts(rows.all()))
+
+
+@app.get("/allships/page", response_model=schemas.AllShipPage)
+def get_allships_page(
+    limit: int = Query(pagination.PAGE_SIZE, ge=1, le=pagination.PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    mission: Optional[bool] = None,
+    type: Optional[int] = Query(None, description="Ship type id"),
+    db: Session = Depends(get_db),
+):
+    """Ships in shipid order, one keyset page at a time."""
+    key = pagination.decode_cursor(cursor, (int,)) if cursor else None
+    rows, next_key = pagination.page(
+        db, allships_with_info_select(mission, type), (AllShip.shipid,), key, limit, descending=False
+    )
+    return JSONResponse(content={
+        "items": allship_rows_to_dicts(rows),
+        "next_cursor": pagination.encode_cursor(next_key) if next_key else None,
+    })
+
+
+@app.get("/allships/export")
+def export_allships(mission: Optional[bool] = None, type: Optional[int] = Query(None, description="Ship type id")):
+    """Every ship as NDJSON (one AllShipWithShipInfo per line), read in batches so memory stays flat."""
+    chunks = pagination.batches(allships_with_info_select(mission, type), (AllShip.shipid,), descending=False)
+    return StreamingResponse(pagination.ndjson(chunks, allship_rows_to_dicts), media_type="application/x-ndjson")
+
+
+@app.get("/allships/changes", response_model=schemas.FleetChanges)
+def get_allship_changes(
+    since: int = Query(0, description="Fleet version the client already has (0 = full snapshot)"),
+    db: Session = Depends(get_db),
+):
+    # Positions and mission flags only; ship type info comes from /ships
+    return JSONResponse(content=fleet_cache.fleet.changes_since(db, since))
+
+
 @app.get("/allships/{allship_id}", response_model=schemas.AllShipWithShipInfo)
 def get_allship_by_id(allship_id: int, db: Session = Depends(get_db)):
-    allship = db.query(AllShip).filter(AllShip.shipid == allship_id).first()
-    if not allship:
-        raise HTTPException(status_code=404, detail="AllShip not found")
-
-    ship = db.query(Ship).filter(Ship.id == allship.type).first()
-    if not ship:
+    row = allships_with_info_query(db).filter(AllShip.shipid == allship_id).first()
+    if not row:
+        if not db.query(AllShip.shipid).filter(AllShip.shipid == allship_id).first():
+            raise HTTPException(status_code=404, detail="AllShip not found")
         raise HTTPException(status_code=404, detail="Ship type not found")
 
-    allship_data = schemas.AllShip.from_orm(allship)
-    return schemas.AllShipWithShipInfo(
-        shipid=allship_data.shipid,
-        name=allship_data.name,
-        type=allship_data.type,
-        longitude=allship_data.longitude,
-        latitude=allship_data.latitude,
-        mission=allship_data.mission,
-        ship_info=schemas.ShipRead.from_orm(ship),
-    )
+    return allship_rows_to_dicts([row])[0]
 
 @app.delete("/allships/{allship_id}", status_code=200)
 def delete_allship(allship_id: int, db: Session = Depends(get_db)):
@@ -97,6 +275,7 @@ def delete_allship(allship_id: int, db: Session = Depends(get_db)):
 
     db.delete(allship)
     db.commit()
+    fleet_cache.fleet.remove_ship(allship_id)
 
     return {"detail": f"AllShip with ID {allship_id} deleted successfully"}
 
@@ -110,6 +289,7 @@ def create_allship(allship: schemas.AllShipCreate, db: Session = Depends(get_db)
     db.add(db_allship)
     db.commit()
     db.refresh(db_allship)
+    fleet_cache.fleet.apply_ship(db_allship)
     return db_allship
 
 
@@ -124,14 +304,14 @@ def generate_random_location():
 
 
 @app.get("/generate-locations")
-def generate_random_locations(count: int = 5):
-    if count > 100:
-        count = 100
+def generate_random_locations(count: int = 5, seed: Optional[int] = None):
+    if count > LOCATION_BATCH_MAX:
+        count = LOCATION_BATCH_MAX
     elif count < 1:
         count = 1
 
-    locations = location_generator.generate_indian_ocean_locations(count)
-    formatted_locations = [{"latitude": lat, "longitude": lon} for lat, lon in locations]
+    points = np.round(location_generator.generate_sea_points(count, seed), location_generator.COORDINATE_PRECISION)
+    formatted_locations = [{"latitude": lat, "longitude": lon} for lat, lon in points.tolist()]
 
     return {
         "locations": formatted_locations,
@@ -140,8 +320,59 @@ def generate_random_locations(count: int = 5):
     }
 
 
-@app.get("/alerts", response_model=List[schemas.AlertBase])
-def get_all_alerts(db: Session = Depends(get_db)):
+@app.get("/generate-locations/stream")
+def stream_random_locations(
+    count: int = Query(..., ge=1, le=LOCATION_STREAM_MAX),
+    seed: Optional[int] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|binary)$", description="ndjson lines or packed <f8 lat, lon pairs"),
+):
+    """Large batches of sea locations, generated and sent in chunks so memory stays flat."""
+    chunks = location_generator.get_sampler().chunks(count, seed, chunk=LOCATION_STREAM_CHUNK)
+    if format == "binary":
+        return StreamingResponse(
+            (np.ascontiguousarray(points, dtype="<f8").tobytes() for points in chunks),
+            media_type="application/octet-stream",
+        )
+
+    def ndjson():
+        for points in chunks:
+            yield "".join(
+                f'{{"latitude": {lat:.6f}, "longitude": {lon:.6f}}}\n' for lat, lon in points.tolist()
+            )
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@app.get("/zones")
+def get_restricted_zones():
+    zone_set = zones.registry.current()
+    return {
+        "version": zone_set.version,
+        "source": zones.registry.source,
+        "zones": [
+            {
+                "name": zone.name,
+                "kind": zone.kind,
+                "bbox": list(zone.polygon.bbox),
+                "vertices": len(zone.polygon.vertices),
+            }
+            for zone in zone_set.zones
+        ],
+        "waypoints": {name: list(point) for name, point in zone_set.waypoints.items()},
+    }
+
+
+@app.post("/zones/reload")
+def reload_restricted_zones():
+    """Reload restricted zones from their source here; the other workers follow within ZONES_CHECK_INTERVAL."""
+    try:
+        zone_set = zones.registry.publish()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=500, detail=f"Could not load restricted zones: {e}")
+    return {"detail": "Restricted zones reloaded", "version": zone_set.version, "count": len(zone_set)}
+
+
+def alert_list(db: Session) -> List[schemas.AlertBase]:
     alerts = db.query(Alert).all()
     if not alerts:
         raise HTTPException(status_code=404, detail="No alerts found")
@@ -161,99 +392,420 @@ def get_all_alerts(db: Session = Depends(get_db)):
     ]
 
 
-@app.post("/trigger", response_model=schemas.TriggerAlertResponse)
+@app.get("/alerts", response_model=List[schemas.AlertBase])
+def get_all_alerts(request: Request, db: Session = Depends(get_db)):
+    return cached_get(request, response_cache.ALERTS, response_cache.STATIC_CACHE_CONTROL, lambda: alert_list(db))
+
+
+def resync_ships(db: Session, shipids):
+    """Reload these ships from the database into the fleet cache (dropping deleted ones)."""
+    missing = set(shipids)
+    if not missing:
+        return
+    for ship in db.query(AllShip).filter(AllShip.shipid.in_(missing)).all():
+        fleet_cache.fleet.apply_ship(ship)
+        missing.discard(ship.shipid)
+    for shipid in missing:
+        fleet_cache.fleet.remove_ship(shipid)
+
+
+async def resync_ships_async(db, shipids):
+    """resync_ships() on an AsyncSession."""
+    missing = set(shipids)
+    if not missing:
+        return
+    for ship in (await db.execute(select(AllShip).where(AllShip.shipid.in_(missing)))).scalars():
+        fleet_cache.fleet.apply_ship(ship)
+        missing.discard(ship.shipid)
+    for shipid in missing:
+        fleet_cache.fleet.remove_ship(shipid)
+
+
+def find_alert(name: str) -> shipalloc.AlertType:
+    """The compiled alert definition, from the catalog; 404 if the alert table has no such type."""
+    alert_obj = alert_catalog.catalog.get(name)
+    if alert_obj is None:
+        raise HTTPException(status_code=404, detail=f"Alert type '{name}' not found")
+    return alert_obj
+
+
+def scoring_strategy(name: Optional[str]) -> shipalloc.ScoringStrategy:
+    if name is None:
+        return SCORING_STRATEGY
+    strategy = shipalloc.STRATEGIES.get(name)
+    if strategy is None:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown scoring strategy '{name}'; use one of {', '.join(shipalloc.STRATEGIES)}"
+        )
+    return strategy
+
+
+def rank_candidates(request: schemas.TriggerAlertRequest, alert_obj: shipalloc.AlertType, limit: int, exact: bool = False):
+    """
+    The `limit` best free ships for one alert, best first, and whether they came
+    from the ranking cache. The fleet cache must already be loaded. With exact,
+    the whole fleet is scored even when TRIGGER_TOP_K is set, so every listed
+    score is the one it would have over the whole fleet, not only the best one.
+    """
+    strategy = scoring_strategy(request.strategy)
+    exact = exact or not TRIGGER_TOP_K
+    # Version first, fleet second: a ranking is never stored under a newer version than it was scored on
+    key = ranking_cache.cache.key(
+        alert_obj, strategy, request.latitude, request.longitude, request.climate_condition,
+        fleet_cache.fleet.version, zones.registry.current().version,
+    )
+    ranked = ranking_cache.cache.get(key, limit, exact)
+    if ranked is not None:
+        return ranked, True
+
+    available_fleet = fleet_cache.fleet.free_fleet()
+    if not len(available_fleet):
+        raise HTTPException(status_code=404, detail="All ships are currently on mission")
+
+    # Always deep enough for a /trigger, so a preview's ranking serves the trigger that follows it
+    depth = max(limit, TRIGGER_CLAIM_ATTEMPTS)
+    ranked = shipalloc.rank_alert(
+        alert_obj,
+        request.latitude,
+        request.longitude,
+        request.climate_condition,
+        available_fleet,
+        limit=depth,
+        top_k=None if exact else TRIGGER_TOP_K,
+        nearest=fleet_cache.fleet.nearest_fleet,
+        route_top_k=ROUTE_TOP_K,
+        route_distances=route_cache.cache.fleet_distances,
+        strategy=strategy,
+    )
+    ranking_cache.cache.put(key, ranked, depth, exact)
+    return ranked[:limit], False
+
+
+def rank_trigger(request: schemas.TriggerAlertRequest, alert_obj: shipalloc.AlertType):
+    """The TRIGGER_CLAIM_ATTEMPTS best free ships for one alert, best first."""
+    ranked, _ = rank_candidates(request, alert_obj, TRIGGER_CLAIM_ATTEMPTS)
+    if not ranked:
+        raise HTTPException(status_code=404, detail="Could not determine best ship")
+    return ranked
+
+
+def claim_statement(shipid: int):
+    """UPDATE taking the ship only if it is still free; a rowcount of 0 means someone else has it."""
+    return (
+        update(AllShip)
+        .where(AllShip.shipid == shipid, or_(AllShip.mission == False, AllShip.mission == 0))
+        .values(mission=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def claimable(candidate: shipalloc.Result) -> bool:
+    if fleet_cache.fleet.is_free(candidate.ship_id):
+        return True
+    # Taken by a concurrent request since this ranking was made; skip the DB round trip
+    CLAIM_CONFLICTS.inc()
+    return False
+
+
+def record_claim(candidate: shipalloc.Result, claimed: bool, touched: list, lost: list) -> bool:
+    # Either way the ship is no longer free: hide it from concurrent rankings right
+    # away instead of after commit (undone by a resync if this transaction fails)
+    fleet_cache.fleet.set_mission(candidate.ship_id, True)
+    touched.append(candidate.ship_id)
+    if not claimed:
+        lost.append(candidate.ship_id)
+        CLAIM_CONFLICTS.inc()
+    return claimed
+
+
+def new_alert_result(request: schemas.TriggerAlertRequest, best_ship: shipalloc.Result) -> AlertResult:
+    return AlertResult(
+        alert_type=request.alert_type,
+        ship_id=best_ship.ship_id,
+        best_ship=best_ship.name,
+        final_score=best_ship.Final_score,
+        score_scope=best_ship.score_scope,
+        timestamp=datetime.utcnow()
+    )
+
+
+def allocation_response(request: schemas.TriggerAlertRequest, best_ship: shipalloc.Result, alert_result_id: int):
+    CLAIMS.inc()
+    events.broker.publish("allocation", {
+        "alert_result_id": alert_result_id,
+        "alert_type": request.alert_type,
+        "ship_id": best_ship.ship_id,
+        "best_ship": best_ship.name,
+        "final_score": best_ship.Final_score,
+        "score_scope": best_ship.score_scope,
+        "version": fleet_cache.fleet.version,
+    })
+
+    return schemas.TriggerAlertResponse(
+        alert_type=request.alert_type,
+        best_ship=best_ship.name,
+        ship_id=best_ship.ship_id,
+        final_score=best_ship.Final_score,
+        score_scope=best_ship.score_scope,
+    )
+
+
+@when(not database.DB_ASYNC, app.post("/trigger", response_model=schemas.TriggerAlertResponse))
 def trigger_alert(request: schemas.TriggerAlertRequest, db: Session = Depends(get_db)):
+    touched = []  # ships marked taken in the cache before commit
     try:
-        alert_db = db.query(Alert).filter(Alert.name == request.alert_type).first()
-        if not alert_db:
-            raise HTTPException(status_code=404, detail=f"Alert type '{request.alert_type}' not found")
-
-        alert_obj = shipalloc.AlertType(
-            name=alert_db.name,
-            human_error=alert_db.human_error,
-            attack=alert_db.attack,
-            weather=alert_db.weather,
-            robbery=alert_db.robbery,
-            resource=alert_db.resource,
-            struck=alert_db.struck,
-        )
+        alert_obj = find_alert(request.alert_type)
 
-        available_ships = db.query(AllShip).filter(
-            (AllShip.mission == False) | (AllShip.mission == 0)
-        ).all()
-        if not available_ships:
-            raise HTTPException(status_code=404, detail="All ships are currently on mission")
+        # Score straight from the in-memory fleet (or reuse a fresh ranking); the DB is only touched for the claim below
+        fleet_cache.fleet.ensure_loaded(db)
+        ranked = rank_trigger(request, alert_obj)
 
-        ships_data = []
-        for allship in available_ships:
-            ship = db.query(Ship).filter(Ship.id == allship.type).first()
-            if ship:
-                ships_data.append({
-                    "shipid": allship.shipid,
-                    "name": allship.name,
-                    "latitude": allship.latitude,
-                    "longitude": allship.longitude,
-                    "mission": allship.mission,
-                    "ship_info": {
-                        "name": ship.name,
-                        "speed": ship.speed,
-                        "humanalert": ship.humanalert,
-                        "attack": ship.attack,
-                        "robery": ship.robery,
-                        "struck": ship.struck,
-                        "resource": ship.resource,
-                        "climate": ship.climate,
-                    },
-                })
-
-        if not ships_data:
-            raise HTTPException(status_code=404, detail="No ships available for alert calculation")
-
-        best_ship = shipalloc.process_alert(
-            alert_obj,
-            request.latitude,
-            request.longitude,
-            request.climate_condition,
-            ships_data,
-        )
-        if not best_ship:
-            raise HTTPException(status_code=404, detail="Could not determine best ship")
-
-        selected_ship = (
-            db.query(AllShip)
-            .filter(
-                and_(
-                    AllShip.shipid == best_ship.ship_id,
-                    (AllShip.mission == False) | (AllShip.mission == 0)
-                )
-            )
-            .with_for_update()
-            .first()
-        )
-        if not selected_ship:
-            raise HTTPException(status_code=409, detail="Selected ship already allocated")
+        # Claim the best ship still free with a conditional UPDATE; when a concurrent
+        # request got there first, move down the same ranking instead of rescanning
+        best_ship = None
+        lost = []
+        for candidate in ranked:
+            if not claimable(candidate):
+                continue
+            claimed = db.execute(claim_statement(candidate.ship_id)).rowcount
+            if record_claim(candidate, claimed, touched, lost):
+                best_ship = candidate
+                break
 
-        selected_ship.mission = True
-        db.add(selected_ship)
+        if best_ship is None:
+            # The cache was behind the database; resync these ships before reporting the conflict
+            db.rollback()
+            resync_ships(db, lost)
+            CLAIMS_EXHAUSTED.inc()
+            raise HTTPException(status_code=409, detail="Selected ship already allocated")
 
-        alert_result = AlertResult(
-            alert_type=request.alert_type,
-            ship_id=best_ship.ship_id,
-            best_ship=best_ship.name,
-            final_score=best_ship.Final_score,
-            timestamp=datetime.utcnow()
-        )
+        alert_result = new_alert_result(request, best_ship)
         db.add(alert_result)
 
         db.commit()
-        db.refresh(selected_ship)
         db.refresh(alert_result)
+        response_cache.versions.bump(response_cache.ALERT_RESULTS)
+        if lost:
+            CLAIMS_RETRIED.inc()
+            resync_ships(db, lost)
+        return allocation_response(request, best_ship, alert_result.id)
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        resync_ships(db, touched)
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@when(database.DB_ASYNC, app.post("/trigger", response_model=schemas.TriggerAlertResponse))
+async def trigger_alert_async(request: schemas.TriggerAlertRequest, db=Depends(get_async_db)):
+    touched = []
+    try:
+        # A stale catalog reloads on a worker thread
+        alert_obj = alert_catalog.catalog.peek(request.alert_type)
+        if alert_obj is None:
+            alert_obj = await asyncio.to_thread(find_alert, request.alert_type)
+
+        # Scoring is CPU-bound (and may plan routes); keep it off the event loop
+        await ensure_fleet()
+        ranked = await asyncio.to_thread(rank_trigger, request, alert_obj)
+
+        best_ship = None
+        lost = []
+        for candidate in ranked:
+            if not claimable(candidate):
+                continue
+            claimed = (await db.execute(claim_statement(candidate.ship_id))).rowcount
+            if record_claim(candidate, claimed, touched, lost):
+                best_ship = candidate
+                break
+
+        if best_ship is None:
+            await db.rollback()
+            await resync_ships_async(db, lost)
+            CLAIMS_EXHAUSTED.inc()
+            raise HTTPException(status_code=409, detail="Selected ship already allocated")
+
+        alert_result = new_alert_result(request, best_ship)
+        db.add(alert_result)
+
+        # expire_on_commit is off, so the id assigned at flush survives the commit
+        await db.commit()
+        await asyncio.to_thread(response_cache.versions.bump, response_cache.ALERT_RESULTS)
+        if lost:
+            CLAIMS_RETRIED.inc()
+            await resync_ships_async(db, lost)
+        return allocation_response(request, best_ship, alert_result.id)
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        await resync_ships_async(db, touched)
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@app.post("/trigger/preview", response_model=schemas.TriggerPreviewResponse)
+def preview_trigger(
+    request: schemas.TriggerAlertRequest,
+    k: int = Query(TRIGGER_PREVIEW_K, ge=1, le=TRIGGER_PREVIEW_MAX, description="Ranked ships to return"),
+    db: Session = Depends(get_db),
+):
+    """The k best free ships for an alert with their score breakdown; nothing is claimed or written."""
+    alert_obj = find_alert(request.alert_type)
+    fleet_cache.fleet.ensure_loaded(db)
+    version = fleet_cache.fleet.version
+    ranked, cached = rank_candidates(request, alert_obj, k, exact=True)
+    now = datetime.utcnow()
+    return schemas.TriggerPreviewResponse(
+        alert_type=request.alert_type,
+        strategy=scoring_strategy(request.strategy).name,
+        fleet_version=version,
+        cached=cached,
+        candidates=[
+            schemas.TriggerPreviewCandidate(
+                rank=rank,
+                ship_id=result.ship_id,
+                name=result.name,
+                type=result.type,
+                distance_km=result.distance,
+                speed=result.speed,
+                eta_hours=result.time,
+                eta=now + timedelta(hours=result.time),
+                T_value=result.T_value,
+                alert_score=result.alert_score,
+                climate_score=result.climate_score,
+                final_score=result.Final_score,
+            )
+            for rank, result in enumerate(ranked, start=1)
+        ],
+    )
+
+
+@app.post("/trigger/batch", response_model=schemas.TriggerBatchResponse)
+def trigger_alert_batch(request: schemas.TriggerBatchRequest, db: Session = Depends(get_db)):
+    """
+    Allocate ships to many incidents at once. All incidents are scored against the
+    free fleet in one ships x incidents matrix and the assignment maximizing the
+    total score is solved as a whole, so the result does not depend on request order.
+    Chosen ships are claimed in a single transaction. A ship another request took
+    meanwhile is dropped and only the incidents that lost one are solved again over
+    the ships still free (up to TRIGGER_CLAIM_ATTEMPTS rounds); every other
+    assignment stands. Request indexes left without a ship, because there were more
+    incidents than free ships or the rounds ran out, are listed in "unassigned".
+    """
+    items = request.alerts
+    if not items:
+        return schemas.TriggerBatchResponse(assignments=[], unassigned=[])
+    if len(items) > TRIGGER_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {TRIGGER_BATCH_MAX} alerts per batch")
+
+    try:
+        names = {item.alert_type for item in items}
+        alert_objs = alert_catalog.catalog.get_many(names)
+        missing = sorted(names - alert_objs.keys())
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Alert type '{missing[0]}' not found")
+        strategies = [scoring_strategy(item.strategy) for item in items]
+
+        available_fleet = fleet_cache.fleet.available_fleet(db)
+        if not len(available_fleet):
+            raise HTTPException(status_code=404, detail="All ships are currently on mission")
+
+        scores = shipalloc.score_matrix(
+            [alert_objs[item.alert_type] for item in items],
+            [item.latitude for item in items],
+            [item.longitude for item in items],
+            [item.climate_condition for item in items],
+            available_fleet,
+            strategies,
+        )
+        rows, cols = assignment.solve_assignment(scores)
+
+        # The cache may be behind the database: ships taken meanwhile are dropped and
+        # only the incidents that lost them are solved again over the ships still free
+        free = np.ones(len(available_fleet), dtype=bool)
+        kept_rows, kept_cols, lost = [], [], set()
+        for attempt in range(TRIGGER_CLAIM_ATTEMPTS):
+            ship_ids = available_fleet.ids[rows]
+            claimed = {
+                ship.shipid: ship
+                for ship in db.query(AllShip)
+                .filter(
+                    and_(
+                        AllShip.shipid.in_(ship_ids.tolist()),
+                        (AllShip.mission == False) | (AllShip.mission == 0)
+                    )
+                )
+                .with_for_update()
+                .all()
+            }
+            for ship in claimed.values():
+                ship.mission = True
+            won = np.fromiter((shipid in claimed for shipid in ship_ids.tolist()), dtype=bool, count=len(ship_ids))
+            kept_rows.append(rows[won])
+            kept_cols.append(cols[won])
+            free[rows] = False
+            if won.all() or attempt == TRIGGER_CLAIM_ATTEMPTS - 1:
+                break
+            lost.update(ship_ids[~won].tolist())
+            CLAIM_CONFLICTS.inc(int((~won).sum()))
+            retry, candidates = cols[~won], np.flatnonzero(free)
+            sub_rows, sub_cols = assignment.solve_assignment(scores[np.ix_(candidates, retry)])
+            rows, cols = candidates[sub_rows], retry[sub_cols]
+            if not len(rows):
+                break
+        rows, cols = np.concatenate(kept_rows), np.concatenate(kept_cols)
+        ship_ids = [int(available_fleet.ids[row]) for row in rows]
+
+        now = datetime.utcnow()
+        results = []
+        for row, col, shipid in zip(rows.tolist(), cols.tolist(), ship_ids):
+            alert_result = AlertResult(
+                alert_type=items[col].alert_type,
+                ship_id=shipid,
+                best_ship=available_fleet.names[row],
+                final_score=float(scores[row, col]),
+                score_scope=shipalloc.SCOPE_FLEET,
+                timestamp=now
+            )
+            db.add(alert_result)
+            results.append((col, alert_result))
+
+        # Flush first so the new ids are read before commit expires the objects
+        db.flush()
+        assignments = [
+            schemas.TriggerBatchAssignment(
+                index=col,
+                alert_result_id=alert_result.id,
+                alert_type=alert_result.alert_type,
+                best_ship=alert_result.best_ship,
+                ship_id=alert_result.ship_id,
+                final_score=alert_result.final_score,
+                score_scope=alert_result.score_scope,
+            )
+            for col, alert_result in results
+        ]
+        db.commit()
+        response_cache.versions.bump(response_cache.ALERT_RESULTS)
+        resync_ships(db, lost)
+
+        for item in assignments:
+            fleet_cache.fleet.set_mission(item.ship_id, True)
+        CLAIMS.inc(len(assignments))
+        for item in assignments:
+            events.broker.publish("allocation", {
+                "alert_result_id": item.alert_result_id,
+                "alert_type": item.alert_type,
+                "ship_id": item.ship_id,
+                "best_ship": item.best_ship,
+                "final_score": item.final_score,
+                "score_scope": item.score_scope,
+                "version": fleet_cache.fleet.version,
+            })
 
-        return schemas.TriggerAlertResponse(
-            alert_type=request.alert_type,
-            best_ship=best_ship.name,
-            ship_id=best_ship.ship_id,
-            final_score=best_ship.Final_score
+        assigned = set(cols.tolist())
+        assignments.sort(key=lambda a: a.index)
+        return schemas.TriggerBatchResponse(
+            assignments=assignments,
+            unassigned=[i for i in range(len(items)) if i not in assigned],
         )
 
     except SQLAlchemyError as e:
@@ -261,10 +813,98 @@ def trigger_alert(request: schemas.TriggerAlertRequest, db: Session = Depends(ge
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@app.get("/alert-results", response_model=List[schemas.AlertResultBase])
-def get_all_alert_results(db: Session = Depends(get_db)):
-    results = db.query(AlertResult).order_by(AlertResult.timestamp.desc()).all()
-    return results
+@when(not database.DB_ASYNC, app.get("/alert-results", response_model=List[schemas.AlertResultBase]))
+def get_all_alert_results(request: Request, db: Session = Depends(get_db)):
+    def build():
+        results = db.query(AlertResult).order_by(AlertResult.timestamp.desc(), AlertResult.id.desc()).all()
+        return [schemas.AlertResultBase.model_validate(result) for result in results]
+    return cached_get(request, response_cache.ALERT_RESULTS, response_cache.REVALIDATE, build)
+
+
+@when(database.DB_ASYNC, app.get("/alert-results", response_model=List[schemas.AlertResultBase]))
+async def get_all_alert_results_async(request: Request, db=Depends(get_async_db)):
+    version = response_cache.versions.peek(response_cache.ALERT_RESULTS)
+    if version is None:
+        version = await asyncio.to_thread(response_cache.versions.current, response_cache.ALERT_RESULTS)
+    key = (request.url.path, request.url.query, version)
+    entry = response_cache.cache.get(key)
+    if entry is None:
+        results = await db.execute(select(AlertResult).order_by(AlertResult.timestamp.desc(), AlertResult.id.desc()))
+        entry = response_cache.cache.put(
+            key, [schemas.AlertResultBase.model_validate(result) for result in results.scalars().all()]
+        )
+    return response_cache.respond(request, entry, response_cache.REVALIDATE)
+
+
+# Columns of AlertResultBase, newest first by (timestamp, id)
+ALERT_RESULT_COLUMNS = (
+    AlertResult.id, AlertResult.alert_type, AlertResult.best_ship,
+    AlertResult.final_score, AlertResult.score_scope, AlertResult.timestamp, AlertResult.status,
+)
+ALERT_RESULT_ORDER = (AlertResult.timestamp, AlertResult.id)
+
+
+def alert_results_select(status: Optional[bool], ship_id: Optional[int], alert_type: Optional[str]):
+    statement = select(*ALERT_RESULT_COLUMNS)
+    if status is not None:
+        statement = statement.where(AlertResult.status == status)
+    if ship_id is not None:
+        statement = statement.where(AlertResult.ship_id == ship_id)
+    if alert_type is not None:
+        statement = statement.where(AlertResult.alert_type == alert_type)
+    return statement
+
+
+def alert_result_rows_to_dicts(rows) -> List[dict]:
+    return [
+        {
+            "id": id_,
+            "alert_type": alert_type,
+            "best_ship": best_ship,
+            "final_score": final_score,
+            "score_scope": score_scope,
+            "timestamp": timestamp.isoformat(),
+            "status": bool(status),
+        }
+        for id_, alert_type, best_ship, final_score, score_scope, timestamp, status in rows
+    ]
+
+
+@app.get("/alert-results/page", response_model=schemas.AlertResultPage)
+def get_alert_results_page(
+    request: Request,
+    limit: int = Query(pagination.PAGE_SIZE, ge=1, le=pagination.PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    status: Optional[bool] = Query(None, description="true = active, false = completed"),
+    ship_id: Optional[int] = None,
+    alert_type: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Alert results newest first, one keyset page at a time."""
+    key = pagination.decode_cursor(cursor, (datetime.fromisoformat, int)) if cursor else None
+
+    def build():
+        rows, next_key = pagination.page(
+            db, alert_results_select(status, ship_id, alert_type), ALERT_RESULT_ORDER, key, limit, descending=True
+        )
+        return {
+            "items": alert_result_rows_to_dicts(rows),
+            "next_cursor": pagination.encode_cursor(next_key) if next_key else None,
+        }
+    return cached_get(request, response_cache.ALERT_RESULTS, response_cache.REVALIDATE, build)
+
+
+@app.get("/alert-results/export")
+def export_alert_results(
+    status: Optional[bool] = Query(None, description="true = active, false = completed"),
+    ship_id: Optional[int] = None,
+    alert_type: Optional[str] = None,
+):
+    """Every matching alert result as NDJSON, newest first, read in batches so memory stays flat."""
+    chunks = pagination.batches(alert_results_select(status, ship_id, alert_type), ALERT_RESULT_ORDER, descending=True)
+    return StreamingResponse(
+        pagination.ndjson(chunks, alert_result_rows_to_dicts), media_type="application/x-ndjson"
+    )
 
 from fastapi import Body
 
@@ -294,6 +934,13 @@ def complete_mission(
 
         # --- Step 5: Commit both updates ---
         db.commit()
+        response_cache.versions.bump(response_cache.ALERT_RESULTS)
+        fleet_cache.fleet.set_mission(ship.shipid, False)
+        events.broker.publish("mission_complete", {
+            "alert_result_id": alert_result.id,
+            "ship_id": ship.shipid,
+            "version": fleet_cache.fleet.version,
+        })
 
         return {
             "detail": "Mission marked as complete successfully.",
@@ -306,9 +953,37 @@ def complete_mission(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@app.post("/update-ship-position", response_model=schemas.UpdateShipPositionResponse)
+def simulate_move(old_lat: float, old_lon: float, lat: float, lon: float, samples: bool, text: bool):
+    """Route simulation for a position update: the text for the message and the structured result."""
+    simulation = distance_calc.simulate_route(old_lat, old_lon, lat, lon, speed_kmh=50)  # or any default speed
+    return (simulation.render() if text else simulation.summary()), simulation.to_dict(with_samples=samples)
+
+
+def position_update_response(
+    ship: AllShip, old_lat: float, old_lon: float, distance: float, simulation_message: str, simulation: dict
+):
+    simulator.engine.cancel([ship.shipid])  # A reported position ends dead reckoning
+    fleet_cache.fleet.apply_ship(ship)
+    history.store.append([ship.shipid], [ship.latitude], [ship.longitude])
+    events.broker.publish_position(ship.shipid, ship.latitude, ship.longitude, fleet_cache.fleet.version)
+
+    return schemas.UpdateShipPositionResponse(
+        ship_id=ship.shipid,
+        old_latitude=old_lat,
+        old_longitude=old_lon,
+        new_latitude=ship.latitude,
+        new_longitude=ship.longitude,
+        distance_km=distance,
+        message=f"Ship moved successfully.\nDistance traveled: {distance:.2f} km\n{simulation_message}",
+        simulation=simulation,
+    )
+
+
+@when(not database.DB_ASYNC, app.post("/update-ship-position", response_model=schemas.UpdateShipPositionResponse))
 def update_ship_position(
     data: schemas.UpdateShipPositionRequest,
+    samples: bool = Query(False, description="Include the hourly positions along each route segment"),
+    text: bool = Query(False, description="Put the full text simulation report in message"),
     db: Session = Depends(get_db)
 ):
     ship = db.query(AllShip).filter(AllShip.shipid == data.ship_id).first()
@@ -321,24 +996,340 @@ def update_ship_position(
     # Calculate distance
     distance = distance_calc.haversine(old_lat, old_lon, data.latitude, data.longitude)
 
-    # Optional: simulate movement and get message
-    simulation_message = distance_calc.simulate_movement_with_restrictions(
-        old_lat, old_lon, data.latitude, data.longitude, speed_kmh=50  # or any default speed
-    )
+    # Simulate the move around restricted zones; the text report is only rendered on request
+    simulation_message, simulation = simulate_move(old_lat, old_lon, data.latitude, data.longitude, samples, text)
 
-    # Update ship position in DB
+    # Update ship position in DB; the move counts as a report received now
     ship.latitude = data.latitude
     ship.longitude = data.longitude
+    ship.position_ts = time.time()
     db.add(ship)
     db.commit()
     db.refresh(ship)
+    return position_update_response(ship, old_lat, old_lon, distance, simulation_message, simulation)
 
-    return schemas.UpdateShipPositionResponse(
-        ship_id=ship.shipid,
-        old_latitude=old_lat,
-        old_longitude=old_lon,
-        new_latitude=ship.latitude,
-        new_longitude=ship.longitude,
-        distance_km=distance,
-        message=f"Ship moved successfully.\nDistance traveled: {distance:.2f} km\n{simulation_message}"
-    )
\ No newline at end of file
+
+@when(database.DB_ASYNC, app.post("/update-ship-position", response_model=schemas.UpdateShipPositionResponse))
+async def update_ship_position_async(
+    data: schemas.UpdateShipPositionRequest,
+    samples: bool = Query(False, description="Include the hourly positions along each route segment"),
+    text: bool = Query(False, description="Put the full text simulation report in message"),
+    db=Depends(get_async_db),
+):
+    ship = await db.get(AllShip, data.ship_id)
+    if not ship:
+        raise HTTPException(status_code=404, detail="Ship not found")
+
+    old_lat, old_lon = ship.latitude, ship.longitude
+    distance = distance_calc.haversine(old_lat, old_lon, data.latitude, data.longitude)
+    # Route planning around restricted zones is CPU-bound; run it on a worker thread
+    simulation_message, simulation = await asyncio.to_thread(
+        simulate_move, old_lat, old_lon, data.latitude, data.longitude, samples, text
+    )
+
+    ship.latitude = data.latitude
+    ship.longitude = data.longitude
+    ship.position_ts = time.time()
+    await db.commit()
+    return position_update_response(ship, old_lat, old_lon, distance, simulation_message, simulation)
+
+
+def ingest_position_batch(body: bytes, content_type: str) -> schemas.IngestPositionsResponse:
+    try:
+        batch = ingest.parse_batch(body, content_type)
+    except ingest.UnsupportedFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ingest.IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(batch) > INGEST_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {INGEST_BATCH_MAX} positions per batch")
+    POSITIONS_RECEIVED.inc(len(batch))
+
+    valid = ingest.valid_positions(batch)
+    reports = batch.take(valid)
+    latest = ingest.latest_per_ship(reports)
+    # A ship's newest report without a time is taken as of receipt
+    latest = ingest.PositionBatch(latest.ship_id, latest.lat, latest.lon, ingest.stamp_untimed(latest.ts, time.time()))
+
+    with SessionLocal() as db:
+        fleet_cache.fleet.ensure_loaded(db)
+        known, old_lat, old_lon = fleet_cache.fleet.positions(latest.ship_id)
+        unknown = latest.ship_id[~known]
+        latest = latest.take(known)
+        try:
+            # Late or replayed reports do not move a ship back to an older position
+            fresh = ingest.fresh_positions(db, latest.ship_id, latest.ts)
+            moves = latest.take(fresh)
+            simulator.engine.cancel(moves.ship_id)  # Reported positions end dead reckoning
+            ingest.write_positions(db, moves.ship_id, moves.lat, moves.lon, moves.ts)
+            db.commit()
+            with INGEST_APPLY_LOCK:
+                # A newer report committed by another request since the check above kept its
+                # row; only what the rows now hold goes to the cache, history and /events
+                applied = ingest.applied_positions(db, moves.ship_id, moves.lat, moves.lon, moves.ts)
+                fresh[np.flatnonzero(fresh)[~applied]] = False
+                moves = moves.take(applied)
+                fleet_cache.fleet.move_ships(moves.ship_id, moves.lat, moves.lon)
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    old_lat, old_lon = old_lat[known][fresh], old_lon[known][fresh]
+    # History keeps every report of a known ship, not just the newest
+    tracked = reports.take(np.isin(reports.ship_id, moves.ship_id))
+    history.store.append(tracked.ship_id, tracked.lat, tracked.lon, tracked.ts)
+    version = fleet_cache.fleet.version
+    for shipid, lat, lon in zip(moves.ship_id.tolist(), moves.lat.tolist(), moves.lon.tolist()):
+        events.broker.publish_position(shipid, lat, lon, version)
+    POSITIONS_APPLIED.inc(len(moves))
+
+    inside, crossed = ingest.restriction_flags(zones.registry.current(), old_lat, old_lon, moves.lat, moves.lon)
+    return schemas.IngestPositionsResponse(
+        received=len(batch),
+        applied=len(moves),
+        coalesced=int(valid.sum()) - len(unknown) - len(latest),
+        stale=latest.ship_id[~fresh].tolist(),
+        rejected=int((~valid).sum()),
+        unknown=unknown.tolist(),
+        restricted=moves.ship_id[inside].tolist(),
+        crossed=moves.ship_id[crossed].tolist(),
+        version=version,
+    )
+
+
+@app.post("/ingest/positions", response_model=schemas.IngestPositionsResponse)
+async def ingest_positions(request: Request):
+    """
+    Bulk position reports as NDJSON (application/x-ndjson) or packed binary records
+    (application/octet-stream, see ingest.RECORD_DTYPE). Reports are coalesced to the
+    newest per ship and written in one transaction; positions inside restricted zones
+    and tracks crossing one are flagged, not refused.
+    """
+    body = await request.body()
+    return await asyncio.to_thread(ingest_position_batch, body, request.headers.get("content-type", ""))
+
+
+@app.get("/history/track/{ship_id}", response_model=schemas.ShipTrack)
+def get_ship_track(
+    ship_id: int,
+    start: Optional[float] = Query(None, description="Window start, Unix seconds (default: end - 24 h)"),
+    end: Optional[float] = Query(None, description="Window end, Unix seconds (default: now)"),
+    max_points: int = Query(1000, ge=0, le=100000, description="Downsample to at most this many points (0 = all)"),
+):
+    end = time.time() if end is None else end
+    start = end - 86400.0 if start is None else start
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    rows, total = history.store.track(ship_id, start, end, max_points)
+    return JSONResponse(content={
+        "ship_id": ship_id,
+        "start": start,
+        "end": end,
+        "total": total,
+        "points": [
+            {"ts": ts, "latitude": lat, "longitude": lon}
+            for ts, lat, lon in zip(rows["ts"].tolist(), *history.coordinates(rows))
+        ],
+    })
+
+
+@app.get("/history/positions", response_model=schemas.HistoryPositions)
+def get_positions_at(
+    at: Optional[float] = Query(None, description="Time, Unix seconds (default: now)"),
+    min_lat: float = Query(-90.0), min_lon: float = Query(-180.0),
+    max_lat: float = Query(90.0), max_lon: float = Query(180.0),
+    lookback: float = Query(3600.0, gt=0, description="Ignore ships silent for longer than this many seconds"),
+    max_points: int = Query(5000, ge=0, le=100000, description="Thin to about this many ships for map rendering (0 = all)"),
+):
+    at = time.time() if at is None else at
+    rows, total = history.store.positions_at(at, (min_lat, min_lon, max_lat, max_lon), lookback, max_points)
+    return JSONResponse(content={
+        "at": at,
+        "total": total,
+        "ships": [
+            {"shipid": shipid, "latitude": lat, "longitude": lon, "ts": ts}
+            for shipid, lat, lon, ts in zip(rows["ship_id"].tolist(), *history.coordinates(rows), rows["ts"].tolist())
+        ],
+    })
+
+
+# ------------------ WORKER STARTUP ------------------
+@app.on_event("startup")
+def warm_up():
+    """
+    Fill the in-process caches so the first requests to this worker are not the
+    ones paying for it, then start following the other workers' fleet changes.
+    """
+    if WARMUP:
+        fleet_sync.sync.mark_seen()
+        with SessionLocal() as db:
+            fleet_cache.fleet.ensure_loaded(db)
+        for name in response_cache.NAMES:
+            response_cache.versions.current(name)
+        alert_catalog.catalog.load(response_cache.versions.current(response_cache.ALERTS))
+        zones.registry.current()
+    if fleet_sync.FLEET_SYNC:
+        fleet_sync.sync.start()
+
+
+# ------------------ FLEET SIMULATION ------------------
+@app.on_event("startup")
+def start_simulation():
+    if simulator.SIM_AUTOSTART:
+        simulator.engine.start()
+
+
+@app.get("/simulation", response_model=schemas.SimulationStatus)
+def get_simulation_status():
+    return simulator.engine.status()
+
+
+@app.post("/simulation/voyages", response_model=schemas.StartVoyagesResponse)
+def start_voyages(data: schemas.StartVoyagesRequest):
+    """
+    Send ships towards the given points along safe routes. Each ship sails at its
+    type's speed from its current (or currently simulated) position; a new voyage
+    replaces the ship's current one. Ships that cannot sail are listed in rejected.
+    """
+    with SessionLocal() as db:
+        fleet_cache.fleet.ensure_loaded(db)
+    started, rejected = simulator.start_voyages(
+        simulator.engine,
+        zones.registry.current(),
+        [v.ship_id for v in data.voyages],
+        [v.latitude for v in data.voyages],
+        [v.longitude for v in data.voyages],
+    )
+    return {"started": started, "rejected": rejected}
+
+
+@app.get("/simulation/voyages/{ship_id}", response_model=schemas.VoyageStatus)
+def get_voyage(ship_id: int):
+    voyage = simulator.engine.voyage(ship_id)
+    if voyage is None:
+        raise HTTPException(status_code=404, detail="Ship has no voyage")
+    return voyage
+
+
+@app.delete("/simulation/voyages/{ship_id}")
+def cancel_voyage(ship_id: int):
+    if not simulator.engine.cancel([ship_id]):
+        raise HTTPException(status_code=404, detail="Ship has no voyage")
+    return {"detail": "Voyage cancelled"}
+
+
+@app.post("/simulation/start", response_model=schemas.SimulationStatus)
+def start_simulation_clock(
+    speedup: Optional[float] = Query(None, ge=0, description="Times faster than real time (0 = as fast as possible)"),
+    tick_seconds: Optional[float] = Query(None, gt=0, description="Simulated seconds per tick"),
+):
+    simulator.engine.start(speedup, tick_seconds)
+    return simulator.engine.status()
+
+
+@app.post("/simulation/stop", response_model=schemas.SimulationStatus)
+def stop_simulation_clock():
+    simulator.engine.stop()
+    return simulator.engine.status()
+
+
+@app.post("/simulation/advance", response_model=schemas.SimulationAdvanceResponse)
+def advance_simulation(seconds: float = Query(..., gt=0, le=7 * 86400, description="Simulated seconds to run")):
+    """
+    What-if run: a copy of the current voyages is run forward as fast as possible
+    and its outcome returned. The live simulation, ship rows, caches and history
+    are left as they are.
+    """
+    what_if = simulator.engine.snapshot()
+    what_if.run_for(seconds, flush=False)
+    return {**what_if.status(), "ships": what_if.projection()}
+
+
+@app.on_event("shutdown")
+def stop_simulation():
+    simulator.engine.stop()  # Registered before the history flush so the last positions reach it
+
+
+@app.on_event("shutdown")
+def stop_fleet_sync():
+    fleet_sync.sync.stop()  # After the simulator's last flush, so other workers hear about it
+
+
+@app.on_event("shutdown")
+def flush_position_history():
+    history.store.close()
+
+
+@app.get("/events")
+async def stream_events(request: Request):
+    """
+    Server-Sent Events stream of ship positions (ship_position), allocations (allocation)
+    and completed missions (mission_complete). A resync event means this client fell
+    behind and events were dropped; catch up through /allships/changes.
+    """
+    subscriber = events.broker.subscribe(asyncio.get_running_loop())
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many event subscribers")
+
+    async def event_stream():
+        try:
+            yield events.format_sse("hello", {"version": fleet_cache.fleet.version})
+            while not await request.is_disconnected():
+                batch = await subscriber.next_batch(timeout=15.0)
+                if not batch:
+                    yield ": keep-alive\n\n"
+                for kind, data in batch:
+                    yield events.format_sse(kind, data)
+        finally:
+            events.broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/cache/invalidate")
+def invalidate_cache(names: Optional[List[str]] = Query(None, description="Counters to bump (default: all)")):
+    """Bump shared cache versions, e.g. after ship types, alerts or ships were edited directly in the database."""
+    names = names or list(response_cache.NAMES)
+    unknown = set(names) - set(response_cache.NAMES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown cache names: {', '.join(sorted(unknown))}")
+    for name in names:
+        response_cache.versions.bump(name)
+    if response_cache.FLEET in names:
+        # Edits made directly in the database are not stamped; have every worker re-read the whole table
+        response_cache.versions.bump(response_cache.FLEET_ROWS)
+    if response_cache.FLEET in names or response_cache.SHIP_TYPES in names:
+        # This worker catches up now; the others on their next fleet sync round
+        fleet_sync.sync.step()
+    return {"detail": "Cache invalidated", "names": names}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Process counters and histograms in the Prometheus text exposition format."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profile")
+def profile(
+    seconds: float = Query(5.0, gt=0, le=instrumentation.PROFILER_MAX_SECONDS),
+    interval: float = Query(0.005, ge=0.001, le=1.0, description="Seconds between samples"),
+    format: str = Query("collapsed", pattern="^(collapsed|top)$", description="collapsed stacks or a top-functions table"),
+    limit: int = Query(40, ge=1, le=1000, description="Functions listed by format=top"),
+    idle: bool = Query(False, description="Keep samples of threads parked in waits"),
+):
+    """Sample every thread's stack for a while and return where the process spent its time."""
+    if not instrumentation.PROFILER:
+        raise HTTPException(status_code=404, detail="Profiler disabled; start the server with PROFILER=1")
+    sampled = instrumentation.profiler.sample(seconds, interval, include_idle=idle)
+    if sampled is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    stacks, taken = sampled
+    if format == "top":
+        return {"samples": taken, "interval": interval, "functions": instrumentation.top_frames(stacks, limit)}
+    return PlainTextResponse(instrumentation.collapsed(stacks))
@@ -0,0 +1,173 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the queries-per-request histogram buckets
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+# ------------------ COUNTERS ------------------
+class Counter:
+    """A monotonically increasing, thread-safe process counter."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+def label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Prometheus label set, e.g. {route="/trigger",le="0.1"}."""
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# ------------------ HISTOGRAMS ------------------
+class Histogram:
+    """Thread-safe bucketed observations, one series per combination of label values."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def summary(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """(count, sum) per label values."""
+        with self._lock:
+            return {labels: (sum(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="' + (bound if bound == "+Inf" else f"{bound:g}") + '"'
+                lines.append(f"{self.name}_bucket{label_text(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{label_text(self.labelnames, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{label_text(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named process metrics, rendered in the Prometheus text format by /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, Histogram] = {}
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        """Get or create the counter called `name`."""
+        with self._lock:
+            counter = self._counters.get(name)
+            if counter is None:
+                counter = self._counters[name] = Counter(name, help_text)
+            return counter
+
+    def histogram(
+        self, name: str, help_text: str = "", buckets: Sequence[float] = LATENCY_BUCKETS, labelnames: Sequence[str] = ()
+    ) -> Histogram:
+        """Get or create the histogram called `name`."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(name, help_text, buckets, labelnames)
+            return histogram
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: counter.value for name, counter in self._counters.items()}
+
+    def render(self) -> str:
+        with self._lock:
+            counters = list(self._counters.values())
+            histograms = list(self._histograms.values())
+        lines = []
+        for counter in counters:
+            lines.append(f"# HELP {counter.name} {counter.help}")
+            lines.append(f"# TYPE {counter.name} counter")
+            lines.append(f"{counter.name} {counter.value}")
+        for histogram in histograms:
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+SPAN_SECONDS = registry.histogram(
+    "span_duration_seconds", "Time spent in instrumented hot paths (scoring, route planning)", labelnames=("span",)
+)
+
+
+# ------------------ SPANS ------------------
+class RequestTiming:
+    """Where one request's time went: SQL statements, and time per span name."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.spans: Dict[str, float] = {}
+
+
+# The timing of the request being served, set by the request middleware
+current_request: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar("current_request", default=None)
+
+
+def record_span(name: str, seconds: float):
+    SPAN_SECONDS.observe(seconds, name)
+    timing = current_request.get()
+    if timing is not None:
+        timing.spans[name] = timing.spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name: str):
+    """Time a block into span_duration_seconds{span=name} and the current request's timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorator form of span()."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record_span(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
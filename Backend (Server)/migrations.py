@@ -0,0 +1,78 @@
+from sqlalchemy import String, inspect, text
+
+from models import AlertResult, AllShip
+
+
+# ------------------ IN-PLACE UPGRADES ------------------
+# create_all() only creates missing tables, so columns and indexes that changed
+# on an existing table are brought up to date here, once, at startup.
+
+def upgrade_alert_results(engine):
+    """
+    Turn alert_results.timestamp from a VARCHAR into a real DATETIME, add the
+    score_scope column and the keyset indexes. SQLite has no ALTER COLUMN, but it already stores DateTime
+    as sortable ISO text; there old values only need the microseconds that
+    str(datetime) leaves off when they are zero, so text comparison matches.
+    """
+    inspector = inspect(engine)
+    if AlertResult.__tablename__ not in inspector.get_table_names():
+        return
+    columns = {column["name"]: column for column in inspector.get_columns(AlertResult.__tablename__)}
+    if isinstance(columns["timestamp"]["type"], String):
+        with engine.begin() as conn:
+            if engine.dialect.name == "mysql":
+                # Rows that never had a timestamp sort last instead of blocking NOT NULL
+                conn.execute(text(
+                    "UPDATE alert_results SET `timestamp` = '1970-01-01 00:00:00' "
+                    "WHERE `timestamp` IS NULL OR `timestamp` = ''"
+                ))
+                conn.execute(text("ALTER TABLE alert_results MODIFY `timestamp` DATETIME(6) NOT NULL"))
+            elif engine.dialect.name == "postgresql":
+                conn.execute(text(
+                    "UPDATE alert_results SET \"timestamp\" = '1970-01-01 00:00:00' "
+                    "WHERE \"timestamp\" IS NULL OR \"timestamp\" = ''"
+                ))
+                conn.execute(text(
+                    "ALTER TABLE alert_results ALTER COLUMN \"timestamp\" TYPE TIMESTAMP "
+                    "USING \"timestamp\"::timestamp, ALTER COLUMN \"timestamp\" SET NOT NULL"
+                ))
+            elif engine.dialect.name == "sqlite":
+                conn.execute(text(
+                    "UPDATE alert_results SET timestamp = timestamp || '.000000' WHERE length(timestamp) = 19"
+                ))
+
+    if "score_scope" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE alert_results ADD COLUMN score_scope VARCHAR(16)"))
+
+    existing = {index["name"] for index in inspector.get_indexes(AlertResult.__tablename__)}
+    for index in AlertResult.__table__.indexes:
+        if index.name not in existing:
+            index.create(engine)
+
+
+def upgrade_all_ships(engine):
+    """
+    Add the position_ts column that keeps late position reports from overwriting
+    newer ones, and the indexed updated_at column incremental fleet syncs read by.
+    Existing rows keep updated_at NULL until their next write; full fleet loads
+    still read them.
+    """
+    inspector = inspect(engine)
+    if AllShip.__tablename__ not in inspector.get_table_names():
+        return
+    columns = {column["name"] for column in inspector.get_columns(AllShip.__tablename__)}
+    for name in ("position_ts", "updated_at"):
+        if name not in columns:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE all_ships ADD COLUMN {name} DOUBLE PRECISION"))
+
+    existing = {index["name"] for index in inspector.get_indexes(AllShip.__tablename__)}
+    for index in AllShip.__table__.indexes:
+        if index.name not in existing:
+            index.create(engine)
+
+
+def upgrade(engine):
+    upgrade_alert_results(engine)
+    upgrade_all_ships(engine)
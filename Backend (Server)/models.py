@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Double, Float
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Double, Float, Text, DateTime, Index
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
+import time
 
 class Ship(Base):
     __tablename__ = "ships"
@@ -27,6 +29,11 @@ class AllShip(Base):
     name = Column(String, index=True)
     latitude = Column(Double)
     longitude = Column(Double)
+    # Unix seconds of the report the stored position came from (NULL: never reported)
+    position_ts = Column(Double, nullable=True)
+    # Unix seconds of the row's last write, stamped on every ORM or Core insert / update, so
+    # other workers' fleet caches read only the rows that changed (FleetCache.sync)
+    updated_at = Column(Double, nullable=True, index=True, default=time.time, onupdate=time.time)
     mission = Column(Boolean, default=False)
     type = Column(Integer, ForeignKey("ships.id"))
 
@@ -51,5 +58,33 @@ class AlertResult(Base):
     best_ship = Column(String(255), nullable=False)
     ship_id = Column(Integer, nullable=False)
     final_score = Column(Float, nullable=False)
-    timestamp = Column(String(255), default=datetime.utcnow)
+    # "fleet" or "nearest" (see shipalloc.SCOPE_*): scores are only comparable within one scope
+    score_scope = Column(String(16), nullable=True)
+    # Microsecond precision on MySQL, whose DATETIME otherwise drops fractions of a second
+    timestamp = Column(DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql"), nullable=False, default=datetime.utcnow)
     status = Column(Boolean, default=True)
+
+    # Newest first, with id breaking ties: the keyset order of /alert-results/page, alone or after one filter
+    __table_args__ = (
+        Index("ix_alert_results_timestamp_id", "timestamp", "id"),
+        Index("ix_alert_results_ship_timestamp", "ship_id", "timestamp", "id"),
+        Index("ix_alert_results_status_timestamp", "status", "timestamp", "id"),
+        Index("ix_alert_results_type_timestamp", "alert_type", "timestamp", "id"),
+    )
+
+
+class RestrictedArea(Base):
+    __tablename__ = "restricted_zones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    kind = Column(String(64), nullable=False, default="restricted")
+    polygon = Column(Text, nullable=False)  # JSON list of [lat, lon] vertices
+    active = Column(Boolean, default=True)
+
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    name = Column(String(64), primary_key=True)  # e.g. "alert_results"
+    version = Column(Integer, nullable=False, default=0)  # Bumped after every write to that data
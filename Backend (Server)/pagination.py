@@ -0,0 +1,97 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import Select
+
+from database import SessionLocal
+
+# Rows per page when the client does not pass a limit, and the largest limit accepted
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+# Rows read per query while streaming an NDJSON export
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "2000"))
+
+
+# ------------------ CURSORS ------------------
+def encode_cursor(key: Sequence[Any]) -> str:
+    """Opaque cursor for the sort key of the last row on a page."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in key]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[Callable[[Any], Any]]) -> Tuple:
+    """The sort key inside a cursor, each part converted by the matching type; 400 if it is not one of ours."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ------------------ KEYSET QUERIES ------------------
+def seek(columns: Sequence, key: Sequence[Any], descending: bool):
+    """
+    Rows strictly after `key` in (columns...) order, written out as nested
+    OR/AND comparisons rather than a row-value tuple so every backend can walk
+    the matching index instead of sorting.
+    """
+    column, value = columns[0], key[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, seek(columns[1:], key[1:], descending)))
+
+
+def ordered(statement: Select, columns: Sequence, descending: bool) -> Select:
+    return statement.order_by(*(column.desc() if descending else column.asc() for column in columns))
+
+
+def page(
+    db,
+    statement: Select,
+    columns: Sequence,
+    key: Optional[Sequence[Any]],
+    limit: int,
+    descending: bool,
+) -> Tuple[List, Optional[Tuple]]:
+    """
+    One page of rows after `key` (from the start when None), and the sort key to
+    continue from, or None on the last page. Reads one extra row to know whether
+    another page exists.
+    """
+    if key is not None:
+        statement = statement.where(seek(columns, key, descending))
+    rows = db.execute(ordered(statement, columns, descending).limit(limit + 1)).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, tuple(getattr(rows[-1], column.key) for column in columns)
+
+
+def batches(statement: Select, columns: Sequence, descending: bool, size: int = EXPORT_BATCH) -> Iterator[List]:
+    """
+    Every row of the statement, in keyset batches of `size`. Each batch uses its
+    own short session, so a slow client holds neither a connection nor a
+    transaction open for the whole export.
+    """
+    key = None
+    while True:
+        with SessionLocal() as db:
+            rows, key = page(db, statement, columns, key, size, descending)
+        if rows:
+            yield rows
+        if key is None:
+            return
+
+
+def ndjson(chunks: Iterable[List], to_dicts: Callable[[List], List[dict]]) -> Iterator[str]:
+    """One JSON object per line, one string per batch."""
+    for rows in chunks:
+        yield "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in to_dicts(rows))
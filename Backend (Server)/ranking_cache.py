@@ -0,0 +1,82 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+import metrics
+import shipalloc
+
+# Seconds a ranking is reused for the same alert, place, climate and fleet version
+RANKING_CACHE_TTL = float(os.getenv("RANKING_CACHE_TTL", "10"))
+# Size (degrees) of the cells incident locations are quantized to (0 = key on the exact coordinates)
+RANKING_CACHE_CELL_DEG = float(os.getenv("RANKING_CACHE_CELL_DEG", "0.001"))
+# Rankings kept; the least recently used go first
+RANKING_CACHE_SIZE = int(os.getenv("RANKING_CACHE_SIZE", "1024"))
+
+HITS = metrics.registry.counter("ranking_cache_hits_total", "Allocation rankings reused by /trigger or /trigger/preview")
+MISSES = metrics.registry.counter("ranking_cache_misses_total", "Allocation rankings scored from the fleet")
+
+
+# ------------------ RANKING MEMO ------------------
+class RankedEntry:
+    def __init__(self, ranked: List[shipalloc.Result], limit: int, exact: bool, created: float):
+        self.ranked = ranked
+        self.limit = limit  # How many were asked for; fewer means the fleet had no more
+        self.exact = exact  # Scored over the whole fleet, not a pruned top_k neighbourhood
+        self.created = created
+
+
+class RankingCache:
+    """
+    Short-lived memo of ranked candidates, so a /trigger/preview followed by the
+    real /trigger (or a retried trigger) scores the fleet once.
+
+    Keys hold the alert's weights, the scoring strategy, the quantized incident location, the climate,
+    the fleet cache version and the zone set version. Any move, claim or
+    release bumps the fleet version, so a hit always describes the fleet as it
+    is now; the TTL only bounds how long an idle entry is kept. A hit for a
+    nearby point in the same cell returns the ranking scored for the first one.
+    """
+
+    def __init__(self, ttl: float = RANKING_CACHE_TTL, cell_deg: float = RANKING_CACHE_CELL_DEG,
+                 max_entries: int = RANKING_CACHE_SIZE):
+        self.ttl = ttl
+        self.cell_deg = cell_deg
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, RankedEntry]" = OrderedDict()
+
+    def key(self, alert: shipalloc.AlertType, strategy: shipalloc.ScoringStrategy, lat: float, lon: float,
+            climate: float, fleet_version: int, zone_version: int) -> Tuple:
+        if self.cell_deg > 0:
+            lat, lon = math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+        return alert.name, alert.weights.tobytes(), strategy.name, lat, lon, climate, fleet_version, zone_version
+
+    def get(self, key: Hashable, limit: int, exact: bool) -> Optional[List[shipalloc.Result]]:
+        """The `limit` best candidates if a fresh enough ranking covers them, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry.created >= self.ttl:
+                return None
+            if entry.limit < limit or (exact and not entry.exact):
+                return None
+            self._entries.move_to_end(key)
+        HITS.inc()
+        return entry.ranked[:limit]
+
+    def put(self, key: Hashable, ranked: List[shipalloc.Result], limit: int, exact: bool):
+        MISSES.inc()
+        with self._lock:
+            self._entries[key] = RankedEntry(ranked, limit, exact, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = RankingCache()
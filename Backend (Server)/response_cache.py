@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+import metrics
+from database import SessionLocal
+from models import CacheVersion
+
+# Set to 0 to build every response from the database (ETags and 304s still work)
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1").lower() in ("1", "true", "yes")
+# Seconds a version read from the shared cache_versions table is trusted before it is read again
+CACHE_VERSION_TTL = float(os.getenv("CACHE_VERSION_TTL", "1.0"))
+# Longest a cached response is served without being rebuilt, even if no version bump was seen
+CACHE_ENTRY_TTL = float(os.getenv("CACHE_ENTRY_TTL", "300"))
+# Cached responses kept per process; the least recently used go first
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+# Browser max-age (seconds) for the rarely changing lists, /ships and /alerts
+CACHE_STATIC_MAX_AGE = int(os.getenv("CACHE_STATIC_MAX_AGE", "60"))
+
+# Names of the shared version counters
+SHIP_TYPES = "ships"
+ALERTS = "alerts"
+ALERT_RESULTS = "alert_results"
+FLEET = "fleet"  # Ship positions and missions; see fleet_sync
+# Not one of NAMES: bumped with FLEET when ship rows were deleted or edited outside the API,
+# which incremental fleet syncs cannot see, so every worker re-reads the whole table
+FLEET_ROWS = "fleet_rows"
+ZONES = "zones"  # Restricted zones; see zones.ZoneRegistry.share
+NAMES = (SHIP_TYPES, ALERTS, ALERT_RESULTS, FLEET, ZONES)
+
+STATIC_CACHE_CONTROL = f"public, max-age={CACHE_STATIC_MAX_AGE}"
+REVALIDATE = "no-cache"  # Browsers may store it but must check the ETag every time
+
+HITS = metrics.registry.counter("response_cache_hits_total", "Cached GET responses served without a query")
+MISSES = metrics.registry.counter("response_cache_misses_total", "Cached GET responses built from the database")
+NOT_MODIFIED = metrics.registry.counter("response_cache_not_modified_total", "304 Not Modified replies")
+BUMP_FAILURES = metrics.registry.counter("response_cache_bump_failures_total", "Shared version bumps that failed")
+
+
+# ------------------ SHARED VERSIONS ------------------
+class VersionBoard:
+    """
+    This process's view of the shared version counters in the cache_versions table.
+
+    Writers bump a counter after they commit. Every worker re-reads a counter at
+    most every CACHE_VERSION_TTL seconds, so a write reaches the caches of all
+    workers within that time, and the worker that wrote sees it at once.
+    """
+
+    def __init__(self, ttl: float = CACHE_VERSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._seen: Dict[str, Tuple[int, float]] = {}
+
+    def peek(self, name: str) -> Optional[int]:
+        """The version if it was read recently enough, else None."""
+        seen = self._seen.get(name)
+        if seen is not None and time.monotonic() - seen[1] < self.ttl:
+            return seen[0]
+        return None
+
+    def current(self, name: str) -> int:
+        version = self.peek(name)
+        if version is not None:
+            return version
+        return self.refresh(name)
+
+    def refresh(self, name: str) -> int:
+        """Read the counter now, whatever the TTL says."""
+        with SessionLocal() as db:
+            version = db.scalar(select(CacheVersion.version).where(CacheVersion.name == name)) or 0
+        with self._lock:
+            self._seen[name] = (version, time.monotonic())
+        return version
+
+    def bump(self, name: str):
+        """
+        Advance a counter in its own short transaction; call after the data change is committed.
+        A failed bump is not the caller's error: other workers then catch up within CACHE_ENTRY_TTL.
+        """
+        statement = update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+        try:
+            with SessionLocal() as db:
+                if not db.execute(statement).rowcount:
+                    db.add(CacheVersion(name=name, version=1))
+                    try:
+                        db.commit()
+                    except IntegrityError:
+                        # Another worker created the row first
+                        db.rollback()
+                        db.execute(statement)
+                db.commit()
+        except SQLAlchemyError:
+            BUMP_FAILURES.inc()
+        with self._lock:
+            self._seen.pop(name, None)
+
+
+# ------------------ RESPONSES ------------------
+class CachedResponse:
+    def __init__(self, body: bytes, created: float):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.created = created
+
+
+def render(content: Any) -> CachedResponse:
+    """Serialize like FastAPI's JSONResponse, with a strong ETag over the exact bytes."""
+    body = json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+    return CachedResponse(body, time.monotonic())
+
+
+class ResponseCache:
+    """LRU of rendered response bodies, keyed by (path, data version)."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_ENTRY_TTL, enabled: bool = RESPONSE_CACHE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.created >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        HITS.inc()
+        return entry
+
+    def put(self, key: Hashable, content: Any) -> CachedResponse:
+        entry = render(content)
+        MISSES.inc()
+        if self.enabled:
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so a W/ prefix on the client's tag is ignored."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def respond(request: Request, entry: CachedResponse, cache_control: str) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control}
+    if etag_matches(request, entry.etag):
+        NOT_MODIFIED.inc()
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+versions = VersionBoard()
+cache = ResponseCache()
@@ -0,0 +1,124 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+import route_planner
+import shipalloc
+import zones
+from geometry import Point
+from zones import ZoneSet
+
+# Size (degrees) of the cells route distances are cached between, and how many cell pairs are kept
+ROUTE_CACHE_CELL_DEG = float(os.getenv("ROUTE_CACHE_CELL_DEG", "0.1"))
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "100000"))
+
+CellPair = Tuple[int, int, int, int]
+
+
+# ------------------ ROUTE DISTANCE CACHE ------------------
+class RouteDistanceCache:
+    """
+    LRU cache of safe-route distances between quantized source and target cells.
+
+    A straight segment that clears every zone is answered exactly (haversine),
+    without touching the cache. Only pairs that need a detour go to the planner,
+    and its answer is reused for every later query between the same two
+    cell_deg x cell_deg cells, so cached distances are accurate to about two
+    cell diagonals. The cache empties itself whenever the zone set changes.
+    """
+
+    def __init__(
+        self,
+        cell_deg: float = ROUTE_CACHE_CELL_DEG,
+        max_entries: int = ROUTE_CACHE_SIZE,
+        zone_source: Callable[[], ZoneSet] = zones.registry.current,
+    ):
+        self.cell_deg = cell_deg
+        self.max_entries = max_entries
+        self.zone_source = zone_source
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CellPair, float]" = OrderedDict()
+        self._zone_set: Optional[ZoneSet] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, start: Point, goal: Point) -> CellPair:
+        cd = self.cell_deg
+        return (
+            math.floor(start[0] / cd), math.floor(start[1] / cd),
+            math.floor(goal[0] / cd), math.floor(goal[1] / cd),
+        )
+
+    def _sync(self, zone_set: ZoneSet):
+        """Drop every entry computed against an older zone set. Call with the lock held."""
+        if zone_set is not self._zone_set:
+            self._entries.clear()
+            self._zone_set = zone_set
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def distance(self, start: Point, goal: Point, zone_set: Optional[ZoneSet] = None) -> float:
+        """Safe-route distance (km) from start to goal, or inf if there is no safe route."""
+        if zone_set is None:
+            zone_set = self.zone_source()
+        if not zone_set.intersects_segment(start, goal):
+            return shipalloc.calculate_distance(*start, *goal)
+        return self._detour(start, goal, zone_set)
+
+    def _detour(self, start: Point, goal: Point, zone_set: ZoneSet) -> float:
+        """Route distance for a pair whose straight segment is blocked, through the cache."""
+        key = self._key(start, goal)
+        with self._lock:
+            self._sync(zone_set)
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        route = route_planner.plan_route(zone_set, start, goal)
+        if route is None:
+            # Not cached: another point of the same cell may well be reachable
+            return math.inf
+
+        with self._lock:
+            self._sync(zone_set)
+            self._entries[key] = route[1]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return route[1]
+
+    def fleet_distances(self, fleet: shipalloc.FleetArrays, lat: float, lon: float) -> np.ndarray:
+        """
+        Route distance from every ship to (lat, lon). Matches shipalloc.RouteDistanceFn.
+        Clear straight segments are found in one vectorized batch; only the blocked
+        ones go through the cache and planner.
+        """
+        zone_set = self.zone_source()
+        distance = np.full(len(fleet), math.inf)
+        if zone_set.contains(lat, lon):
+            return distance
+
+        free = np.flatnonzero(~zone_set.contains_many(fleet.lat, fleet.lon))
+        starts = np.column_stack((fleet.lat[free], fleet.lon[free]))
+        blocked = zone_set.segments_blocked(starts, np.broadcast_to((lat, lon), starts.shape))
+        clear = free[~blocked]
+        distance[clear] = shipalloc.calculate_distances(fleet.lat[clear], fleet.lon[clear], lat, lon)
+        for i in free[blocked].tolist():
+            distance[i] = self._detour((float(fleet.lat[i]), float(fleet.lon[i])), (lat, lon), zone_set)
+        return distance
+
+
+cache = RouteDistanceCache()
@@ -0,0 +1,155 @@
+import heapq
+import math
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from geometry import Point
+import metrics
+from shipalloc import calculate_distance
+from zones import ZoneSet
+
+# How far (degrees) graph nodes are pushed out from zone corners, so paths clear the boundary
+INFLATE_DEG = float(os.getenv("ROUTE_INFLATE_DEG", "0.05"))
+
+START, GOAL = -1, -2
+
+
+def inflated_corners(vertices, inflate: float) -> List[Point]:
+    """
+    Convex corners of a polygon pushed `inflate` degrees outwards along the corner bisector.
+    Reflex corners are skipped: a shortest path never bends around them.
+    """
+    pts = [tuple(p) for p in vertices]
+    if len(pts) > 3 and pts[0] == pts[-1]:
+        pts = pts[:-1]
+    n = len(pts)
+    area2 = sum(pts[i][0] * pts[(i + 1) % n][1] - pts[(i + 1) % n][0] * pts[i][1] for i in range(n))
+    orientation = 1.0 if area2 > 0 else -1.0
+
+    corners = []
+    for i in range(n):
+        (px, py), (vx, vy), (nx, ny) = pts[i - 1], pts[i], pts[(i + 1) % n]
+        turn = (vx - px) * (ny - vy) - (vy - py) * (nx - vx)
+        if turn * orientation <= 0:
+            continue  # reflex or collinear corner
+
+        normals = []
+        for dx, dy in ((vx - px, vy - py), (nx - vx, ny - vy)):
+            length = math.hypot(dx, dy) or 1.0
+            normals.append((orientation * dy / length, -orientation * dx / length))
+        bx, by = normals[0][0] + normals[1][0], normals[0][1] + normals[1][1]
+        length = math.hypot(bx, by) or 1.0
+        bx, by = bx / length, by / length
+        # Scale so the offset clears both adjacent edges by `inflate`
+        scale = inflate / max(bx * normals[0][0] + by * normals[0][1], 0.3)
+        corners.append((vx + bx * scale, vy + by * scale))
+    return corners
+
+
+# ------------------ VISIBILITY GRAPH ------------------
+class RoutePlanner:
+    """
+    Shortest safe polyline between two points, around every zone of a ZoneSet.
+
+    Nodes are the inflated convex corners of every zone plus the configured
+    waypoints; node-to-node visibility is computed once when the planner is
+    built. A query runs A* (haversine heuristic) from the start, checking the
+    start -> node and node -> goal edges lazily, only for nodes A* actually
+    reaches, so queries stay cheap even with many zones.
+    """
+
+    def __init__(self, zone_set: ZoneSet, inflate: float = INFLATE_DEG):
+        self.zone_set = zone_set
+        self.version = zone_set.version
+
+        candidates: List[Point] = []
+        for zone in zone_set.zones:
+            candidates.extend(inflated_corners(zone.polygon.vertices.tolist(), inflate))
+        candidates.extend(zone_set.waypoints.values())
+        self.nodes: List[Point] = [p for p in candidates if not zone_set.contains(*p)]
+
+        # Node-to-node visibility, one vectorized batch of segments per node
+        self.neighbors: List[List[Tuple[int, float]]] = [[] for _ in self.nodes]
+        points = np.asarray(self.nodes, dtype=np.float64).reshape(-1, 2)
+        for i in range(len(points) - 1):
+            others = points[i + 1:]
+            blocked = zone_set.segments_blocked(np.broadcast_to(points[i], others.shape), others)
+            for j in (np.flatnonzero(~blocked) + i + 1).tolist():
+                d = calculate_distance(*self.nodes[i], *self.nodes[j])
+                self.neighbors[i].append((j, d))
+                self.neighbors[j].append((i, d))
+
+    def visible(self, a: Point, b: Point) -> bool:
+        return not self.zone_set.intersects_segment(a, b)
+
+    def plan(self, start: Point, goal: Point) -> Optional[Tuple[List[Point], float]]:
+        """(polyline from start to goal, length in km), or None if no safe route exists."""
+        if self.zone_set.contains(*start) or self.zone_set.contains(*goal):
+            return None
+        if self.visible(start, goal):
+            return [start, goal], calculate_distance(*start, *goal)
+
+        # (f, g, node, parent, start edge still to be checked)
+        open_heap = []
+        for i, p in enumerate(self.nodes):
+            g = calculate_distance(*start, *p)
+            open_heap.append((g + calculate_distance(*p, *goal), g, i, START, True))
+        heapq.heapify(open_heap)
+        parents = {}
+        closed = set()
+
+        while open_heap:
+            _, g, node, parent, check_start = heapq.heappop(open_heap)
+            if node in closed:
+                continue
+            if check_start and not self.visible(start, self.nodes[node]):
+                continue
+            closed.add(node)
+            parents[node] = parent
+
+            if node == GOAL:
+                path = [goal]
+                step = parent
+                while step != START:
+                    path.append(self.nodes[step])
+                    step = parents[step]
+                path.append(start)
+                path.reverse()
+                return path, g
+
+            point = self.nodes[node]
+            if GOAL not in closed and self.visible(point, goal):
+                g_goal = g + calculate_distance(*point, *goal)
+                heapq.heappush(open_heap, (g_goal, g_goal, GOAL, node, False))
+            for neighbor, weight in self.neighbors[node]:
+                if neighbor not in closed:
+                    g_next = g + weight
+                    heapq.heappush(
+                        open_heap,
+                        (g_next + calculate_distance(*self.nodes[neighbor], *goal), g_next, neighbor, node, False),
+                    )
+        return None
+
+
+_planner: Optional[RoutePlanner] = None
+_planner_lock = threading.Lock()
+
+
+def get_planner(zone_set: ZoneSet) -> RoutePlanner:
+    """The planner for this zone set, rebuilt only when the zones are reloaded."""
+    global _planner
+    planner = _planner
+    if planner is not None and planner.zone_set is zone_set:
+        return planner
+    with _planner_lock:
+        if _planner is None or _planner.zone_set is not zone_set:
+            _planner = RoutePlanner(zone_set)
+        return _planner
+
+
+@metrics.timed("route_plan")
+def plan_route(zone_set: ZoneSet, start: Point, goal: Point) -> Optional[Tuple[List[Point], float]]:
+    return get_planner(zone_set).plan(start, goal)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ShipBase(BaseModel):
     name: Optional[str]
@@ -44,6 +44,16 @@ class AllShipWithShipInfo(AllShipBase):
     class Config:
         from_attributes = True
 
+class AllShipPage(BaseModel):
+    items: List[AllShipWithShipInfo]
+    next_cursor: Optional[str]  # Pass back as cursor for the next page; null on the last page
+
+class FleetChanges(BaseModel):
+    version: int
+    reset: bool
+    changed: List[AllShip]
+    deleted: List[int]
+
 class AlertBase(BaseModel):
     id: int
     name: str
@@ -59,6 +69,7 @@ class TriggerAlertRequest(BaseModel):
     latitude: float
     longitude: float
     climate_condition: int
+    strategy: Optional[str] = None  # weighted_sum, distance_dominant or time_decayed; default SCORING_STRATEGY
 
 
 class TriggerAlertResponse(BaseModel):
@@ -66,6 +77,44 @@ class TriggerAlertResponse(BaseModel):
     best_ship: str
     ship_id: int
     final_score: float
+    score_scope: str  # "fleet", or "nearest" when TRIGGER_TOP_K normalized over the nearest ships only
+
+
+class TriggerPreviewCandidate(BaseModel):
+    rank: int  # 1 = the ship /trigger would claim first
+    ship_id: int
+    name: str
+    type: Optional[str]  # Ship type name
+    distance_km: float  # Straight line, or the safe route when ROUTE_TOP_K rescored this ship
+    speed: float  # km/h
+    eta_hours: float
+    eta: datetime  # UTC
+    T_value: float
+    alert_score: float
+    climate_score: float
+    final_score: float
+
+
+class TriggerPreviewResponse(BaseModel):
+    alert_type: str
+    strategy: str
+    fleet_version: int  # Fleet cache version the ranking was made against
+    cached: bool  # Served from the ranking cache without rescoring
+    candidates: List[TriggerPreviewCandidate]
+
+
+class TriggerBatchRequest(BaseModel):
+    alerts: List[TriggerAlertRequest]
+
+
+class TriggerBatchAssignment(TriggerAlertResponse):
+    index: int
+    alert_result_id: int
+
+
+class TriggerBatchResponse(BaseModel):
+    assignments: List[TriggerBatchAssignment]
+    unassigned: List[int]
 
 
 class AlertResultBase(BaseModel):
@@ -73,17 +122,52 @@ class AlertResultBase(BaseModel):
     alert_type: str
     best_ship: str
     final_score: float
+    score_scope: Optional[str] = None  # "fleet" or "nearest"; null for results stored before it was recorded
     timestamp: datetime
     status: bool
 
     class Config:
         from_attributes = True
+
+class AlertResultPage(BaseModel):
+    items: List[AlertResultBase]
+    next_cursor: Optional[str]  # Pass back as cursor for the next page; null on the last page
     
 class UpdateShipPositionRequest(BaseModel):
     ship_id: int
     latitude: float
     longitude: float
 
+class HourlySample(BaseModel):
+    hour: int
+    latitude: float
+    longitude: float
+    inside: bool
+
+class RouteSegment(BaseModel):
+    start: List[float]
+    end: List[float]
+    distance_km: float
+    hours: float
+    safe: bool
+    samples: Optional[List[HourlySample]] = None
+
+class RouteCrossing(BaseModel):
+    latitude: float
+    longitude: float
+    distance_km: float
+    zone: str
+
+class RouteSimulation(BaseModel):
+    status: str
+    safe: bool
+    direct_clear: bool
+    direct_distance_km: float
+    distance_km: Optional[float] = None
+    route: List[List[float]]
+    segments: List[RouteSegment]
+    first_crossing: Optional[RouteCrossing] = None
+
 class UpdateShipPositionResponse(BaseModel):
     ship_id: int
     old_latitude: float
@@ -92,3 +176,96 @@ class UpdateShipPositionResponse(BaseModel):
     new_longitude: float
     distance_km: float
     message: str
+    simulation: Optional[RouteSimulation] = None
+
+class IngestPositionsResponse(BaseModel):
+    received: int
+    applied: int
+    coalesced: int
+    rejected: int
+    unknown: List[int]
+    stale: List[int]
+    restricted: List[int]
+    crossed: List[int]
+    version: int
+
+class TrackPoint(BaseModel):
+    ts: float
+    latitude: float
+    longitude: float
+
+class ShipTrack(BaseModel):
+    ship_id: int
+    start: float
+    end: float
+    total: int
+    points: List[TrackPoint]
+
+class HistoryPosition(BaseModel):
+    shipid: int
+    latitude: float
+    longitude: float
+    ts: float
+
+class HistoryPositions(BaseModel):
+    at: float
+    total: int
+    ships: List[HistoryPosition]
+
+class VoyageTarget(BaseModel):
+    ship_id: int
+    latitude: float
+    longitude: float
+
+class StartVoyagesRequest(BaseModel):
+    voyages: List[VoyageTarget]
+
+class PlannedVoyage(BaseModel):
+    ship_id: int
+    speed_kmh: float
+    distance_km: float
+    eta_hours: float
+    route: List[List[float]]
+
+class RejectedVoyage(BaseModel):
+    ship_id: int
+    reason: str
+
+class StartVoyagesResponse(BaseModel):
+    started: List[PlannedVoyage]
+    rejected: List[RejectedVoyage]
+
+class VoyageStatus(BaseModel):
+    ship_id: int
+    latitude: float
+    longitude: float
+    speed_kmh: float
+    distance_km: float
+    remaining_km: float
+    eta: float
+    arrived: bool
+    route: List[List[float]]
+
+class SimulationStatus(BaseModel):
+    running: bool
+    sim_time: float
+    tick_seconds: float
+    speedup: float
+    flush_interval: float
+    voyages: int
+    sailing: int
+    arrivals: int
+    ticks: int
+    last_tick_ms: float
+    last_flush_ms: float
+    flushed: int
+
+class SimulatedShip(BaseModel):
+    ship_id: int
+    latitude: float
+    longitude: float
+    remaining_km: float
+    arrived: bool
+
+class SimulationAdvanceResponse(SimulationStatus):
+    ships: List[SimulatedShip]
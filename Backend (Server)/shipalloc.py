@@ -1,8 +1,19 @@
 import math
-from typing import List, Optional
+import os
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import metrics
 
 
 # ------------------ DATA STRUCTURES ------------------
+# What a final score's time term was normalized over: every free ship, or only the
+# top_k nearest candidates. Scores are only comparable within one scope.
+SCOPE_FLEET = "fleet"
+SCOPE_NEAREST = "nearest"
+
+
 class AlertType:
     def __init__(self, name: str, human_error: float, attack: float, weather: float, robbery: float, resource: float, struck: float):
         self.name = name
@@ -12,6 +23,8 @@ class AlertType:
         self.robbery = robbery
         self.resource = resource
         self.struck = struck
+        # Compiled once, lined up with CAPABILITY_FIELDS
+        self.weights = np.array([human_error, attack, weather, robbery, resource, struck], dtype=np.float64)
 
 
 
@@ -47,7 +60,8 @@ class Result:
         T_value: float,
         alert_score: float,
         climate_score: float,
-        Final_score: float
+        Final_score: float,
+        score_scope: str = SCOPE_FLEET,
     ):
         self.ship_id = ship_id
         self.name = name
@@ -59,6 +73,7 @@ class Result:
         self.alert_score = alert_score
         self.climate_score = climate_score
         self.Final_score = Final_score
+        self.score_scope = score_scope
 
 
 # ------------------ HELPER FUNCTIONS ------------------
@@ -79,63 +94,472 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
-# ------------------ MAIN PROCESS FUNCTION ------------------
-def process_alert(
+def calculate_distances(lats: np.ndarray, lons: np.ndarray, lat2: float, lon2: float) -> np.ndarray:
+    """Vectorized haversine – distance in km from every (lats[i], lons[i]) to one point"""
+    R = 6371.0
+    lat1 = np.radians(lats)
+    lat2_r = math.radians(lat2)
+    d_lat = np.radians(lat2 - lats)
+    d_lon = np.radians(lon2 - lons)
+
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * math.cos(lat2_r) * np.sin(d_lon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+
+# ------------------ VECTORIZED FLEET ------------------
+# Ship capability columns, in the same order as alert_weights() below.
+CAPABILITY_FIELDS = ("humanalert", "attack", "climate", "robery", "resource", "struck")
+
+
+def alert_weights(alert: AlertType) -> np.ndarray:
+    """Alert weights lined up with CAPABILITY_FIELDS."""
+    return alert.weights
+
+
+# ------------------ SCORING STRATEGIES ------------------
+# The weighted capability sum is divided by this to bring it to an average
+CAPABILITY_DIVISOR = 5.0
+# Hours over which the time_decayed strategy discounts a ship's capability by 1/e
+SCORING_DECAY_HOURS = float(os.getenv("SCORING_DECAY_HOURS", "6"))
+
+
+class ScoringStrategy:
+    """
+    How alert fit, arrival time and climate combine into the final score:
+
+        final = alert_weight * alert_score + time_weight * T_value + climate_weight * climate_score
+
+    alert_score is the fleet capability matrix times the alert's weight vector,
+    so every strategy shares one matrix product per alert. With decay_hours, the
+    capability terms are multiplied by exp(-time_hours / decay_hours): a ship
+    that arrives later is worth less. Only linear strategies (no decay) can be
+    pruned safely by pruning_is_safe().
+    """
+
+    def __init__(self, name: str, alert_weight: float, time_weight: float, climate_weight: float,
+                 decay_hours: Optional[float] = None):
+        self.name = name
+        self.alert_weight = alert_weight
+        self.time_weight = time_weight
+        self.climate_weight = climate_weight
+        self.decay_hours = decay_hours
+
+    @property
+    def linear(self) -> bool:
+        return self.decay_hours is None
+
+    def combine(self, alert_score, climate_score, T_value, time_hours) -> np.ndarray:
+        """Final scores from the score columns (any matching shapes)."""
+        if self.linear:
+            return (alert_score * self.alert_weight) + (T_value * self.time_weight) + (climate_score * self.climate_weight)
+        decay = np.exp(-time_hours / self.decay_hours)
+        capability = (alert_score * self.alert_weight) + (climate_score * self.climate_weight)
+        return capability * decay + (T_value * self.time_weight)
+
+
+WEIGHTED_SUM = ScoringStrategy("weighted_sum", alert_weight=0.4, time_weight=0.3, climate_weight=0.3)
+DISTANCE_DOMINANT = ScoringStrategy("distance_dominant", alert_weight=0.15, time_weight=0.7, climate_weight=0.15)
+TIME_DECAYED = ScoringStrategy(
+    "time_decayed", alert_weight=0.4, time_weight=0.3, climate_weight=0.3, decay_hours=SCORING_DECAY_HOURS
+)
+STRATEGIES = {strategy.name: strategy for strategy in (WEIGHTED_SUM, DISTANCE_DOMINANT, TIME_DECAYED)}
+
+
+class FleetArrays:
+    """
+    Column-oriented snapshot of the ships that can be allocated.
+
+    Every attribute the scorer needs is held in a NumPy array of length n,
+    so a whole fleet is scored in one pass instead of one Python object per ship.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[int],
+        names: Sequence[str],
+        type_names: Sequence[str],
+        lat: Sequence[float],
+        lon: Sequence[float],
+        speed: Sequence[float],
+        capabilities: Union[Sequence[Sequence[float]], np.ndarray],
+        type_speed: Optional[np.ndarray] = None,
+        type_capabilities: Optional[np.ndarray] = None,
+    ):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.names = np.asarray(names, dtype=object)
+        self.type_names = np.asarray(type_names, dtype=object)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.speed = np.asarray(speed, dtype=np.float64)
+        self.capabilities = np.asarray(capabilities, dtype=np.float64).reshape(len(self.ids), len(CAPABILITY_FIELDS))
+        self.climate = self.capabilities[:, CAPABILITY_FIELDS.index("climate")]
+
+        # Optional per-type rows; lets bounds be taken over a handful of types instead of every ship
+        self.type_speed = self.speed if type_speed is None else np.asarray(type_speed, dtype=np.float64)
+        self.type_capabilities = self.capabilities if type_capabilities is None else np.asarray(type_capabilities, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def take(self, idx) -> "FleetArrays":
+        """The rows at idx, as a new FleetArrays sharing the per-type rows."""
+        idx = np.asarray(idx, dtype=np.int64)
+        return FleetArrays(
+            ids=self.ids[idx],
+            names=self.names[idx],
+            type_names=self.type_names[idx],
+            lat=self.lat[idx],
+            lon=self.lon[idx],
+            speed=self.speed[idx],
+            capabilities=self.capabilities[idx],
+            type_speed=self.type_speed,
+            type_capabilities=self.type_capabilities,
+        )
+
+    @classmethod
+    def from_ships_data(cls, ships_data: List[dict]) -> "FleetArrays":
+        """Build the columns from the nested dicts used by process_alert(), skipping ships on a mission."""
+        ships = [s for s in map(ShipData, ships_data) if not s.mission]
+        return cls(
+            ids=[s.id for s in ships],
+            names=[s.name for s in ships],
+            type_names=[s.ship_name for s in ships],
+            lat=[s.lat for s in ships],
+            lon=[s.lon for s in ships],
+            speed=[s.speed for s in ships],
+            capabilities=[(s.humanalert, s.attack, s.climate, s.robery, s.resource, s.struck) for s in ships],
+        )
+
+
+class FleetScores:
+    """Per-ship scoring columns produced by score_fleet(), aligned with the FleetArrays rows."""
+
+    def __init__(self, distance, time, T_value, alert_score, climate_score, final_score, scope=SCOPE_FLEET):
+        self.distance = distance
+        self.time = time
+        self.T_value = T_value
+        self.alert_score = alert_score
+        self.climate_score = climate_score
+        self.final_score = final_score
+        self.scope = scope
+
+    def result(self, fleet: FleetArrays, i: int) -> Result:
+        """Materialize row i as a Result."""
+        return Result(
+            ship_id=int(fleet.ids[i]),
+            name=fleet.names[i],
+            type_=fleet.type_names[i],
+            distance=float(self.distance[i]),
+            speed=float(fleet.speed[i]),
+            time=float(self.time[i]),
+            T_value=float(self.T_value[i]),
+            alert_score=float(self.alert_score[i]),
+            climate_score=float(self.climate_score[i]),
+            Final_score=float(self.final_score[i]),
+            score_scope=self.scope,
+        )
+
+
+def score_fleet(
     alert: AlertType,
     target_lat: float,
     target_lon: float,
     climate_choice: float,
-    ships_data: List[dict],
-) -> Optional[Result]:
-    ships = [ShipData(s) for s in ships_data]
-    results: List[Result] = []
-
-    for s in ships:
-        if s.mission:
-            continue  # Skip ships already on a mission
-
-        dist = calculate_distance(s.lat, s.lon, target_lat, target_lon)
-        time_hours = dist / max(s.speed, 1.0)  # Avoid divide by zero
-
-        # Normalize alert score (weighted sum)
-        alert_score = (
-            alert.human_error * s.humanalert +
-            alert.attack * s.attack +
-            alert.weather * s.climate +
-            alert.robbery * s.robery +
-            alert.resource * s.resource +
-            alert.struck * s.struck
-        ) / 5.0  # normalize average
-
-        climate_score = climate_choice * s.climate
-
-        results.append(Result(
-            ship_id=s.id,
-            name=s.name,
-            type_=s.ship_name,
-            distance=dist,
-            speed=s.speed,
-            time=time_hours,
-            T_value=0.0,
-            alert_score=alert_score,
-            climate_score=climate_score,
-            Final_score=0.0
-        ))
+    fleet: FleetArrays,
+    distance: Optional[np.ndarray] = None,
+    strategy: ScoringStrategy = WEIGHTED_SUM,
+) -> FleetScores:
+    """
+    Score every ship in the fleet against one alert in a single vectorized pass.
+    `distance` (km per ship) replaces the straight-line haversine, e.g. with safe-route distances.
+    """
+    if distance is None:
+        dist = calculate_distances(fleet.lat, fleet.lon, target_lat, target_lon)
+    else:
+        dist = np.asarray(distance, dtype=np.float64)
+    time_hours = dist / np.maximum(fleet.speed, 1.0)  # Avoid divide by zero
 
-    # No available ships
-    if not results:
-        return None
+    # Weighted sum of the six capabilities, normalized to an average
+    alert_score = fleet.capabilities @ alert.weights / CAPABILITY_DIVISOR
+    climate_score = climate_choice * fleet.climate
 
     # Normalize time factor — higher T_value = faster ship
-    max_time = max(r.time for r in results)
-    min_time = min(r.time for r in results)
+    if len(fleet):
+        max_time = time_hours.max()
+        min_time = time_hours.min()
+    else:
+        max_time = min_time = 0.0
     time_range = max(max_time - min_time, 1e-6)
+    T_value = (max_time - time_hours) / time_range
+
+    final_score = strategy.combine(alert_score, climate_score, T_value, time_hours)
+    return FleetScores(dist, time_hours, T_value, alert_score, climate_score, final_score)
+
 
-    for r in results:
-        r.T_value = (max_time - r.time) / time_range  # normalized 0–1 scale
-        # Weighted scoring system
-        r.Final_score = (r.alert_score * 0.4) + (r.T_value * 0.3) + (r.climate_score * 0.3)
+@metrics.timed("score_batch")
+def score_matrix(
+    alerts: Sequence[AlertType],
+    target_lats: Sequence[float],
+    target_lons: Sequence[float],
+    climate_choices: Sequence[float],
+    fleet: FleetArrays,
+    strategies: Union[ScoringStrategy, Sequence[ScoringStrategy]] = WEIGHTED_SUM,
+) -> np.ndarray:
+    """
+    Final scores of every ship against every incident, as a (ships, incidents) matrix.
+    Column j equals score_fleet(alerts[j], ..., strategy=strategies[j]).final_score,
+    computed for all columns in one broadcast pass (one more per extra strategy).
+    """
+    lats = np.asarray(target_lats, dtype=np.float64)
+    lons = np.asarray(target_lons, dtype=np.float64)
+    if not len(fleet) or not len(lats):
+        return np.zeros((len(fleet), len(lats)))
 
-    # Select the best ship based on highest final score
-    best_ship = max(results, key=lambda r: r.Final_score)
-    return best_ship
+    # Haversine between every ship (rows) and every incident (columns)
+    lat1 = np.radians(fleet.lat)[:, None]
+    lat2 = np.radians(lats)[None, :]
+    d_lat = lat2 - lat1
+    d_lon = np.radians(lons[None, :] - fleet.lon[:, None])
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lon / 2) ** 2
+    dist = 6371.0 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    time_hours = dist / np.maximum(fleet.speed, 1.0)[:, None]
+
+    weights = np.stack([alert.weights for alert in alerts], axis=1)
+    alert_score = fleet.capabilities @ weights / CAPABILITY_DIVISOR
+    climate_score = fleet.climate[:, None] * np.asarray(climate_choices, dtype=np.float64)[None, :]
+
+    max_time = time_hours.max(axis=0)
+    min_time = time_hours.min(axis=0)
+    T_value = (max_time - time_hours) / np.maximum(max_time - min_time, 1e-6)
+    if isinstance(strategies, ScoringStrategy):
+        return strategies.combine(alert_score, climate_score, T_value, time_hours)
+
+    final = np.empty_like(T_value)
+    for strategy in {id(s): s for s in strategies}.values():
+        cols = [j for j, s in enumerate(strategies) if s is strategy]
+        final[:, cols] = strategy.combine(alert_score[:, cols], climate_score[:, cols], T_value[:, cols], time_hours[:, cols])
+    return final
+
+
+# Returns the k nearest candidates as a FleetArrays, the distance (km) of the k-th one
+# and an upper bound on the distance to the farthest ship in the fleet
+NearestFn = Callable[[float, float, int], Tuple[FleetArrays, float, float]]
+
+# Returns the safe-route distance (km) from every ship of a FleetArrays to (lat, lon); inf if unreachable
+RouteDistanceFn = Callable[[FleetArrays, float, float], np.ndarray]
+
+
+def pruning_is_safe(
+    alert: AlertType,
+    climate_choice: float,
+    fleet: FleetArrays,
+    scores: FleetScores,
+    kth_distance: float,
+    farthest_distance: float,
+    strategy: ScoringStrategy = WEIGHTED_SUM,
+    depth: int = 1,
+    among: Optional[np.ndarray] = None,
+    as_set: bool = False,
+) -> bool:
+    """
+    Guard for top-K scoring: are the `depth` best candidates also the `depth` best
+    ships over the whole fleet, in the same order?
+
+    Score differences between two ships only depend on the fleet-wide time range
+    through w = 1 / (max_time - min_time), and are linear in w. We bound that range
+    from the candidates, the K-th distance and the farthest ship, then require the
+    same candidate ranking at both ends of it (so every pairwise order holds in
+    between), with the depth-th candidate still beating the best possible excluded
+    ship (best type capabilities, fastest speed, starting at the K-th distance).
+
+    With `among`, only the ranking within those candidates has to hold, and
+    excluded ships are not compared (they cannot be picked). The bounds hold for
+    scores rescored on route distances too, as a route is never shorter than the
+    straight line. With `as_set`, only which candidates make the depth best has to
+    hold, not their order.
+    """
+    if len(scores.time if among is None else among) < max(depth, 1) or not strategy.linear:
+        return False
+    fastest = max(float(fleet.type_speed.max()), 1.0)
+    slowest = max(float(fleet.type_speed.min()), 1.0)
+
+    caps = fleet.type_capabilities
+    excluded_capability = (
+        (caps @ alert.weights / CAPABILITY_DIVISOR) * strategy.alert_weight
+        + (climate_choice * caps[:, CAPABILITY_FIELDS.index("climate")]) * strategy.climate_weight
+    ).max()
+    capability = scores.alert_score * strategy.alert_weight + scores.climate_score * strategy.climate_weight
+    excluded_time = kth_distance / fastest
+
+    min_lo = min(scores.time.min(), excluded_time)
+    min_hi = scores.time.min()
+    max_lo = scores.time.max()
+    max_hi = max(max_lo, farthest_distance / slowest)
+
+    order = rank_order(scores.final_score, depth, among=among)
+    for w in (1.0 / max(max_hi - min_lo, 1e-6), 1.0 / max(max_lo - min_hi, 1e-6)):
+        relative = capability - strategy.time_weight * w * scores.time
+        ranked = rank_order(relative, depth, among=among)
+        if not (np.array_equal(np.sort(ranked), np.sort(order)) if as_set else np.array_equal(ranked, order)):
+            return False
+        if among is None and excluded_capability - strategy.time_weight * w * excluded_time > relative[order].min():
+            return False
+    return True
+
+
+def rank_order(final_score: np.ndarray, limit: int, among: Optional[np.ndarray] = None) -> np.ndarray:
+    """Indices of the `limit` highest scores (only from `among`, if given), best first; the lower index wins ties."""
+    idx = np.arange(len(final_score)) if among is None else np.asarray(among, dtype=np.int64)
+    values = final_score[idx]
+    if len(idx) > limit:
+        keep = np.argpartition(-values, limit - 1)[:limit]
+        # Ties at the cut are broken by index, like the full sort below
+        cut = values[keep].min()
+        keep = np.union1d(keep, np.flatnonzero(values == cut))
+        idx, values = idx[keep], values[keep]
+    return idx[np.lexsort((idx, -values))][:limit]
+
+
+def route_rescore(
+    alert: AlertType,
+    target_lat: float,
+    target_lon: float,
+    climate_choice: float,
+    fleet: FleetArrays,
+    scores: FleetScores,
+    route_top_k: int,
+    route_distances: RouteDistanceFn,
+    strategy: ScoringStrategy = WEIGHTED_SUM,
+) -> Optional[Tuple[FleetScores, np.ndarray]]:
+    """
+    Second scoring stage: look up safe-route distances for the route_top_k best ships
+    by straight-line score and rescore the fleet with them.
+
+    Every other ship keeps its straight-line distance, so the time normalization is
+    still taken over every scored ship and a result only changes when a detour does.
+    Returns the rescored columns and the candidates that have a safe route, best
+    first, or None if none of them can reach the target.
+    """
+    idx = rank_order(scores.final_score, route_top_k)
+    idx.sort()
+
+    routed = np.asarray(route_distances(fleet.take(idx), target_lat, target_lon), dtype=np.float64)
+    reachable = np.isfinite(routed)
+    if not reachable.any():
+        return None
+
+    distance = scores.distance.copy()
+    distance[idx[reachable]] = routed[reachable]
+    rescored = score_fleet(alert, target_lat, target_lon, climate_choice, fleet, distance=distance, strategy=strategy)
+    rescored.scope = scores.scope
+    return rescored, rank_order(rescored.final_score, route_top_k, among=idx[reachable])
+
+
+# ------------------ MAIN PROCESS FUNCTION ------------------
+@metrics.timed("score")
+def rank_alert(
+    alert: AlertType,
+    target_lat: float,
+    target_lon: float,
+    climate_choice: float,
+    ships_data: Union[List[dict], FleetArrays],
+    limit: int = 1,
+    top_k: Optional[int] = None,
+    nearest: Optional[NearestFn] = None,
+    route_top_k: Optional[int] = None,
+    route_distances: Optional[RouteDistanceFn] = None,
+    strategy: ScoringStrategy = WEIGHTED_SUM,
+) -> List[Result]:
+    """
+    The `limit` best available ships for an alert, best first.
+
+    ships_data may be the list of nested ship dicts or a prebuilt FleetArrays;
+    the latter skips the per-ship conversion entirely.
+
+    With top_k and a nearest() lookup (e.g. backed by a spatial index), only the
+    top_k nearest ships are scored. If fewer than top_k come back, or
+    pruning_is_safe() cannot prove that the `limit` best ships rank exactly as
+    they would over the whole fleet, the whole fleet is scored. Pruned results
+    keep their ranking but report scores normalized over the candidates only,
+    marked with score_scope SCOPE_NEAREST.
+
+    With route_top_k and a route_distances() lookup, the straight-line ranking is
+    only a pre-filter: its route_top_k best ships are rescored on safe-route ETA
+    (see route_rescore()) and the ranking is drawn from those. If none of them has
+    a safe route, for instance because the target itself lies in a restricted zone,
+    the straight-line ranking is returned. Combined with top_k, pruning must also
+    prove that the route_top_k best candidates are the fleet's, and the rescored
+    ranking is checked again; if the detours make it unprovable, the whole fleet is
+    scored and rerouted.
+
+    `strategy` picks how the score columns combine (see ScoringStrategy); top_k
+    pruning is skipped for strategies it cannot prove safe for.
+    """
+    fleet = ships_data if isinstance(ships_data, FleetArrays) else FleetArrays.from_ships_data(ships_data)
+
+    # No available ships
+    if not len(fleet) or limit <= 0:
+        return []
+
+    routing = bool(route_top_k) and route_distances is not None
+    scored, scores, bounds = fleet, None, None
+    if top_k and nearest is not None and len(fleet) > top_k:
+        candidates, kth_distance, farthest_distance = nearest(target_lat, target_lon, top_k)
+        if len(candidates) >= top_k:
+            candidate_scores = score_fleet(alert, target_lat, target_lon, climate_choice, candidates, strategy=strategy)
+            # The route stage reroutes the route_top_k best, so those must be the fleet's as well
+            if pruning_is_safe(
+                alert, climate_choice, fleet, candidate_scores, kth_distance, farthest_distance,
+                strategy=strategy, depth=limit,
+            ) and (not routing or pruning_is_safe(
+                alert, climate_choice, fleet, candidate_scores, kth_distance, farthest_distance,
+                strategy=strategy, depth=route_top_k, as_set=True,
+            )):
+                candidate_scores.scope = SCOPE_NEAREST
+                scored, scores, bounds = candidates, candidate_scores, (kth_distance, farthest_distance)
+
+    if scores is None:
+        scores = score_fleet(alert, target_lat, target_lon, climate_choice, fleet, strategy=strategy)
+
+    if routing:
+        routed = route_rescore(
+            alert, target_lat, target_lon, climate_choice, scored, scores, route_top_k, route_distances, strategy
+        )
+        if routed is not None and bounds is not None and not pruning_is_safe(
+            alert, climate_choice, fleet, routed[0], *bounds,
+            strategy=strategy, depth=min(limit, len(routed[1])), among=routed[1],
+        ):
+            # Detours moved the candidate times too far to vouch for the fleet-wide ranking
+            scored = fleet
+            scores = score_fleet(alert, target_lat, target_lon, climate_choice, fleet, strategy=strategy)
+            routed = route_rescore(
+                alert, target_lat, target_lon, climate_choice, scored, scores, route_top_k, route_distances, strategy
+            )
+        if routed is not None:
+            rescored, order = routed
+            return [rescored.result(scored, int(i)) for i in order[:limit]]
+
+    # Highest final score first (first one wins ties)
+    return [scores.result(scored, int(i)) for i in rank_order(scores.final_score, limit)]
+
+
+def process_alert(
+    alert: AlertType,
+    target_lat: float,
+    target_lon: float,
+    climate_choice: float,
+    ships_data: Union[List[dict], FleetArrays],
+    top_k: Optional[int] = None,
+    nearest: Optional[NearestFn] = None,
+    route_top_k: Optional[int] = None,
+    route_distances: Optional[RouteDistanceFn] = None,
+    strategy: ScoringStrategy = WEIGHTED_SUM,
+) -> Optional[Result]:
+    """Pick the best available ship for an alert; see rank_alert() for the options."""
+    ranked = rank_alert(
+        alert, target_lat, target_lon, climate_choice, ships_data,
+        limit=1, top_k=top_k, nearest=nearest, route_top_k=route_top_k, route_distances=route_distances,
+        strategy=strategy,
+    )
+    return ranked[0] if ranked else None
@@ -0,0 +1,463 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.exc import SQLAlchemyError
+
+import distance_calc
+import events
+import fleet_cache
+import history
+import ingest
+import metrics
+import route_planner
+from database import WEB_CONCURRENCY, SessionLocal
+from zones import ZoneSet
+
+# Simulated seconds per tick, and how many times faster than real time ticks run (0 = as fast as possible)
+SIM_TICK_SECONDS = float(os.getenv("SIM_TICK_SECONDS", "1.0"))
+SIM_SPEEDUP = float(os.getenv("SIM_SPEEDUP", "1.0"))
+# Wall-clock seconds between writes of simulated positions to the DB, fleet cache, history and event stream
+SIM_FLUSH_INTERVAL = float(os.getenv("SIM_FLUSH_INTERVAL", "10.0"))
+# Start ticking when the API starts; otherwise only after POST /simulation/start. Voyages live in one
+# worker process, so with several workers (WEB_CONCURRENCY > 1) this is off unless asked for
+SIM_AUTOSTART = os.getenv("SIM_AUTOSTART", "1" if WEB_CONCURRENCY <= 1 else "0").lower() in ("1", "true", "yes")
+
+EARTH_RADIUS_KM = 6371.0
+
+FLUSH_FAILURES = metrics.registry.counter(
+    "simulator_flush_failures_total", "Simulator flushes that hit a database error (retried next flush)"
+)
+
+
+def haversine_many(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Element-wise haversine distance in km."""
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def plan_voyages(zone_set: ZoneSet, origins: np.ndarray, goals: np.ndarray) -> List[Tuple[Optional[np.ndarray], str]]:
+    """
+    Safe route for each (origin, goal) pair, as ((k, 2) lat/lon waypoints or None, status).
+    Straight legs are checked for the whole batch at once; only blocked ones go to the planner.
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    goals = np.asarray(goals, dtype=np.float64).reshape(-1, 2)
+    restricted = (
+        zone_set.contains_many(origins[:, 0], origins[:, 1]) | zone_set.contains_many(goals[:, 0], goals[:, 1])
+    )
+    clear = ~restricted
+    blocked = np.zeros(len(origins), dtype=bool)
+    blocked[clear] = zone_set.segments_blocked(origins[clear], goals[clear])
+
+    plans = []
+    for i in range(len(origins)):
+        if restricted[i]:
+            plans.append((None, distance_calc.ROUTE_ENDPOINT_RESTRICTED))
+        elif not blocked[i]:
+            plans.append((np.stack([origins[i], goals[i]]), distance_calc.ROUTE_OK))
+        else:
+            planned = route_planner.plan_route(zone_set, tuple(origins[i]), tuple(goals[i]))
+            if planned is None:
+                plans.append((None, distance_calc.ROUTE_NOT_FOUND))
+            else:
+                plans.append((np.asarray(planned[0], dtype=np.float64), distance_calc.ROUTE_OK))
+    return plans
+
+
+# ------------------ SIMULATION ENGINE ------------------
+class FleetSimulator:
+    """
+    Dead-reckoning movement of every ship that has a voyage.
+
+    Voyages are held as flat columns (speed, distance sailed, current leg) plus one
+    flat waypoint array with cumulative leg distances, so a tick advances the whole
+    fleet with a handful of array operations. Ticks only move the in-memory state;
+    every flush interval the ships that moved are written to the DB in one batch
+    and pushed to the fleet cache, position history and event stream. With
+    persist=False nothing leaves the engine, which is what what-if runs want.
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float = SIM_TICK_SECONDS,
+        speedup: float = SIM_SPEEDUP,
+        flush_interval: float = SIM_FLUSH_INTERVAL,
+        persist: bool = True,
+    ):
+        self.tick_seconds = tick_seconds
+        self.speedup = speedup
+        self.flush_interval = flush_interval
+        self.persist = persist
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: Dict[int, Tuple[np.ndarray, float, float]] = {}
+        self._cancelled: set = set()
+        self._reset_columns()
+        self.sim_time = time.time()
+        self.ticks = 0
+        self.tick_ms = 0.0
+        self.flush_ms = 0.0
+        self.flushed = 0
+        self.arrivals = 0
+
+    # Per-voyage columns, then the flat waypoint arrays
+    ROW_COLUMNS = ("ids", "speed", "sailed", "total", "legs", "leg", "lat", "lon", "arrived", "dirty", "started")
+    COLUMNS = ROW_COLUMNS + ("base", "wp_lat", "wp_lon", "wp_cum")
+
+    def _reset_columns(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.speed = np.empty(0)          # km/h
+        self.sailed = np.empty(0)         # km along the route
+        self.total = np.empty(0)          # route length, km
+        self.base = np.empty(0, dtype=np.int64)  # first waypoint in the flat arrays
+        self.legs = np.empty(0, dtype=np.int64)
+        self.leg = np.empty(0, dtype=np.int64)
+        self.lat = np.empty(0)
+        self.lon = np.empty(0)
+        self.arrived = np.empty(0, dtype=bool)
+        self.dirty = np.empty(0, dtype=bool)  # Moved since the last flush
+        self.started = np.empty(0)        # Wall-clock time the voyage was queued
+        self.wp_lat = np.empty(0)
+        self.wp_lon = np.empty(0)
+        self.wp_cum = np.empty(0)         # Cumulative km at each waypoint
+
+    # ---------- voyages ----------
+    def add_voyages(self, shipids, routes: List[np.ndarray], speeds):
+        """Queue voyages ((k, 2) lat/lon waypoints, k >= 2); they replace a ship's current one on the next tick."""
+        with self._lock:
+            now = time.time()
+            for shipid, route, speed in zip(np.asarray(shipids).tolist(), routes, np.asarray(speeds).tolist()):
+                self._pending[shipid] = (np.asarray(route, dtype=np.float64), float(speed), now)
+                self._cancelled.discard(shipid)
+
+    def cancel(self, shipids) -> int:
+        """Stop simulating these ships, e.g. because a real position report arrived. Returns how many were sailing."""
+        shipids = np.asarray(shipids, dtype=np.int64).ravel()
+        with self._lock:
+            if not len(self.ids) and not self._pending:
+                return 0
+            hit = shipids[np.isin(shipids, self.ids)].tolist()
+            for shipid in shipids.tolist():
+                self._pending.pop(shipid, None)
+            self._cancelled.update(hit)
+            return len(hit)
+
+    def positions(self, shipids) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(simulated mask, lat, lon) of the given ships; NaN where the engine does not hold the ship."""
+        shipids = np.asarray(shipids, dtype=np.int64).ravel()
+        with self._lock:
+            rows = np.full(len(shipids), -1, dtype=np.int64)
+            if len(self.ids):
+                order = np.argsort(self.ids)
+                found = order[np.minimum(np.searchsorted(self.ids, shipids, sorter=order), len(order) - 1)]
+                match = (self.ids[found] == shipids) & ~np.isin(shipids, list(self._cancelled))
+                rows[match] = found[match]
+            simulated = rows >= 0
+            lat = np.full(len(shipids), np.nan)
+            lon = np.full(len(shipids), np.nan)
+            lat[simulated], lon[simulated] = self.lat[rows[simulated]], self.lon[rows[simulated]]
+            return simulated, lat, lon
+
+    def voyage(self, shipid: int) -> Optional[dict]:
+        """Progress of one ship's voyage, or None when it has none."""
+        with self._lock:
+            self._merge()
+            rows = np.flatnonzero(self.ids == shipid)
+            if not len(rows):
+                return None
+            i = int(rows[0])
+            waypoints = slice(self.base[i], self.base[i] + self.legs[i] + 1)
+            remaining = float(self.total[i] - self.sailed[i])
+            return {
+                "ship_id": shipid,
+                "latitude": float(self.lat[i]),
+                "longitude": float(self.lon[i]),
+                "speed_kmh": float(self.speed[i]),
+                "distance_km": float(self.total[i]),
+                "remaining_km": remaining,
+                "eta": self.sim_time + remaining / self.speed[i] * 3600.0,
+                "arrived": bool(self.arrived[i]),
+                "route": np.stack([self.wp_lat[waypoints], self.wp_lon[waypoints]], axis=1).tolist(),
+            }
+
+    def _merge(self):
+        """Apply queued voyages and cancellations to the columns (under the lock)."""
+        if self._pending or self._cancelled:
+            drop = np.isin(self.ids, list(self._pending) + list(self._cancelled))
+            self._compact(~drop)
+            self._append(self._pending)
+            self._pending = {}
+            self._cancelled = set()
+
+    def _compact(self, keep: np.ndarray):
+        """Keep only the rows in `keep`, repacking their waypoints."""
+        if keep.all():
+            return
+        points = self.legs[keep] + 1
+        starts = np.cumsum(points) - points
+        gather = np.repeat(self.base[keep] - starts, points) + np.arange(int(points.sum()))
+        self.wp_lat, self.wp_lon, self.wp_cum = self.wp_lat[gather], self.wp_lon[gather], self.wp_cum[gather]
+        for name in self.ROW_COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+        self.base = starts
+
+    def _append(self, voyages: Dict[int, Tuple[np.ndarray, float, float]]):
+        if not voyages:
+            return
+        routes = [route for route, _, _ in voyages.values()]
+        points = np.fromiter((len(r) for r in routes), dtype=np.int64, count=len(routes))
+        flat = np.concatenate(routes)
+        leg_km = haversine_many(flat[:-1, 0], flat[:-1, 1], flat[1:, 0], flat[1:, 1])
+        # Zero the "legs" that join one route's goal to the next route's start, then restart the sums per route
+        firsts = np.cumsum(points) - points
+        leg_km[firsts[1:] - 1] = 0.0
+        cum = np.concatenate([[0.0], np.cumsum(leg_km)])
+        cum -= np.repeat(cum[firsts], points)
+
+        self.base = np.concatenate([self.base, firsts + len(self.wp_lat)])
+        self.wp_lat = np.concatenate([self.wp_lat, flat[:, 0]])
+        self.wp_lon = np.concatenate([self.wp_lon, flat[:, 1]])
+        self.wp_cum = np.concatenate([self.wp_cum, cum])
+        n = len(routes)
+        self.ids = np.concatenate([self.ids, np.fromiter(voyages, dtype=np.int64, count=n)])
+        self.speed = np.concatenate([self.speed, [speed for _, speed, _ in voyages.values()]])
+        self.sailed = np.concatenate([self.sailed, np.zeros(n)])
+        self.total = np.concatenate([self.total, cum[firsts + points - 1]])
+        self.legs = np.concatenate([self.legs, points - 1])
+        self.leg = np.concatenate([self.leg, np.zeros(n, dtype=np.int64)])
+        self.lat = np.concatenate([self.lat, flat[firsts, 0]])
+        self.lon = np.concatenate([self.lon, flat[firsts, 1]])
+        self.arrived = np.concatenate([self.arrived, np.zeros(n, dtype=bool)])
+        self.dirty = np.concatenate([self.dirty, np.ones(n, dtype=bool)])
+        self.started = np.concatenate([self.started, [started for _, _, started in voyages.values()]])
+
+    # ---------- stepping ----------
+    def tick(self, dt: Optional[float] = None):
+        """Advance every sailing ship by dt simulated seconds."""
+        dt = self.tick_seconds if dt is None else dt
+        started = time.perf_counter()
+        with self._lock:
+            self._merge()
+            self.sim_time += dt
+            self.ticks += 1
+            if not len(self.ids):
+                return
+            moving = ~self.arrived
+            np.minimum(self.sailed + self.speed * (dt / 3600.0), self.total, out=self.sailed)
+
+            # Step past every waypoint reached this tick (usually none, so the loop rarely runs)
+            behind = (self.sailed > self.wp_cum[self.base + self.leg + 1]) & (self.leg < self.legs - 1)
+            while behind.any():
+                rows = np.flatnonzero(behind)
+                self.leg[rows] += 1
+                behind[rows] = (
+                    (self.sailed[rows] > self.wp_cum[self.base[rows] + self.leg[rows] + 1])
+                    & (self.leg[rows] < self.legs[rows] - 1)
+                )
+
+            i0 = self.base + self.leg
+            span = self.wp_cum[i0 + 1] - self.wp_cum[i0]
+            frac = np.clip((self.sailed - self.wp_cum[i0]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+            self.lat = self.wp_lat[i0] + frac * (self.wp_lat[i0 + 1] - self.wp_lat[i0])
+            self.lon = self.wp_lon[i0] + frac * (self.wp_lon[i0 + 1] - self.wp_lon[i0])
+            self.dirty |= moving
+            self.arrivals += int((moving & (self.sailed >= self.total)).sum())
+            self.arrived |= self.sailed >= self.total
+        self.tick_ms = (time.perf_counter() - started) * 1e3
+
+    def flush(self):
+        """
+        Publish every ship that moved since the last flush, then drop finished voyages.
+        Ships only count as published once the DB write commits; if it raises, they
+        stay dirty (and arrived voyages stay held) for the next flush. A ship
+        reported since its voyage started, to this worker or another one, keeps
+        the reported position and its voyage ends.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._merge()
+            rows = np.flatnonzero(self.dirty)
+            shipids, lats, lons, since = self.ids[rows], self.lat[rows], self.lon[rows], self.started[rows]
+        reported = np.zeros(len(shipids), dtype=bool)
+        if self.persist and len(shipids):
+            with SessionLocal() as db:
+                ingest.write_simulated(db, shipids, lats, lons, since)
+                reported, reported_lat, reported_lon = ingest.reported_since(db, shipids, since)
+                db.commit()
+            lats, lons = np.where(reported, reported_lat, lats), np.where(reported, reported_lon, lons)
+        with self._lock:
+            self.dirty[np.isin(self.ids, shipids)] = False
+            self._compact(~(self.arrived & ~self.dirty))
+        if reported.any():
+            self.cancel(shipids[reported])
+        if self.persist and len(shipids):
+            fleet_cache.fleet.move_ships(shipids, lats, lons)
+            # The receiving worker already recorded the reports; history entries are as of now,
+            # since sim_time runs ahead of the wall clock when sped up
+            simulated = ~reported
+            history.store.append(
+                shipids[simulated], lats[simulated], lons[simulated], np.full(int(simulated.sum()), time.time())
+            )
+            version = fleet_cache.fleet.version
+            for shipid, lat, lon in zip(shipids.tolist(), lats.tolist(), lons.tolist()):
+                events.broker.publish_position(shipid, lat, lon, version)
+        self.flushed += len(shipids)
+        self.flush_ms = (time.perf_counter() - started) * 1e3
+
+    def _try_flush(self) -> bool:
+        """flush(), counting a database error instead of raising it."""
+        try:
+            self.flush()
+            return True
+        except SQLAlchemyError:
+            FLUSH_FAILURES.inc()
+            return False
+
+    def run_for(self, sim_seconds: float, flush: bool = True) -> int:
+        """Advance sim_seconds as fast as possible, flushing once at the end unless told not to. Returns ticks run."""
+        if self.running:
+            raise RuntimeError("The simulation is running in the background")
+        ticks = max(1, int(round(sim_seconds / self.tick_seconds)))
+        for _ in range(ticks):
+            self.tick()
+        if flush:
+            self.flush()
+        return ticks
+
+    # ---------- what-if runs ----------
+    def snapshot(self) -> "FleetSimulator":
+        """
+        A persist=False copy of the voyages as they stand, with fresh counters, for
+        what-if runs: advancing it moves nothing in the DB, caches or history.
+        """
+        copy = FleetSimulator(self.tick_seconds, 0.0, self.flush_interval, persist=False)
+        with self._lock:
+            self._merge()
+            for name in self.COLUMNS:
+                setattr(copy, name, getattr(self, name).copy())
+            copy.sim_time = self.sim_time
+        return copy
+
+    def projection(self) -> List[dict]:
+        """Where every ship with a voyage is, as plain dicts."""
+        with self._lock:
+            self._merge()
+            return [
+                {"ship_id": shipid, "latitude": lat, "longitude": lon, "remaining_km": remaining, "arrived": arrived}
+                for shipid, lat, lon, remaining, arrived in zip(
+                    self.ids.tolist(), self.lat.tolist(), self.lon.tolist(),
+                    (self.total - self.sailed).tolist(), self.arrived.tolist(),
+                )
+            ]
+
+    # ---------- background loop ----------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, speedup: Optional[float] = None, tick_seconds: Optional[float] = None):
+        """Run ticks in a background thread, speedup times faster than real time (0 = as fast as possible)."""
+        with self._lock:
+            if speedup is not None:
+                self.speedup = speedup
+            if tick_seconds is not None:
+                self.tick_seconds = tick_seconds
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="fleet-simulator", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop ticking and flush what moved since the last flush (a database error is counted, not raised)."""
+        thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self._thread = None
+        self._try_flush()  # At shutdown the database may already be gone
+
+    def _run(self):
+        next_tick = last_flush = time.monotonic()
+        while not self._stop.is_set():
+            self.tick()
+            now = time.monotonic()
+            if now - last_flush >= self.flush_interval:
+                # On a database error keep sailing; the positions go out with the next flush
+                self._try_flush()
+                last_flush = now
+            if self.speedup > 0:
+                next_tick += self.tick_seconds / self.speedup
+                # Catch up on ticks missed during a flush, but drop a longer backlog instead of spiralling
+                next_tick = max(next_tick, now - self.flush_interval)
+                self._stop.wait(max(0.0, next_tick - time.monotonic()))
+
+    def status(self) -> dict:
+        with self._lock:
+            self._merge()
+            return {
+                "running": self.running,
+                "sim_time": self.sim_time,
+                "tick_seconds": self.tick_seconds,
+                "speedup": self.speedup,
+                "flush_interval": self.flush_interval,
+                "voyages": len(self.ids),
+                "sailing": int((~self.arrived).sum()),
+                "arrivals": self.arrivals,
+                "ticks": self.ticks,
+                "last_tick_ms": self.tick_ms,
+                "last_flush_ms": self.flush_ms,
+                "flushed": self.flushed,
+            }
+
+
+def start_voyages(engine: FleetSimulator, zone_set: ZoneSet, shipids, goal_lats, goal_lons) -> Tuple[List[dict], List[dict]]:
+    """
+    Plan and queue voyages for cached ships; a ship the engine already moves replans from where it is.
+    Returns (started, rejected) as plain dicts. The fleet cache must be loaded.
+    """
+    shipids = np.asarray(shipids, dtype=np.int64)
+    known, lat, lon = fleet_cache.fleet.positions(shipids)
+    simulated, sim_lat, sim_lon = engine.positions(shipids)
+    lat, lon = np.where(simulated, sim_lat, lat), np.where(simulated, sim_lon, lon)
+    speeds = fleet_cache.fleet.speeds(shipids)
+
+    started, rejected = [], []
+    ok = known & (speeds > 0)
+    for shipid in shipids[~known].tolist():
+        rejected.append({"ship_id": shipid, "reason": "unknown_ship"})
+    for shipid in shipids[known & ~(speeds > 0)].tolist():
+        rejected.append({"ship_id": shipid, "reason": "no_speed"})
+
+    rows = np.flatnonzero(ok)
+    origins = np.stack([lat[rows], lon[rows]], axis=1)
+    goals = np.stack([np.asarray(goal_lats, dtype=np.float64)[rows], np.asarray(goal_lons, dtype=np.float64)[rows]], axis=1)
+    plans = plan_voyages(zone_set, origins, goals)
+
+    ids, routes, route_speeds = [], [], []
+    for row, (route, status) in zip(rows.tolist(), plans):
+        shipid = int(shipids[row])
+        if route is None:
+            rejected.append({"ship_id": shipid, "reason": status})
+            continue
+        km = float(haversine_many(route[:-1, 0], route[:-1, 1], route[1:, 0], route[1:, 1]).sum())
+        ids.append(shipid)
+        routes.append(route)
+        route_speeds.append(speeds[row])
+        started.append({
+            "ship_id": shipid,
+            "speed_kmh": float(speeds[row]),
+            "distance_km": km,
+            "eta_hours": km / speeds[row],
+            "route": route.tolist(),
+        })
+    engine.add_voyages(ids, routes, route_speeds)
+    return started, rejected
+
+
+engine = FleetSimulator()
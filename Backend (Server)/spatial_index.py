@@ -0,0 +1,160 @@
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from shipalloc import calculate_distances
+
+EARTH_RADIUS_KM = 6371.0
+
+Cell = Tuple[int, int]
+
+
+# ------------------ GRID INDEX ------------------
+class ShipGridIndex:
+    """
+    Lat/lon bucket grid over ship positions.
+
+    Ships are hashed into cell_deg x cell_deg cells, so moving or removing a
+    ship is O(1). Radius queries only visit the cells overlapping the search
+    box; k-nearest queries expand ring by ring around the query cell and stop
+    as soon as no unvisited cell can hold anything closer than the k-th hit.
+    Longitudes are not wrapped at the antimeridian.
+    """
+
+    def __init__(self, cell_deg: float = 1.0):
+        self.cell_deg = cell_deg
+        self._cells: Dict[Cell, Dict[int, Tuple[float, float]]] = {}
+        self._where: Dict[int, Cell] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, shipid: int) -> bool:
+        return shipid in self._where
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    # ---------- updates ----------
+    def clear(self):
+        self._cells.clear()
+        self._where.clear()
+
+    def upsert(self, shipid: int, lat: float, lon: float):
+        cell = self._cell(lat, lon)
+        old = self._where.get(shipid)
+        if old is not None and old != cell:
+            self._discard(shipid, old)
+        self._cells.setdefault(cell, {})[shipid] = (lat, lon)
+        self._where[shipid] = cell
+
+    def remove(self, shipid: int):
+        cell = self._where.pop(shipid, None)
+        if cell is not None:
+            self._discard(shipid, cell)
+
+    def _discard(self, shipid: int, cell: Cell):
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(shipid, None)
+            if not bucket:
+                del self._cells[cell]
+
+    # ---------- queries ----------
+    def _gather(self, cells) -> Tuple[List[int], List[Tuple[float, float]]]:
+        ids: List[int] = []
+        points: List[Tuple[float, float]] = []
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket:
+                ids.extend(bucket.keys())
+                points.extend(bucket.values())
+        return ids, points
+
+    def _ranked(self, ids, points, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        pts = np.asarray(points, dtype=np.float64)
+        return np.asarray(ids, dtype=np.int64), calculate_distances(pts[:, 0], pts[:, 1], lat, lon)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """All indexed ships within radius_km of (lat, lon), nearest first."""
+        if not self._cells:
+            return []
+        d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lat_edge = min(max(abs(lat - d_lat), abs(lat + d_lat)), 89.999)
+        ratio = math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi / 2)) / math.cos(math.radians(lat_edge))
+        d_lon = math.degrees(math.asin(ratio)) if ratio < 1.0 else 180.0
+
+        r0, c0 = self._cell(lat - d_lat, lon - d_lon)
+        r1, c1 = self._cell(lat + d_lat, lon + d_lon)
+        if (r1 - r0 + 1) * (c1 - c0 + 1) > len(self._cells):
+            cells = [cell for cell in self._cells if r0 <= cell[0] <= r1 and c0 <= cell[1] <= c1]
+        else:
+            cells = [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+        ids, dist = self._ranked(*self._gather(cells), lat, lon)
+        keep = np.flatnonzero(dist <= radius_km)
+        keep = keep[np.argsort(dist[keep], kind="stable")]
+        return [(int(ids[i]), float(dist[i])) for i in keep]
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[int, float]]:
+        """The k indexed ships closest to (lat, lon), nearest first."""
+        if k <= 0 or not self._cells:
+            return []
+
+        rows = [cell[0] for cell in self._cells]
+        cols = [cell[1] for cell in self._cells]
+        row_lo, row_hi, col_lo, col_hi = min(rows), max(rows), min(cols), max(cols)
+        cr, cc = self._cell(lat, lon)
+        max_ring = max(abs(cr - row_lo), abs(cr - row_hi), abs(cc - col_lo), abs(cc - col_hi))
+
+        ids: List[int] = []
+        points: List[Tuple[float, float]] = []
+        for ring in range(max_ring + 1):
+            if ring == 0:
+                ring_cells = [(cr, cc)]
+            else:
+                ring_cells = [(cr - ring, c) for c in range(cc - ring, cc + ring + 1)]
+                ring_cells += [(cr + ring, c) for c in range(cc - ring, cc + ring + 1)]
+                ring_cells += [(r, cc - ring) for r in range(cr - ring + 1, cr + ring)]
+                ring_cells += [(r, cc + ring) for r in range(cr - ring + 1, cr + ring)]
+            new_ids, new_points = self._gather(ring_cells)
+            ids.extend(new_ids)
+            points.extend(new_points)
+
+            if len(ids) >= k and ring < max_ring:
+                _, dist = self._ranked(ids, points, lat, lon)
+                kth = np.partition(dist, k - 1)[k - 1]
+                if kth <= self._outside_bound(lat, lon, cr, cc, ring):
+                    break
+
+        ids_arr, dist = self._ranked(ids, points, lat, lon)
+        order = np.argsort(dist, kind="stable")[:k]
+        return [(int(ids_arr[i]), float(dist[i])) for i in order]
+
+    def farthest_bound(self, lat: float, lon: float) -> float:
+        """Upper bound (km) on the distance from (lat, lon) to any indexed ship."""
+        if not self._cells:
+            return 0.0
+        cd = self.cell_deg
+        cells = np.asarray(list(self._cells), dtype=np.float64)
+        lat_lo, lon_lo = cells[:, 0] * cd, cells[:, 1] * cd
+        centre = calculate_distances(lat_lo + cd / 2, lon_lo + cd / 2, lat, lon)
+        # Half a meridian step plus half a parallel step covers any point of a cell from its centre
+        return float(centre.max()) + EARTH_RADIUS_KM * math.radians(cd)
+
+    def _outside_bound(self, lat: float, lon: float, cr: int, cc: int, ring: int) -> float:
+        """Lower bound (km) on the distance from (lat, lon) to any cell beyond the given ring."""
+        cd = self.cell_deg
+        lat_lo, lat_hi = (cr - ring) * cd, (cr + ring + 1) * cd
+        lon_lo, lon_hi = (cc - ring) * cd, (cc + ring + 1) * cd
+
+        lat_gap = min(lat - lat_lo, lat_hi - lat)
+        lon_gap = min(min(lon - lon_lo, lon_hi - lon), 90.0)
+        lat_edge = min(max(abs(lat_lo), abs(lat_hi)), 90.0)
+
+        by_lat = EARTH_RADIUS_KM * math.radians(lat_gap)
+        by_lon = EARTH_RADIUS_KM * math.asin(math.cos(math.radians(lat_edge)) * math.sin(math.radians(lon_gap)))
+        return min(by_lat, by_lon)
@@ -0,0 +1,61 @@
+"""Shared pytest setup. Run from the Backend (Server) directory: `python -m pytest tests`."""
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+# A throwaway SQLite database and history directory, set before anything imports `database`
+TMP = tempfile.mkdtemp(prefix="mcrs_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(TMP, 'mcrs.db')}")
+os.environ.setdefault("HISTORY_DIR", os.path.join(TMP, "history"))
+os.environ.setdefault("SIM_AUTOSTART", "0")
+# Cached responses would outlive the rows each test deletes
+os.environ.setdefault("RESPONSE_CACHE", "0")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A session on empty tables (created by importing main, as at start-up)."""
+    import fleet_cache
+    import main  # noqa: F401
+    from database import Base, SessionLocal, engine
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    fleet_cache.fleet.invalidate()
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def ships(db):
+    """One ship type, two alert types and ten free ships (ids 1-10) at (10 + id / 10, 80)."""
+    import fleet_cache
+    from models import Alert, AllShip, Ship
+
+    db.add(Ship(id=1, name="Patrol", speed=40.0, rotation_speed=1.0, humanalert=0.5, attack=0.5, robery=0.5,
+                struck=0.5, resource=0.5, climate=0.5))
+    for name in ("Piracy", "Fire"):
+        db.add(Alert(name=name, human_error=0.5, attack=0.7, weather=0.3, robbery=0.6, struck=0.2, resource=0.4))
+    db.add_all([
+        AllShip(shipid=i, name=f"S{i}", latitude=10.0 + i / 10, longitude=80.0, mission=False, type=1)
+        for i in range(1, 11)
+    ])
+    db.commit()
+    fleet_cache.fleet.invalidate()  # Written behind the back of a client that may have loaded it already
+    return list(range(1, 11))
@@ -0,0 +1,45 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import assignment
+
+
+def brute_force(score: np.ndarray, maximize: bool) -> float:
+    """Best summed score over every one-to-one assignment of the smaller side."""
+    n, m = score.shape
+    pick = max if maximize else min
+    if n <= m:
+        return pick(sum(score[i, c] for i, c in enumerate(cols)) for cols in itertools.permutations(range(m), n))
+    return pick(sum(score[r, j] for j, r in enumerate(rows)) for rows in itertools.permutations(range(n), m))
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (3, 6), (6, 3), (2, 5), (6, 1)])
+@pytest.mark.parametrize("maximize", [True, False])
+def test_matches_brute_force(shape, maximize):
+    rng = np.random.default_rng(sum(shape) * 2 + maximize)
+    for _ in range(20):
+        score = rng.uniform(-5, 5, size=shape)
+        rows, cols = assignment.solve_assignment(score, maximize=maximize)
+        assert len(rows) == len(cols) == min(shape)
+        assert len(set(rows.tolist())) == len(rows) and len(set(cols.tolist())) == len(cols)
+        assert np.all(np.diff(rows) > 0)
+        assert score[rows, cols].sum() == pytest.approx(brute_force(score, maximize))
+
+
+def test_ties_and_integer_scores():
+    score = np.array([[1, 1, 0], [1, 1, 0], [0, 0, 0]])
+    rows, cols = assignment.solve_assignment(score)
+    assert score[rows, cols].sum() == 2
+
+
+def test_empty_matrix():
+    rows, cols = assignment.solve_assignment(np.zeros((0, 4)))
+    assert len(rows) == len(cols) == 0
+
+
+@pytest.mark.parametrize("score", [np.zeros(3), np.array([[1.0, np.inf]]), np.array([[np.nan, 0.0]])])
+def test_rejects_bad_input(score):
+    with pytest.raises(ValueError):
+        assignment.solve_assignment(score)
@@ -0,0 +1,117 @@
+import time
+
+import numpy as np
+import pytest
+
+import fleet_cache
+from database import SessionLocal
+from models import AllShip
+
+
+@pytest.fixture
+def cache(db, ships):
+    fleet = fleet_cache.FleetCache()
+    fleet.ensure_loaded(db)
+    return fleet
+
+
+def remote(changes: dict):
+    """Write rows the way another worker would: in its own session, behind this cache."""
+    with SessionLocal() as other:
+        for shipid, values in changes.items():
+            other.query(AllShip).filter(AllShip.shipid == shipid).update(values)
+        other.commit()
+
+
+def state(fleet, shipid):
+    slot = fleet._slots[shipid]
+    return float(fleet.lat[slot]), float(fleet.lon[slot]), bool(fleet.mission[slot])
+
+
+class ReadThenAct:
+    """A session whose ship read runs `act` right after the rows come back, as if it raced the read."""
+
+    def __init__(self, db, act):
+        self.db, self.act = db, act
+
+    def query(self, *columns):
+        outer = self
+
+        class Query:
+            def __init__(self, query):
+                self._query = query
+
+            def filter(self, *criteria):
+                return Query(self._query.filter(*criteria))
+
+            def all(self):
+                rows = self._query.all()
+                outer.act()
+                return rows
+
+        return Query(self.db.query(*columns))
+
+
+def test_applies_only_the_rows_that_changed(cache, db):
+    start = cache.version
+    remote({2: {"latitude": 1.0, "longitude": 2.0}, 3: {"mission": True}})
+    changed = cache.sync(db)
+    assert sorted(changed.tolist()) == [2, 3]
+    assert state(cache, 2) == (1.0, 2.0, False)
+    assert state(cache, 3)[2] is True and not cache.is_free(3)
+    feed = cache.changes_since(db, start)
+    assert sorted(ship["shipid"] for ship in feed["changed"]) == [2, 3]
+    assert cache.sync(db).tolist() == []
+
+
+def test_local_changes_made_during_the_read_are_kept(cache, db):
+    remote({4: {"latitude": 1.0}, 5: {"mission": True}})
+
+    def local():
+        # This worker moves ship 4 and frees ship 5 after the rows were read; its writes are the newer ones
+        cache.move_ships(np.asarray([4]), np.asarray([7.0]), np.asarray([77.0]))
+        cache.set_mission(5, False)
+
+    changed = cache.sync(ReadThenAct(db, local))
+    assert changed.tolist() == []
+    assert state(cache, 4) == (7.0, 77.0, False)
+    assert cache.is_free(5)
+
+
+def test_pinned_ships_are_left_alone(cache, db):
+    remote({6: {"latitude": 1.0}, 7: {"latitude": 2.0}})
+    changed = cache.sync(db, pinned=lambda shipids: shipids == 6)
+    assert changed.tolist() == [7]
+    assert state(cache, 6)[0] == pytest.approx(10.6)
+
+
+def test_incremental_reads_skip_old_rows_until_a_full_read(cache, db):
+    cache.sync(db)
+    # Stamped long before the last read, as if committed by a worker whose clock lags far behind
+    remote({8: {"latitude": 1.0, "updated_at": time.time() - 3600}})
+    assert cache.sync(db, overlap=5.0).tolist() == []
+    assert cache.sync(db, full=True).tolist() == [8]
+    assert state(cache, 8)[0] == 1.0
+
+
+def test_deleted_rows_are_only_dropped_by_a_full_read(cache, db):
+    with SessionLocal() as other:
+        other.query(AllShip).filter(AllShip.shipid == 9).delete()
+        other.commit()
+    assert cache.sync(db).tolist() == []
+    assert 9 in cache._slots
+    assert cache.sync(db, full=True).tolist() == [9]
+    assert 9 not in cache._slots
+    assert not cache.is_free(9)
+
+
+def test_every_write_path_stamps_updated_at(db, ships):
+    def stamp(shipid):
+        db.expire_all()
+        return db.get(AllShip, shipid).updated_at
+
+    assert stamp(1) is not None
+    before = stamp(1)
+    time.sleep(0.01)
+    remote({1: {"latitude": 1.0}})
+    assert stamp(1) > before
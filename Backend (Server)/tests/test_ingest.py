@@ -0,0 +1,103 @@
+import json
+
+import numpy as np
+import pytest
+
+import fleet_cache
+import ingest
+from database import SessionLocal
+from models import AllShip
+
+
+def stored(db, shipid):
+    db.expire_all()
+    ship = db.get(AllShip, shipid)
+    return ship.latitude, ship.longitude, ship.position_ts
+
+
+def write(db, shipids, lats, lons, ts):
+    ingest.write_positions(db, np.asarray(shipids), np.asarray(lats, dtype=float),
+                           np.asarray(lons, dtype=float), np.asarray(ts, dtype=float))
+    db.commit()
+
+
+def test_never_reported_ship_takes_any_report(db, ships):
+    write(db, [1], [5.0], [70.0], [100.0])
+    assert stored(db, 1) == (5.0, 70.0, 100.0)
+
+
+def test_only_newer_reports_replace_a_position(db, ships):
+    write(db, [1, 2], [5.0, 6.0], [70.0, 71.0], [100.0, 100.0])
+    write(db, [1, 2], [7.0, 8.0], [72.0, 73.0], [99.0, 100.0])  # older, then the same time
+    assert stored(db, 1) == (5.0, 70.0, 100.0)
+    assert stored(db, 2) == (6.0, 71.0, 100.0)
+    write(db, [1], [9.0], [74.0], [101.0])
+    assert stored(db, 1) == (9.0, 74.0, 101.0)
+
+
+def test_fresh_and_applied_positions(db, ships):
+    write(db, [1, 2], [5.0, 6.0], [70.0, 71.0], [100.0, 100.0])
+    fresh = ingest.fresh_positions(db, np.asarray([1, 2, 3]), np.asarray([100.0, 150.0, 1.0]))
+    assert fresh.tolist() == [False, True, True]
+    applied = ingest.applied_positions(
+        db, np.asarray([1, 2, 3]), np.asarray([5.0, 6.5, 7.0]), np.asarray([70.0, 71.0, 72.0]),
+        np.asarray([100.0, 100.0, 1.0]),
+    )
+    assert applied.tolist() == [True, False, False]
+
+
+def test_simulated_positions_yield_to_reports(db, ships):
+    write(db, [1], [5.0], [70.0], [100.0])
+    # Voyage of ship 1 started before its report, ship 2's was never reported
+    ingest.write_simulated(db, np.asarray([1, 2]), np.asarray([1.0, 2.0]), np.asarray([60.0, 61.0]),
+                           np.asarray([50.0, 50.0]))
+    db.commit()
+    assert stored(db, 1) == (5.0, 70.0, 100.0)
+    assert stored(db, 2) == (2.0, 61.0, None)
+    # A voyage started after the report moves the ship but leaves the report time
+    ingest.write_simulated(db, np.asarray([1]), np.asarray([1.0]), np.asarray([60.0]), np.asarray([150.0]))
+    db.commit()
+    assert stored(db, 1) == (1.0, 60.0, 100.0)
+
+
+def post(client, reports):
+    body = "\n".join(json.dumps(report) for report in reports)
+    response = client.post("/ingest/positions", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_replayed_reports_are_stale(client, ships, db):
+    post(client, [{"ship_id": 1, "latitude": 5.0, "longitude": 70.0, "ts": 100}])
+    body = post(client, [
+        {"ship_id": 1, "latitude": 6.0, "longitude": 71.0, "ts": 90},
+        {"ship_id": 2, "latitude": 6.0, "longitude": 71.0, "ts": 90},
+    ])
+    assert body["applied"] == 1 and body["stale"] == [1]
+    assert stored(db, 1) == (5.0, 70.0, 100.0)
+    _, lat, lon = fleet_cache.fleet.positions(np.asarray([1, 2]))
+    assert lat.tolist() == [5.0, 6.0] and lon.tolist() == [70.0, 71.0]
+
+
+def test_report_overtaken_between_check_and_write_leaves_the_cache(client, ships, db, monkeypatch):
+    write_positions = ingest.write_positions
+
+    def overtaken(session, *args):
+        # Another request commits a newer report for ship 1 after the freshness check
+        with SessionLocal() as other:
+            other.query(AllShip).filter(AllShip.shipid == 1).update(
+                {"latitude": 15.0, "longitude": 85.0, "position_ts": 200.0}
+            )
+            other.commit()
+        return write_positions(session, *args)
+
+    monkeypatch.setattr(ingest, "write_positions", overtaken)
+    body = post(client, [
+        {"ship_id": 1, "latitude": 5.0, "longitude": 70.0, "ts": 100},
+        {"ship_id": 2, "latitude": 6.0, "longitude": 71.0, "ts": 100},
+    ])
+    assert body["applied"] == 1 and body["stale"] == [1]
+    assert stored(db, 1) == (15.0, 85.0, 200.0)
+    _, lat, _ = fleet_cache.fleet.positions(np.asarray([1, 2]))
+    assert lat[0] != pytest.approx(5.0)
+    assert lat[1] == pytest.approx(6.0)
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import pagination
+from models import AlertResult
+
+START = datetime(2024, 1, 1, 10, 0, 0)
+
+
+@pytest.fixture
+def results(db):
+    """25 results over 10 distinct timestamps, so pages have to break ties on id."""
+    rows = [
+        AlertResult(
+            id=i, alert_type="Piracy" if i % 3 else "Fire", best_ship=f"S{i}", ship_id=i % 4,
+            final_score=0.5, timestamp=START + timedelta(seconds=i % 10, microseconds=250 * (i % 2)),
+            status=bool(i % 2),
+        )
+        for i in range(1, 26)
+    ]
+    db.add_all(rows)
+    db.commit()
+    # Newest first, id breaking ties, as the endpoint orders them
+    return [row.id for row in sorted(rows, key=lambda r: (r.timestamp, r.id), reverse=True)]
+
+
+def walk(client, limit, **params):
+    seen, cursor, pages = [], None, 0
+    while True:
+        response = client.get("/alert-results/page", params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        body = response.json()
+        seen += [item["id"] for item in body["items"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return seen, pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 7, 25, 100])
+def test_pages_cover_every_result_once_in_order(client, results, limit):
+    seen, pages = walk(client, limit)
+    assert seen == results
+    assert pages == max(1, -(-len(results) // limit))
+
+
+def test_pages_match_the_full_listing(client, results):
+    assert [item["id"] for item in client.get("/alert-results").json()] == results
+    assert walk(client, 4)[0] == results
+
+
+def test_filters_apply_on_every_page(client, results, db):
+    expected = [i for i in results if db.get(AlertResult, i).alert_type == "Fire" and db.get(AlertResult, i).ship_id == 2]
+    assert expected
+    assert walk(client, 1, alert_type="Fire", ship_id=2)[0] == expected
+    active = [i for i in results if i % 2]
+    assert walk(client, 3, status=True)[0] == active
+
+
+def test_rows_added_after_the_first_page_do_not_shift_later_pages(client, results, db):
+    first = client.get("/alert-results/page", params={"limit": 5}).json()
+    db.add(AlertResult(id=100, alert_type="Piracy", best_ship="S100", ship_id=1, final_score=0.5,
+                       timestamp=START + timedelta(hours=1), status=True))
+    db.commit()
+    rest = client.get("/alert-results/page", params={"limit": 100, "cursor": first["next_cursor"]}).json()
+    assert [item["id"] for item in first["items"]] + [item["id"] for item in rest["items"]] == results
+
+
+def test_empty_table_is_one_empty_page(client, db):
+    assert client.get("/alert-results/page").json() == {"items": [], "next_cursor": None}
+
+
+@pytest.mark.parametrize("cursor", ["garbage", pagination.encode_cursor([1, 2, 3]), pagination.encode_cursor(["x", 1])])
+def test_bad_cursor_is_400(client, cursor):
+    assert client.get("/alert-results/page", params={"cursor": cursor}).status_code == 400
+
+
+def test_cursor_round_trip():
+    key = (START + timedelta(microseconds=123456), 42)
+    assert pagination.decode_cursor(pagination.encode_cursor(key), (datetime.fromisoformat, int)) == key
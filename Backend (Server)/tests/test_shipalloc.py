@@ -0,0 +1,148 @@
+import random
+
+import numpy as np
+import pytest
+
+import shipalloc
+from spatial_index import ShipGridIndex
+from benchmarks.scoring import ALERT, make_ships_data
+
+
+def shared_type_fleet(n: int, n_types: int = 7, seed: int = 7) -> shipalloc.FleetArrays:
+    """A fleet whose ships share a handful of types, as in the database."""
+    ships = make_ships_data(n, seed=seed)
+    for i, ship in enumerate(ships):
+        ship["ship_info"] = ships[i % n_types]["ship_info"]
+    return shipalloc.FleetArrays.from_ships_data(ships)
+
+
+@pytest.fixture(scope="module")
+def fleet():
+    return shared_type_fleet(2000)
+
+
+def nearest_in(fleet):
+    def nearest(lat, lon, k):
+        distance = shipalloc.calculate_distances(fleet.lat, fleet.lon, lat, lon)
+        idx = np.argsort(distance, kind="stable")[:k]
+        return fleet.take(idx), float(distance[idx[-1]]), float(distance.max())
+    return nearest
+
+
+def indexed_nearest(fleet):
+    """nearest() over a ShipGridIndex, as the fleet cache provides it."""
+    index = ShipGridIndex()
+    for shipid, lat, lon in zip(fleet.ids.tolist(), fleet.lat.tolist(), fleet.lon.tolist()):
+        index.upsert(shipid, lat, lon)
+    row = {shipid: i for i, shipid in enumerate(fleet.ids.tolist())}
+
+    def nearest(lat, lon, k):
+        hits = index.nearest(lat, lon, k)
+        idx = np.asarray([row[shipid] for shipid, _ in hits], dtype=np.int64)
+        return fleet.take(idx), hits[-1][1], index.farthest_bound(lat, lon)
+    return nearest
+
+
+def detoured(fleet, low=1.0, high=4.0):
+    """Route distances: the straight line times a fixed per-ship detour factor."""
+    factor = np.random.default_rng(1).uniform(low, high, size=int(fleet.ids.max()) + 1)
+
+    def route_distances(ships, lat, lon):
+        return shipalloc.calculate_distances(ships.lat, ships.lon, lat, lon) * factor[ships.ids]
+    return route_distances
+
+
+def targets(n, seed=0):
+    rng = random.Random(seed)
+    return [(rng.uniform(1, 23), rng.uniform(66, 94), rng.random()) for _ in range(n)]
+
+
+def ids(results):
+    return [r.ship_id for r in results]
+
+
+@pytest.mark.parametrize("top_k", [8, 32, 128])
+@pytest.mark.parametrize("limit", [1, 3])
+def test_pruned_picks_match_full_fleet(fleet, top_k, limit):
+    nearest = nearest_in(fleet)
+    pruned_any = False
+    for lat, lon, climate in targets(100):
+        full = shipalloc.rank_alert(ALERT, lat, lon, climate, fleet, limit=limit)
+        pruned = shipalloc.rank_alert(ALERT, lat, lon, climate, fleet, limit=limit, top_k=top_k, nearest=nearest)
+        assert ids(pruned) == ids(full)
+        pruned_any |= pruned[0].score_scope == shipalloc.SCOPE_NEAREST
+    assert pruned_any
+
+
+def test_grid_index_nearest_matches_brute_force(fleet):
+    nearest, brute = indexed_nearest(fleet), nearest_in(fleet)
+    for lat, lon, _ in targets(50):
+        candidates, kth, farthest = nearest(lat, lon, 16)
+        expected, expected_kth, expected_farthest = brute(lat, lon, 16)
+        assert sorted(candidates.ids.tolist()) == sorted(expected.ids.tolist())
+        assert kth == pytest.approx(expected_kth)
+        assert farthest >= expected_farthest
+
+
+@pytest.mark.parametrize("strategy", ["weighted_sum", "distance_dominant"])
+def test_pruning_with_grid_index_matches_full_fleet(fleet, strategy):
+    nearest, strategy = indexed_nearest(fleet), shipalloc.STRATEGIES[strategy]
+    pruned_any = False
+    for lat, lon, climate in targets(100, seed=3):
+        full = shipalloc.rank_alert(ALERT, lat, lon, climate, fleet, limit=2, strategy=strategy)
+        pruned = shipalloc.rank_alert(
+            ALERT, lat, lon, climate, fleet, limit=2, top_k=64, nearest=nearest, strategy=strategy,
+        )
+        assert ids(pruned) == ids(full)
+        pruned_any |= pruned[0].score_scope == shipalloc.SCOPE_NEAREST
+    assert pruned_any
+
+
+def test_unsafe_pruning_is_refused():
+    # The nearest ship is slow and weak, a far one is fast and strong: the far one must win
+    ships = [
+        {"shipid": 1, "name": "near", "latitude": 10.0, "longitude": 80.0, "mission": False,
+         "ship_info": {"name": "tug", "speed": 5.0, "humanalert": 0.0, "attack": 0.0, "robery": 0.0,
+                       "struck": 0.0, "resource": 0.0, "climate": 0.0}},
+        {"shipid": 2, "name": "far", "latitude": 12.0, "longitude": 82.0, "mission": False,
+         "ship_info": {"name": "frigate", "speed": 60.0, "humanalert": 1.0, "attack": 1.0, "robery": 1.0,
+                       "struck": 1.0, "resource": 1.0, "climate": 1.0}},
+    ]
+    fleet = shipalloc.FleetArrays.from_ships_data(ships)
+    nearest = nearest_in(fleet)
+    candidates, kth, farthest = nearest(10.0, 80.0, 1)
+    scores = shipalloc.score_fleet(ALERT, 10.0, 80.0, 0.5, candidates)
+    assert not shipalloc.pruning_is_safe(ALERT, 0.5, fleet, scores, kth, farthest)
+    assert shipalloc.process_alert(ALERT, 10.0, 80.0, 0.5, fleet, top_k=1, nearest=nearest).ship_id == 2
+
+
+@pytest.mark.parametrize("top_k", [8, 32, 128])
+@pytest.mark.parametrize("limit", [1, 3])
+def test_pruned_picks_match_full_fleet_with_route_rescoring(fleet, top_k, limit):
+    nearest, routes = nearest_in(fleet), detoured(fleet)
+    for lat, lon, climate in targets(150, seed=top_k):
+        full = shipalloc.rank_alert(ALERT, lat, lon, climate, fleet, limit=limit, route_top_k=8, route_distances=routes)
+        pruned = shipalloc.rank_alert(
+            ALERT, lat, lon, climate, fleet, limit=limit, top_k=top_k, nearest=nearest,
+            route_top_k=8, route_distances=routes,
+        )
+        assert ids(pruned) == ids(full)
+
+
+def test_route_rescoring_still_prunes_with_wide_candidate_sets(fleet):
+    nearest, routes = nearest_in(fleet), detoured(fleet, high=1.5)
+    scopes = [
+        shipalloc.rank_alert(
+            ALERT, lat, lon, climate, fleet, top_k=256, nearest=nearest, route_top_k=8, route_distances=routes,
+        )[0].score_scope
+        for lat, lon, climate in targets(50)
+    ]
+    assert shipalloc.SCOPE_NEAREST in scopes
+
+
+def test_pruning_is_not_proven_for_nonlinear_strategies(fleet):
+    lat, lon, climate = targets(1)[0]
+    candidates, kth, farthest = nearest_in(fleet)(lat, lon, 64)
+    strategy = shipalloc.STRATEGIES["time_decayed"]
+    scores = shipalloc.score_fleet(ALERT, lat, lon, climate, candidates, strategy=strategy)
+    assert not shipalloc.pruning_is_safe(ALERT, climate, fleet, scores, kth, farthest, strategy=strategy)
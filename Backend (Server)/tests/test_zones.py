@@ -0,0 +1,129 @@
+import random
+
+import numpy as np
+import pytest
+
+import zones
+
+SQUARE = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]
+TRIANGLE = [(3.0, 0.0), (4.0, 0.0), (3.0, 1.0)]
+
+
+@pytest.fixture
+def zone_set():
+    return zones.ZoneSet([zones.RestrictedZone("square", "exercise", SQUARE),
+                          zones.RestrictedZone("triangle", "exercise", TRIANGLE)])
+
+
+def random_zone_set(count, rng):
+    boxes = []
+    for i in range(count):
+        lat, lon, size = rng.uniform(0, 20), rng.uniform(60, 80), rng.uniform(0.1, 1.0)
+        boxes.append(zones.RestrictedZone(f"box-{i}", "exercise", [
+            (lat, lon), (lat + size, lon), (lat + size, lon + size), (lat, lon + size),
+        ]))
+    return zones.ZoneSet(boxes)
+
+
+@pytest.mark.parametrize("start, end, blocked", [
+    ((-1.0, 0.5), (2.0, 0.5), True),       # straight through
+    ((-1.0, 1.0), (1.0, -1.0), True),      # touches the (0, 0) corner only
+    ((-1.0, 0.5), (0.0, 0.5), True),       # ends on an edge
+    ((0.0, -1.0), (0.0, 2.0), True),       # runs along an edge
+    ((-1.0, 1.5), (1.5, -1.0), True),      # cuts a corner off
+    ((-1.0, 1.0001), (2.0, 1.0001), False),  # passes just above
+    ((-1.0, -1.0), (-0.5, 2.0), False),    # beside it
+    ((3.6, 0.6), (4.0, 0.9), False),       # inside the triangle's box, outside the triangle
+    ((3.2, 1.5), (3.8, -0.5), True),       # crosses the triangle's hypotenuse
+])
+def test_segments_blocked_on_touching_and_crossing_edges(zone_set, start, end, blocked):
+    assert zone_set.segments_blocked(np.asarray([start]), np.asarray([end])).tolist() == [blocked]
+    assert zone_set.intersects_segment(start, end) == blocked
+
+
+def test_segments_blocked_matches_per_segment_test():
+    rng = random.Random(3)
+    zone_set = random_zone_set(40, rng)
+    starts, ends = [], []
+    while len(starts) < 2000:
+        a = (rng.uniform(-1, 21), rng.uniform(59, 81))
+        b = (a[0] + rng.uniform(-2, 2), a[1] + rng.uniform(-2, 2))
+        if not zone_set.contains(*a) and not zone_set.contains(*b):
+            starts.append(a)
+            ends.append(b)
+    expected = [zone_set.intersects_segment(a, b) for a, b in zip(starts, ends)]
+    assert any(expected) and not all(expected)
+    # A small chunk size runs the chunked path too
+    for chunk_cells in (2_000_000, 100):
+        blocked = zone_set.segments_blocked(np.asarray(starts), np.asarray(ends), chunk_cells=chunk_cells)
+        assert blocked.tolist() == expected
+
+
+def test_segments_blocked_without_zones_or_segments(zone_set):
+    assert zones.ZoneSet([]).segments_blocked(np.asarray([(0.0, 0.0)]), np.asarray([(1.0, 1.0)])).tolist() == [False]
+    assert zone_set.segments_blocked(np.empty((0, 2)), np.empty((0, 2))).tolist() == []
+
+
+def test_rtree_query_matches_linear_scan():
+    rng = random.Random(5)
+    zone_set = random_zone_set(300, rng)
+    for _ in range(200):
+        lat, lon = rng.uniform(-1, 21), rng.uniform(59, 81)
+        box = (lat, lon, lat + rng.uniform(0, 3), lon + rng.uniform(0, 3))
+        expected = np.flatnonzero(
+            (zone_set.boxes[:, 0] <= box[2]) & (zone_set.boxes[:, 2] >= box[0])
+            & (zone_set.boxes[:, 1] <= box[3]) & (zone_set.boxes[:, 3] >= box[1])
+        )
+        assert sorted(zone_set.rtree.query(box)) == expected.tolist()
+
+
+def test_first_crossing_through_an_edge(zone_set):
+    t, point, zone = zone_set.first_crossing((-1.0, 0.5), (2.0, 0.5))
+    assert zone.name == "square"
+    assert t == pytest.approx(1 / 3)
+    assert point == pytest.approx((0.0, 0.5))
+
+
+def test_first_crossing_at_a_touched_corner(zone_set):
+    t, point, zone = zone_set.first_crossing((-1.0, 1.0), (1.0, -1.0))
+    assert zone.name == "square"
+    assert t == pytest.approx(0.5)
+    assert point == pytest.approx((0.0, 0.0))
+
+
+def test_first_crossing_along_an_edge(zone_set):
+    # Collinear edges are skipped; the edge it runs into at the corner still counts
+    t, point, _ = zone_set.first_crossing((0.0, -1.0), (0.0, 2.0))
+    assert t == pytest.approx(1 / 3)
+    assert point == pytest.approx((0.0, 0.0))
+
+
+def test_first_crossing_picks_the_nearest_zone(zone_set):
+    t, point, zone = zone_set.first_crossing((5.0, 0.2), (-1.0, 0.2))
+    assert zone.name == "triangle"
+    assert point == pytest.approx((4.0 - 0.2, 0.2))
+
+
+def test_first_crossing_from_inside_and_missing(zone_set):
+    assert zone_set.first_crossing((0.5, 0.5), (2.0, 2.0)) == (0.0, (0.5, 0.5), zone_set.zones[0])
+    assert zone_set.first_crossing((-1.0, 1.0001), (2.0, 1.0001)) is None
+    assert zone_set.first_crossing((3.6, 0.6), (4.0, 0.9)) is None
+
+
+def test_first_crossing_agrees_with_segments_blocked():
+    rng = random.Random(8)
+    zone_set = random_zone_set(40, rng)
+    checked = 0
+    while checked < 500:
+        a = (rng.uniform(-1, 21), rng.uniform(59, 81))
+        b = (a[0] + rng.uniform(-2, 2), a[1] + rng.uniform(-2, 2))
+        if zone_set.contains(*a) or zone_set.contains(*b):
+            continue
+        crossing = zone_set.first_crossing(a, b)
+        assert (crossing is not None) == zone_set.segments_blocked(np.asarray([a]), np.asarray([b]))[0]
+        if crossing is not None:
+            t, point, zone = crossing
+            assert 0.0 <= t <= 1.0
+            assert zone.polygon.intersects_segment(a, point)
+            assert not zone_set.intersects_segment(a, (a[0] + 0.99 * t * (b[0] - a[0]), a[1] + 0.99 * t * (b[1] - a[1])))
+        checked += 1
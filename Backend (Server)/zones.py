@@ -0,0 +1,345 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.exc import SQLAlchemyError
+
+from geometry import CompiledPolygon, Point, segment_hit_fractions, segments_cross
+
+# Where restricted zones come from: "file" (ZONES_FILE, JSON or GeoJSON) or "db" (restricted_zones table)
+ZONES_SOURCE = os.getenv("ZONES_SOURCE", "file")
+ZONES_FILE = os.getenv("ZONES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "restricted_zones.json"))
+# How often (seconds) the zone file's mtime and the shared zones version are checked for hot reload
+ZONES_CHECK_INTERVAL = float(os.getenv("ZONES_CHECK_INTERVAL", "5"))
+
+Box = Tuple[float, float, float, float]
+
+
+# ------------------ ZONES ------------------
+class RestrictedZone:
+    def __init__(self, name: str, kind: str, polygon: Sequence[Point]):
+        self.name = name
+        self.kind = kind
+        self.polygon = CompiledPolygon(polygon)
+
+
+class ZoneRTree:
+    """
+    Static R-tree over zone bounding boxes, bulk-loaded with Sort-Tile-Recursive.
+
+    Each level is a (nodes, 4) box array; node i's children are entries
+    [i * fanout, (i + 1) * fanout) of the level below, so a query descends
+    with one vectorized overlap test per visited node.
+    """
+
+    def __init__(self, boxes: np.ndarray, fanout: int = 8):
+        self.fanout = fanout
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.order = self._str_order(boxes)
+        self.levels: List[np.ndarray] = [boxes[self.order]]
+        while len(self.levels[-1]) > fanout:
+            below = self.levels[-1]
+            parents = []
+            for start in range(0, len(below), fanout):
+                group = below[start:start + fanout]
+                parents.append((group[:, 0].min(), group[:, 1].min(), group[:, 2].max(), group[:, 3].max()))
+            self.levels.append(np.asarray(parents, dtype=np.float64))
+
+    def _str_order(self, boxes: np.ndarray) -> np.ndarray:
+        n = len(boxes)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        slices = max(1, int(np.ceil(np.sqrt(np.ceil(n / self.fanout)))))
+        per_slice = slices * self.fanout
+        by_x = np.argsort(cx, kind="stable")
+        order = []
+        for start in range(0, n, per_slice):
+            chunk = by_x[start:start + per_slice]
+            order.append(chunk[np.argsort(cy[chunk], kind="stable")])
+        return np.concatenate(order)
+
+    def query(self, box: Box) -> List[int]:
+        """Indices (into the original boxes) of every box overlapping `box`."""
+        if not len(self.order):
+            return []
+        min_x, min_y, max_x, max_y = box
+        hits: List[int] = []
+        stack = [(len(self.levels) - 1, 0, len(self.levels[-1]))]
+        while stack:
+            level, start, stop = stack.pop()
+            nodes = self.levels[level][start:stop]
+            overlap = np.flatnonzero(
+                (nodes[:, 0] <= max_x) & (nodes[:, 2] >= min_x) & (nodes[:, 1] <= max_y) & (nodes[:, 3] >= min_y)
+            )
+            for i in (overlap + start).tolist():
+                if level == 0:
+                    hits.append(int(self.order[i]))
+                else:
+                    below = len(self.levels[level - 1])
+                    stack.append((level - 1, i * self.fanout, min((i + 1) * self.fanout, below)))
+        return hits
+
+
+class ZoneSet:
+    """
+    An immutable set of restricted zones plus the named routing waypoints.
+
+    Point and segment queries first ask the R-tree which zone boxes are
+    involved, so their cost grows with the zones actually nearby rather than
+    with the total zone count. Exposes the same contains / contains_many /
+    intersects_segment interface as CompiledPolygon.
+    """
+
+    def __init__(self, zones: List[RestrictedZone], waypoints: Optional[Dict[str, Point]] = None, version: int = 0):
+        self.zones = zones
+        self.waypoints = waypoints or {}
+        self.version = version
+        self.boxes = np.asarray([z.polygon.bbox for z in zones], dtype=np.float64).reshape(-1, 4)
+        self.rtree = ZoneRTree(self.boxes)
+
+        # Every zone edge in flat arrays (zone i owns edges [edge_start[i], edge_start[i + 1])),
+        # for batch segment checks
+        counts = np.asarray([len(z.polygon.x1) for z in zones], dtype=np.int64)
+        self.edge_count = counts
+        self.edge_start = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        if zones:
+            self.edges = tuple(np.concatenate([getattr(z.polygon, a) for z in zones]) for a in ("x1", "y1", "x2", "y2"))
+        else:
+            self.edges = tuple(np.empty(0) for _ in range(4))
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def zones_at(self, lat: float, lon: float) -> List[RestrictedZone]:
+        return [self.zones[i] for i in self.rtree.query((lat, lon, lat, lon)) if self.zones[i].polygon.contains(lat, lon)]
+
+    def contains(self, lat: float, lon: float) -> bool:
+        return any(self.zones[i].polygon.contains(lat, lon) for i in self.rtree.query((lat, lon, lat, lon)))
+
+    def contains_many(self, lats, lons) -> np.ndarray:
+        x = np.asarray(lats, dtype=np.float64).ravel()
+        y = np.asarray(lons, dtype=np.float64).ravel()
+        inside = np.zeros(x.shape, dtype=bool)
+        if not len(x):
+            return inside
+        for i in self.rtree.query((x.min(), y.min(), x.max(), y.max())):
+            pending = np.flatnonzero(~inside)
+            if not len(pending):
+                break
+            inside[pending] = self.zones[i].polygon.contains_many(x[pending], y[pending])
+        return inside
+
+    def segment_zones(self, start: Point, end: Point) -> List[RestrictedZone]:
+        """Zones the straight segment start -> end touches or enters."""
+        box = (min(start[0], end[0]), min(start[1], end[1]), max(start[0], end[0]), max(start[1], end[1]))
+        return [self.zones[i] for i in self.rtree.query(box) if self.zones[i].polygon.intersects_segment(start, end)]
+
+    def segments_blocked(self, starts: np.ndarray, ends: np.ndarray, chunk_cells: int = 2_000_000) -> np.ndarray:
+        """
+        Vectorized edge-crossing test for many segments at once (starts / ends are (m, 2) arrays).
+        Each segment is only tested against the edges of zones whose box its own box
+        overlaps. Assumes segment endpoints lie outside every zone, so crossing or
+        touching an edge is the only way in.
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        blocked = np.zeros(len(starts), dtype=bool)
+        if not len(self.zones) or not len(starts):
+            return blocked
+
+        lo = np.minimum(starts, ends)
+        hi = np.maximum(starts, ends)
+        step = max(1, chunk_cells // len(self.zones))
+        for first in range(0, len(starts), step):
+            sl = slice(first, first + step)
+            overlap = (
+                (lo[sl, 0, None] <= self.boxes[:, 2]) & (hi[sl, 0, None] >= self.boxes[:, 0])
+                & (lo[sl, 1, None] <= self.boxes[:, 3]) & (hi[sl, 1, None] >= self.boxes[:, 1])
+            )
+            seg, zone = np.nonzero(overlap)
+            if not len(seg):
+                continue
+
+            # Expand each (segment, zone) pair into (segment, edge) pairs
+            per_pair = self.edge_count[zone]
+            seg = np.repeat(seg + first, per_pair)
+            pair_offsets = np.repeat(np.cumsum(per_pair) - per_pair, per_pair)
+            edge = np.repeat(self.edge_start[zone], per_pair) + np.arange(len(seg)) - pair_offsets
+
+            x1, y1, x2, y2 = (a[edge] for a in self.edges)
+            hit = segments_cross(starts[seg, 0], starts[seg, 1], ends[seg, 0], ends[seg, 1], x1, y1, x2, y2)
+            blocked[seg[hit]] = True
+        return blocked
+
+    def first_crossing(self, start: Point, end: Point) -> Optional[Tuple[float, Point, RestrictedZone]]:
+        """Where the straight segment start -> end first enters a zone: (fraction along it, point, zone)."""
+        for zone in self.zones_at(*start):
+            return 0.0, start, zone
+        box = (min(start[0], end[0]), min(start[1], end[1]), max(start[0], end[0]), max(start[1], end[1]))
+        best_t, best_zone = np.inf, None
+        for i in self.rtree.query(box):
+            p = self.zones[i].polygon
+            t = segment_hit_fractions(start[0], start[1], end[0], end[1], p.x1, p.y1, p.x2, p.y2).min()
+            if t < best_t:
+                best_t, best_zone = float(t), self.zones[i]
+        if best_zone is None:
+            return None
+        point = (start[0] + best_t * (end[0] - start[0]), start[1] + best_t * (end[1] - start[1]))
+        return best_t, point, best_zone
+
+    def intersects_segment(self, start: Point, end: Point) -> bool:
+        box = (min(start[0], end[0]), min(start[1], end[1]), max(start[0], end[0]), max(start[1], end[1]))
+        return any(self.zones[i].polygon.intersects_segment(start, end) for i in self.rtree.query(box))
+
+
+# ------------------ LOADING ------------------
+def parse_zones(data: dict) -> Tuple[List[RestrictedZone], Dict[str, Point]]:
+    """
+    Parse either our zone file format
+        {"zones": [{"name", "kind", "polygon": [[lat, lon], ...]}], "waypoints": {"safe1": [lat, lon]}}
+    or a GeoJSON FeatureCollection of Polygon features (outer ring, [lon, lat] order;
+    "name" / "kind" taken from properties, Point features become waypoints).
+    """
+    zones: List[RestrictedZone] = []
+    waypoints: Dict[str, Point] = {}
+
+    if data.get("type") == "FeatureCollection":
+        for i, feature in enumerate(data.get("features", [])):
+            geometry = feature.get("geometry") or {}
+            props = feature.get("properties") or {}
+            name = props.get("name", f"zone-{i + 1}")
+            if geometry.get("type") == "Polygon":
+                ring = geometry["coordinates"][0]
+                zones.append(RestrictedZone(name, props.get("kind", "restricted"), [(lat, lon) for lon, lat, *_ in ring]))
+            elif geometry.get("type") == "Point":
+                lon, lat = geometry["coordinates"][:2]
+                waypoints[name] = (lat, lon)
+        return zones, waypoints
+
+    for i, zone in enumerate(data.get("zones", [])):
+        zones.append(RestrictedZone(
+            zone.get("name", f"zone-{i + 1}"),
+            zone.get("kind", "restricted"),
+            [tuple(p) for p in zone["polygon"]],
+        ))
+    for name, point in (data.get("waypoints") or {}).items():
+        waypoints[name] = tuple(point)
+    return zones, waypoints
+
+
+def load_zone_file(path: str) -> Tuple[List[RestrictedZone], Dict[str, Point]]:
+    with open(path, encoding="utf-8") as f:
+        return parse_zones(json.load(f))
+
+
+def load_zone_table() -> Tuple[List[RestrictedZone], Dict[str, Point]]:
+    """Active rows of the restricted_zones table; waypoints are rows of kind "waypoint" with one vertex."""
+    from database import SessionLocal
+    from models import RestrictedArea
+
+    db = SessionLocal()
+    try:
+        rows = db.query(RestrictedArea).filter(RestrictedArea.active == True).all()  # noqa: E712
+        zones: List[RestrictedZone] = []
+        waypoints: Dict[str, Point] = {}
+        for row in rows:
+            points = [tuple(p) for p in json.loads(row.polygon)]
+            if row.kind == "waypoint":
+                waypoints[row.name] = points[0]
+            else:
+                zones.append(RestrictedZone(row.name, row.kind, points))
+        return zones, waypoints
+    finally:
+        db.close()
+
+
+class ZoneRegistry:
+    """
+    Holds the current ZoneSet and swaps in a new one on reload.
+
+    With the file source, current() notices a changed mtime (checked at most
+    every ZONES_CHECK_INTERVAL seconds) and reloads in place, so zones can be
+    edited without restarting the API. reload() forces a reload from either source.
+    Every reload bumps the ZoneSet version so dependent caches can invalidate.
+
+    After share(), the registry also follows a version counter shared by all
+    worker processes: a worker that reloads bumps it, and every other worker
+    reloads when it sees the counter move on its next check.
+    """
+
+    def __init__(self, source: str = ZONES_SOURCE, path: str = ZONES_FILE, check_interval: float = ZONES_CHECK_INTERVAL):
+        self.source = source
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current: Optional[ZoneSet] = None
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._version = 0
+        self._versions = None  # Shared VersionBoard and counter name, see share()
+        self._shared_name = ""
+        self._shared: Optional[int] = None  # Shared version the current zone set was loaded at
+
+    def share(self, versions, name: str):
+        """Follow the counter `name` of a response_cache.VersionBoard (kept duck-typed: no DB import here)."""
+        self._versions = versions
+        self._shared_name = name
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def reload(self) -> ZoneSet:
+        with self._lock:
+            # Read before loading, so a bump made during the load triggers another one
+            shared = self._versions.refresh(self._shared_name) if self._versions is not None else None
+            if self.source == "db":
+                zones, waypoints = load_zone_table()
+            else:
+                self._mtime = self._file_mtime()
+                zones, waypoints = load_zone_file(self.path)
+            self._version += 1
+            self._current = ZoneSet(zones, waypoints, version=self._version)
+            self._shared = shared
+            self._last_check = time.monotonic()
+            return self._current
+
+    def publish(self) -> ZoneSet:
+        """Reload here and make every other worker reload too."""
+        if self._versions is not None:
+            self._versions.bump(self._shared_name)
+        return self.reload()
+
+    def _shared_moved(self) -> bool:
+        if self._versions is None:
+            return False
+        try:
+            return self._versions.current(self._shared_name) != self._shared
+        except SQLAlchemyError:
+            # The database is unreachable; keep the zones we have
+            return False
+
+    def current(self) -> ZoneSet:
+        zone_set = self._current
+        if zone_set is None:
+            return self.reload()
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self._last_check = time.monotonic()
+            file_changed = self.source != "db" and self._file_mtime() != self._mtime
+            if file_changed or self._shared_moved():
+                try:
+                    return self.reload()
+                except (OSError, ValueError, KeyError, TypeError):
+                    # A half-written or broken file keeps the last good zone set in service
+                    self._mtime = self._file_mtime()
+        return zone_set
+
+
+registry = ZoneRegistry()
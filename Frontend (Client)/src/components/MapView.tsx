@@ -2,7 +2,13 @@ import { useState, useEffect, useRef, memo } from "react";
 import { Ship as ShipIcon } from "lucide-react";
 import { Wrapper, Status } from "@googlemaps/react-wrapper";
 import ShipPopup from "./ShipPopup";
-import { getAllAllShips, AllShip } from "../services/api";
+import {
+  getAllShips,
+  getAllShipChanges,
+  subscribeToFleetEvents,
+  AllShipState,
+  ShipInfo,
+} from "../services/api";
 
 // Define Ship interface
 interface Ship {
@@ -122,19 +128,35 @@ const MapView = memo(() => {
   const [ships, setShips] = useState<Ship[]>([]);
   const [loading, setLoading] = useState(true);
 
-  // Fetch ship data
+  // Fetch ship types once, then poll only the fleet changes since our version
   useEffect(() => {
+    const shipTypes = new Map<number, ShipInfo>();
+    const fleet = new Map<number, AllShipState>();
+    let version = 0;
+
     const fetchShips = async () => {
       try {
-        const data: AllShip[] = await getAllAllShips();
+        const changes = await getAllShipChanges(version);
+        if (changes.reset) fleet.clear();
+        changes.changed.forEach((ship) => fleet.set(ship.shipid, ship));
+        changes.deleted.forEach((id) => fleet.delete(id));
+        version = changes.version;
+
+        if (changes.changed.some((ship) => !shipTypes.has(ship.type))) {
+          const types: ShipInfo[] = await getAllShips();
+          types.forEach((t) => shipTypes.set(t.id, t));
+        }
 
-        const formattedShips: Ship[] = data.map((ship) => ({
-          name: ship.name,
-          type: ship.ship_info?.name || "Unknown", // ✅ "Aircraft Carrier"
-          position: { lat: ship.latitude, lng: ship.longitude },
-          speed: ship.ship_info?.speed,
-          rotation_speed: ship.ship_info?.rotation_speed,
-        }));
+        const formattedShips: Ship[] = Array.from(fleet.values()).map((ship) => {
+          const info = shipTypes.get(ship.type);
+          return {
+            name: ship.name,
+            type: info?.name || "Unknown", // ✅ "Aircraft Carrier"
+            position: { lat: ship.latitude, lng: ship.longitude },
+            speed: info?.speed ?? 0,
+            rotation_speed: info?.rotation_speed ?? 0,
+          };
+        });
 
         setShips(formattedShips);
       } catch (error) {
@@ -146,8 +168,21 @@ const MapView = memo(() => {
 
     fetchShips();
 
+    // Pushed events trigger a delta fetch (bursts batched into one); polling stays as a fallback
+    let refreshTimer: number | undefined;
+    const events = subscribeToFleetEvents(() => {
+      if (refreshTimer !== undefined) return;
+      refreshTimer = window.setTimeout(() => {
+        refreshTimer = undefined;
+        fetchShips();
+      }, 250);
+    });
     const interval = setInterval(fetchShips, 10000);
-    return () => clearInterval(interval);
+    return () => {
+      events.close();
+      window.clearTimeout(refreshTimer);
+      clearInterval(interval);
+    };
   }, []);
 
   if (loading)
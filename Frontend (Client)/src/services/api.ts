@@ -26,6 +26,15 @@ export interface AllShip {
   ship_info: ShipInfo;
 }
 
+export type AllShipState = Omit<AllShip, "ship_info">;
+
+export interface FleetChanges {
+  version: number;
+  reset: boolean;
+  changed: AllShipState[];
+  deleted: number[];
+}
+
 export interface LocationResponse {
   latitude: number;
   longitude: number;
@@ -101,6 +110,28 @@ export const getAllAllShips = async (): Promise<AllShip[]> => {
   return response.json();
 };
 
+export const getAllShipChanges = async (
+  since: number
+): Promise<FleetChanges> => {
+  const response = await fetch(`${BASE_URL}/allships/changes?since=${since}`);
+  if (!response.ok) throw new Error("Failed to fetch ship changes");
+  return response.json();
+};
+
+// Server-Sent Events: ship_position, allocation, mission_complete and resync
+export const subscribeToFleetEvents = (
+  onEvent: (type: string, data: unknown) => void
+): EventSource => {
+  const source = new EventSource(`${BASE_URL}/events`);
+  ["ship_position", "allocation", "mission_complete", "resync"].forEach(
+    (type) =>
+      source.addEventListener(type, (e) =>
+        onEvent(type, JSON.parse((e as MessageEvent).data))
+      )
+  );
+  return source;
+};
+
 export const getAllShipById = async (allShipId: number): Promise<AllShip> => {
   const response = await fetch(`${BASE_URL}/allships/${allShipId}`);
   if (!response.ok)